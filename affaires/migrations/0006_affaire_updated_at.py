@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('affaires', '0005_affaire_author'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='affaire',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
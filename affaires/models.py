@@ -1,9 +1,31 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Sum, Value, Case, When, F, ExpressionWrapper, DecimalField
+from django.db.models.functions import Coalesce
 from factures.models import Invoice
 
 
 # Create your models here.
 
+class AffaireQuerySet(models.QuerySet):
+    def with_financials(self):
+        """
+        Annote le total facturé HT, le reste à facturer et le taux d'avancement
+        en une seule requête (Sum/Coalesce sur les factures de chaque affaire)
+        """
+        amount = DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            annotated_total_facture_ht=Coalesce(Sum('invoices__amount_ht'), Value(Decimal('0')), output_field=amount),
+        ).annotate(
+            annotated_reste_a_facturer=ExpressionWrapper(F('budget') - F('annotated_total_facture_ht'), output_field=amount),
+            annotated_taux_avancement=Case(
+                When(budget__gt=0, then=ExpressionWrapper(F('annotated_total_facture_ht') * 100 / F('budget'), output_field=amount)),
+                default=Value(Decimal('0')),
+                output_field=amount,
+            ),
+        )
+
+
 class Affaire(models.Model):
     client = models.ForeignKey('clients.Client', on_delete=models.SET_NULL, null=True, related_name='affaires')
     client_entity_name = models.CharField(max_length=100, blank=True, null=True)
@@ -11,6 +33,10 @@ class Affaire(models.Model):
     author = models.ForeignKey('users.CustomUser', on_delete=models.SET_NULL, related_name='affaires', null=True, blank=True)
     affaire_description = models.TextField(max_length=200)
     budget = models.DecimalField(max_digits=10, decimal_places=2)
+    # Date de dernière modification, sert aux exports incrémentaux
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = AffaireQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Affaire"
@@ -23,10 +49,11 @@ class Affaire(models.Model):
         return f"{self.budget:,.2f} €".replace(",", " ").replace(".", ",")
     @property
     def total_facture_ht(self):
-        # Calcule le montant total des factures HT associées à cette affaire
-        # en utilisant la relation inverse depuis le modèle Invoice
-        # et en filtrant par l'affaire actuelle
-        return sum(facture.amount_ht for facture in self.invoices.all())
+        # Valeur annotée par Affaire.objects.with_financials() si disponible,
+        # sinon somme des factures HT de l'affaire calculée par la base
+        if 'annotated_total_facture_ht' in self.__dict__:
+            return self.annotated_total_facture_ht
+        return self.invoices.aggregate(total=Sum('amount_ht'))['total'] or Decimal('0')
     
     def formatted_total_facture_ht(self):
         return f"{self.total_facture_ht:,.2f} €".replace(",", " ").replace(".", ",")
@@ -34,6 +61,8 @@ class Affaire(models.Model):
     @property
     def reste_a_facturer(self):
         # Calcule le montant restant à facturer pour cette affaire
+        if 'annotated_reste_a_facturer' in self.__dict__:
+            return self.annotated_reste_a_facturer
         return self.budget - self.total_facture_ht
     
     def formatted_reste_a_facturer(self):
@@ -42,6 +71,8 @@ class Affaire(models.Model):
     @property
     def taux_avancement(self):
         # Calcule le taux d'avancement de l'affaire (pourcentage facturé)
+        if 'annotated_taux_avancement' in self.__dict__:
+            return self.annotated_taux_avancement
         if self.budget > 0:
             return (self.total_facture_ht / self.budget) * 100
         return 0
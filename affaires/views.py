@@ -1,29 +1,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.contrib import messages
-from django.db.models import ProtectedError
+from django.db.models import ProtectedError, Sum
 from .models import Affaire 
 from .forms import AffaireForm, ContactFormSet, ContactInlineFormSet
 from clients.models import Contact
+from factures.models import Invoice
+from utils.pagination import paginate
 
 # Create your views here.
 @login_required
 def affaires(request):  
-    affaires = Affaire.objects.all()
-    sorted_affaires = sorted(affaires, key=lambda affaire: affaire.reste_a_facturer, reverse=True)
-    total_facture_affaire = sum(affaire.total_facture_ht for affaire in affaires)
+    affaires = Affaire.objects.with_financials()
+    total_facture_affaire = Invoice.objects.aggregate(total=Sum('amount_ht'))['total'] or 0
 
-    paginator = Paginator(sorted_affaires, 10)
-
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, affaires, ('-annotated_reste_a_facturer', 'id'))
     return render(request, 'pages/affaires/affaires.html', context={"affaires": page_obj, "total_facture_affaire":total_facture_affaire})  
 
 @login_required
 def affaire_detail(request, pk):
-    affaire_detail = get_object_or_404(Affaire, pk=pk)
+    affaire_detail = get_object_or_404(Affaire.objects.with_financials(), pk=pk)
     # Ordonner les contacts pour que le contact principal apparaisse en premier
     contacts = affaire_detail.contacts.all().order_by('-is_principal', 'nom', 'prenom')
     contact_principal = affaire_detail.contact_principal
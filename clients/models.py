@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
@@ -10,6 +11,8 @@ class Client(models.Model):
     contact = models.CharField(max_length=100, blank=True, null=True)
     phone_number = models.CharField(max_length=10, blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
+    # Date de dernière modification, sert aux exports incrémentaux
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     
     
@@ -52,6 +55,8 @@ class Contact(models.Model):
     phone_number = models.CharField(max_length=10, blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
     is_principal = models.BooleanField(default=False)
+    # Date de dernière modification, sert aux exports incrémentaux
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = "Contact"
@@ -94,7 +99,7 @@ class Contact(models.Model):
             self.__class__.objects.filter(
                 affaire=self.affaire, 
                 is_principal=True
-            ).exclude(pk=self.pk).update(is_principal=False)
+            ).exclude(pk=self.pk).update(is_principal=False, updated_at=timezone.now())
         
         # Si c'est le premier contact de l'affaire, le marquer automatiquement comme principal
         if self.affaire and not self.__class__.objects.filter(affaire=self.affaire).exists():
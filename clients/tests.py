@@ -0,0 +1,46 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.db.models.functions import Lower
+from django.test import TestCase
+from django.urls import reverse
+
+from clients.models import Client
+from utils.pagination import CursorPaginator
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='test@example.com', password='test')
+        for index in range(15):
+            Client.objects.create(entity_name=f'Client {index:02d}')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def paginator(self):
+        clients = Client.objects.annotate(entity_name_lower=Lower('entity_name'))
+        return CursorPaginator(clients, 10, ('entity_name_lower', 'id'))
+
+    def test_decode_cursor_converts_values(self):
+        self.assertEqual(self.paginator().decode_cursor(encode_cursor(['client 03', '4'])), ['client 03', 4])
+
+    def test_decode_cursor_rejects_wrong_types(self):
+        self.assertIsNone(self.paginator().decode_cursor(encode_cursor(['x', 'y'])))
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('clients:clients'), {'after': encode_cursor(['x', 'y'])})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([client.entity_name for client in response.context['clients']], [f'Client {index:02d}' for index in range(10)])
+
+    def test_next_page_after_cursor(self):
+        first_page = self.paginator().get_page()
+        response = self.client.get(reverse('clients:clients'), {'after': first_page.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([client.entity_name for client in response.context['clients']], [f'Client {index:02d}' for index in range(10, 15)])
@@ -1,24 +1,21 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.forms import inlineformset_factory
 from django.contrib import messages
-from django.db.models import ProtectedError
+from django.db.models import ProtectedError, Value
+from django.db.models.functions import Coalesce, Lower
 from .models import Client, Contact
 from affaires.models import Affaire
 from .forms import ClientForm, ContactAffaireForm
+from utils.pagination import paginate
 
 # Create your views here.
 
 @login_required
 def clients(request):
-    clients = Client.objects.all()
-    sorted_clients = sorted(clients, key=lambda client: client.entity_name.lower())
+    clients = Client.objects.annotate(entity_name_lower=Lower('entity_name'))
 
-    paginator = Paginator(sorted_clients,10)
-
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, clients, ('entity_name_lower', 'id'))
 
     return render(request, 'pages/clients/clients.html', context={'clients': page_obj})
 
@@ -97,14 +94,10 @@ def client_delete(request, pk):
 
 @login_required
 def contacts(request):
-    contacts = Contact.objects.all()
     # Tri sécurisé qui gère les cas où nom peut être None
-    sorted_contacts = sorted(contacts, key=lambda contact: (contact.nom or '').lower())
-
-    paginator = Paginator(sorted_contacts, 10)
+    contacts = Contact.objects.annotate(nom_lower=Lower(Coalesce('nom', Value(''))))
 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, contacts, ('nom_lower', 'id'))
 
     return render(request, 'pages/clients/contacts.html', context={'contacts': page_obj})
 
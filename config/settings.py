@@ -104,6 +104,24 @@ DATABASES = {
 #     'default': env.db('DATABASE_URL', default='sqlite:///db.sqlite3'),
 # }
 
+# Cache (widgets du tableau de bord) : 'locmem' (mémoire du processus), 'file' (répertoire CACHE_LOCATION),
+# 'db' (table CACHE_LOCATION, créée par la commande createcachetable) ou 'dummy' (désactivé).
+# Un cache 'locmem' n'est invalidé que dans le processus qui écrit : avec plusieurs workers ou des
+# imports en ligne de commande, préférer 'file' ou 'db', partagés par tous les processus.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'gestionnaire-factures'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'django_cache'),
+    'dummy': ('django.core.cache.backends.dummy.DummyCache', ''),
+}
+CACHE_BACKEND, CACHE_DEFAULT_LOCATION = CACHE_BACKENDS[env('CACHE_BACKEND', default='locmem')]
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': env('CACHE_LOCATION', default=CACHE_DEFAULT_LOCATION),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -165,3 +183,44 @@ LOGOUT_REDIRECT_URL = 'dashboard:login'
 # Ajouter cette configuration pour la sécurité
 CSRF_TRUSTED_ORIGINS = env.list('CSRF_TRUSTED_ORIGINS', default=[])
 
+
+# Pagination des listes : 'page' (numéros de page) ou 'cursor' (curseur ?after=, sans OFFSET)
+LIST_PAGINATION = env('LIST_PAGINATION', default='page')
+# En mode curseur, estimer le total affiché en en-tête plutôt que de faire un COUNT(*)
+LIST_APPROXIMATE_COUNT = env.bool('LIST_APPROXIMATE_COUNT', default=False)
+
+# Durée de vie maximale des widgets du tableau de bord en cache, en secondes : ils sont invalidés dès
+# qu'une facture, un paiement, une affaire ou un client change, cette durée borne seulement le retard
+# d'un cache 'locmem' sur les écritures faites par d'autres processus
+DASHBOARD_CACHE_TIMEOUT = env.int('DASHBOARD_CACHE_TIMEOUT', default=600)
+
+# Taille maximale du cache des graphiques (MEDIA_ROOT/charts), en octets
+CHART_CACHE_MAX_BYTES = env.int('CHART_CACHE_MAX_BYTES', default=50 * 1024 * 1024)
+# Nombre de threads de rendu matplotlib par processus
+CHART_RENDER_WORKERS = env.int('CHART_RENDER_WORKERS', default=3)
+# Générer à l'avance les graphiques de l'année en cours et précédente après chaque modification de facture
+CHART_PRERENDER = env.bool('CHART_PRERENDER', default=False)
+
+# Exports en arrière-plan (base complète CSV / Excel) : durée de conservation des fichiers générés, en heures
+EXPORT_JOB_TTL_HOURS = env.int('EXPORT_JOB_TTL_HOURS', default=24)
+# Nombre de threads d'export par processus
+EXPORT_JOB_WORKERS = env.int('EXPORT_JOB_WORKERS', default=2)
+# Lancer les exports dans le processus web ; sinon ils attendent la commande run_export_jobs
+EXPORT_JOBS_IN_PROCESS = env.bool('EXPORT_JOBS_IN_PROCESS', default=True)
+# Nombre de tables lues en parallèle (une connexion chacune) pour l'export complet de la base
+EXPORT_TABLE_WORKERS = env.int('EXPORT_TABLE_WORKERS', default=5)
+
+# Résultats par page de chaque section (clients, contacts, affaires, factures) de la recherche globale
+SEARCH_RESULTS_PER_PAGE = env.int('SEARCH_RESULTS_PER_PAGE', default=20)
+# Suggestions de la barre de recherche (/search/suggest/), servies par un index de préfixes en mémoire :
+# nombre de suggestions par section, durée et taille du cache des réponses
+SEARCH_SUGGEST_LIMIT = env.int('SEARCH_SUGGEST_LIMIT', default=5)
+SEARCH_SUGGEST_CACHE_SECONDS = env.int('SEARCH_SUGGEST_CACHE_SECONDS', default=30)
+SEARCH_SUGGEST_CACHE_SIZE = env.int('SEARCH_SUGGEST_CACHE_SIZE', default=512)
+# Reconstruction périodique de l'index (écritures des autres processus), en secondes
+SEARCH_SUGGEST_REFRESH_SECONDS = env.int('SEARCH_SUGGEST_REFRESH_SECONDS', default=300)
+# Construire l'index au démarrage du serveur web plutôt qu'à la première suggestion
+SEARCH_SUGGEST_WARMUP = env.bool('SEARCH_SUGGEST_WARMUP', default=True)
+
+# Répertoire des sauvegardes de la base (commande backup_database), volume "backups" en docker-compose
+BACKUP_ROOT = env('BACKUP_ROOT', default=str(BASE_DIR / 'backups'))
@@ -2,11 +2,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from dashboard.views import search
+from dashboard.views import search, search_section, search_suggest
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('search/', search, name='search'),
+    path('search/suggest/', search_suggest, name='search_suggest'),
+    path('search/<str:entity_type>/', search_section, name='search_section'),
     path('', include('dashboard.urls')),
     path('clients/', include('clients.urls')),
     path('factures/', include('factures.urls')),
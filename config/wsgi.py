@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Index des suggestions de recherche construit dès le démarrage, en arrière-plan
+from utils.suggest import warm_suggest_index  # noqa: E402
+warm_suggest_index()
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from utils.backups import get_database_backup, write_backup, rotate_backups
+
+
+class Command(BaseCommand):
+    help = "Sauvegarde native de la base (SQLite ou PostgreSQL) dans le répertoire des sauvegardes (par exemple via cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', type=str, help="Répertoire de destination (BACKUP_ROOT par défaut)")
+        parser.add_argument('--keep', type=int, help="Nombre de sauvegardes à conserver (toutes par défaut)")
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or str(settings.BACKUP_ROOT)
+        try:
+            path = write_backup(get_database_backup(), directory)
+        except Exception as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"Sauvegarde écrite : {path}"))
+
+        if options['keep']:
+            for removed in rotate_backups(directory, options['keep']):
+                self.stdout.write(f"Ancienne sauvegarde supprimée : {removed}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from dashboard.models import MonthlyRevenue
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement la table des chiffres d'affaires mensuels à partir des factures"
+
+    def handle(self, *args, **options):
+        count = MonthlyRevenue.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Chiffre d'affaires mensuel reconstruit ({count} ligne(s))"))
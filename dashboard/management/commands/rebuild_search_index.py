@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from dashboard.models import SearchDocument
+from utils.search import SEARCH_TYPES, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de la recherche globale (après une mise à jour hors signaux : import SQL, restauration...)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--types', nargs='+', choices=list(SEARCH_TYPES), help="Sections à reconstruire (toutes par défaut)")
+        parser.add_argument('--if-empty', action='store_true', help="Ne rien faire si l'index contient déjà des documents (démarrage du conteneur)")
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and SearchDocument.objects.exists():
+            self.stdout.write("Index de recherche déjà construit")
+            return
+
+        started = time.monotonic()
+        counts = rebuild_search_index(options['types'])
+        for entity_type, count in counts.items():
+            self.stdout.write(f"{entity_type}: {count} document(s)")
+        self.stdout.write(self.style.SUCCESS(f"Index de recherche reconstruit en {time.monotonic() - started:.1f} s"))
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from dashboard.models import ExportJob
+from utils.export_jobs import run_export_job
+
+
+class Command(BaseCommand):
+    help = "Traite les exports en attente (à lancer en continu si EXPORT_JOBS_IN_PROCESS est désactivé)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Traiter les exports en attente puis s'arrêter")
+        parser.add_argument('--interval', type=float, default=2.0, help="Délai entre deux recherches d'exports en attente (secondes)")
+
+    def handle(self, *args, **options):
+        while True:
+            purged = ExportJob.purge_expired()
+            if purged:
+                self.stdout.write(f"{purged} export(s) expiré(s) supprimé(s)")
+
+            pending = list(ExportJob.objects.filter(statut='en_attente').order_by('created_at').values_list('pk', flat=True))
+            for job_id in pending:
+                if run_export_job(job_id):
+                    job = ExportJob.objects.get(pk=job_id)
+                    if job.statut == 'termine':
+                        self.stdout.write(self.style.SUCCESS(f"Export {job_id} terminé ({job.rows_total} ligne(s)) : {job.file.name}"))
+                    else:
+                        self.stdout.write(self.style.ERROR(f"Export {job_id} en échec : {job.error}"))
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:45
+
+from django.db import migrations, models
+from django.db.models import Sum, Count
+from django.db.models.functions import ExtractYear, ExtractMonth
+
+
+def fill_monthly_revenue(apps, schema_editor):
+    Invoice = apps.get_model('factures', 'Invoice')
+    MonthlyRevenue = apps.get_model('dashboard', 'MonthlyRevenue')
+    rows = Invoice.objects.annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+    ).values('year', 'month', 'type').annotate(
+        total=Sum('amount_ht'),
+        count=Count('id'),
+    ).order_by()
+    MonthlyRevenue.objects.bulk_create([
+        MonthlyRevenue(year=row['year'], month=row['month'], type=row['type'], amount_ht=row['total'], invoice_count=row['count'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('factures', '0008_fill_deleted_client_entity_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('type', models.CharField(max_length=10)),
+                ('amount_ht', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('invoice_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': "Chiffre d'affaires mensuel",
+                'verbose_name_plural': "Chiffres d'affaires mensuels",
+                'ordering': ['year', 'month', 'type'],
+                'constraints': [models.UniqueConstraint(fields=('year', 'month', 'type'), name='unique_monthly_revenue')],
+            },
+        ),
+        migrations.RunPython(fill_monthly_revenue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_monthly_revenue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlyrevenue',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
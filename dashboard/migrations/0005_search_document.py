@@ -0,0 +1,90 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+# Index plein texte propres à chaque moteur, sur dashboard_searchdocument.content
+SEARCH_INDEX_SQL = {
+    # Tables FTS5 à contenu externe synchronisées par triggers : mots et trigrammes (recherche de
+    # sous-chaîne), chacune avec la section pour filtrer dans l'index.
+    # Attention : une migration qui reconstruit la table sous SQLite supprime ces triggers.
+    'sqlite': {
+        'create': [
+            "CREATE VIRTUAL TABLE dashboard_searchdocument_fts USING fts5("
+            "content, entity_type, content='dashboard_searchdocument', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+            "CREATE VIRTUAL TABLE dashboard_searchdocument_trigram USING fts5("
+            "content, entity_type, content='dashboard_searchdocument', content_rowid='id', tokenize='trigram')",
+            "CREATE TRIGGER dashboard_searchdocument_fts_insert AFTER INSERT ON dashboard_searchdocument BEGIN "
+            "INSERT INTO dashboard_searchdocument_fts(rowid, content, entity_type) VALUES (new.id, new.content, new.entity_type); "
+            "INSERT INTO dashboard_searchdocument_trigram(rowid, content, entity_type) VALUES (new.id, new.content, new.entity_type); END",
+            "CREATE TRIGGER dashboard_searchdocument_fts_delete AFTER DELETE ON dashboard_searchdocument BEGIN "
+            "INSERT INTO dashboard_searchdocument_fts(dashboard_searchdocument_fts, rowid, content, entity_type) VALUES ('delete', old.id, old.content, old.entity_type); "
+            "INSERT INTO dashboard_searchdocument_trigram(dashboard_searchdocument_trigram, rowid, content, entity_type) VALUES ('delete', old.id, old.content, old.entity_type); END",
+            "CREATE TRIGGER dashboard_searchdocument_fts_update AFTER UPDATE ON dashboard_searchdocument BEGIN "
+            "INSERT INTO dashboard_searchdocument_fts(dashboard_searchdocument_fts, rowid, content, entity_type) VALUES ('delete', old.id, old.content, old.entity_type); "
+            "INSERT INTO dashboard_searchdocument_trigram(dashboard_searchdocument_trigram, rowid, content, entity_type) VALUES ('delete', old.id, old.content, old.entity_type); "
+            "INSERT INTO dashboard_searchdocument_fts(rowid, content, entity_type) VALUES (new.id, new.content, new.entity_type); "
+            "INSERT INTO dashboard_searchdocument_trigram(rowid, content, entity_type) VALUES (new.id, new.content, new.entity_type); END",
+        ],
+        'drop': [
+            "DROP TRIGGER IF EXISTS dashboard_searchdocument_fts_insert",
+            "DROP TRIGGER IF EXISTS dashboard_searchdocument_fts_delete",
+            "DROP TRIGGER IF EXISTS dashboard_searchdocument_fts_update",
+            "DROP TABLE IF EXISTS dashboard_searchdocument_fts",
+            "DROP TABLE IF EXISTS dashboard_searchdocument_trigram",
+        ],
+    },
+    # tsvector calculé et stocké par PostgreSQL (colonne absente du modèle) avec index GIN,
+    # et index trigrammes pour la recherche de sous-chaîne
+    'postgresql': {
+        'create': [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            "ALTER TABLE dashboard_searchdocument ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED",
+            "CREATE INDEX dashboard_searchdocument_tsv ON dashboard_searchdocument USING gin (search_vector)",
+            "CREATE INDEX dashboard_searchdocument_trgm ON dashboard_searchdocument USING gin (content gin_trgm_ops)",
+        ],
+        'drop': [
+            "DROP INDEX IF EXISTS dashboard_searchdocument_tsv",
+            "DROP INDEX IF EXISTS dashboard_searchdocument_trgm",
+            "ALTER TABLE dashboard_searchdocument DROP COLUMN IF EXISTS search_vector",
+        ],
+    },
+}
+
+
+def create_search_index(apps, schema_editor):
+    for sql in SEARCH_INDEX_SQL.get(schema_editor.connection.vendor, {}).get('create', []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in SEARCH_INDEX_SQL.get(schema_editor.connection.vendor, {}).get('drop', []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_deleted_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('content', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Document de recherche',
+                'verbose_name_plural': 'Documents de recherche',
+                'constraints': [models.UniqueConstraint(fields=('entity_type', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
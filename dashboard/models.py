@@ -1,3 +1,232 @@
-from django.db import models
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Sum, Count
+from django.db.models.functions import ExtractYear, ExtractMonth
+
+from utils.dashboard_cache import invalidate_dashboard_cache
 
 # Create your models here.
+
+# Première clé des verrous consultatifs PostgreSQL de MonthlyRevenue (la seconde est le mois, AAAAMM)
+MONTHLY_REVENUE_LOCK = 7301
+
+
+class MonthlyRevenue(models.Model):
+    """
+    Chiffre d'affaires HT agrégé par mois et par type de facture.
+    Tenu à jour à chaque sauvegarde ou suppression de facture, il alimente
+    les graphiques sans relire la table des factures.
+    """
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    type = models.CharField(max_length=10)
+    amount_ht = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    invoice_count = models.PositiveIntegerField(default=0)
+    # Sert d'en-tête Last-Modified pour l'API des graphiques
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Chiffre d'affaires mensuel"
+        verbose_name_plural = "Chiffres d'affaires mensuels"
+        ordering = ['year', 'month', 'type']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month', 'type'], name='unique_monthly_revenue')
+        ]
+
+    def __str__(self):
+        return f"{self.month:02d}/{self.year} {self.type} : {self.amount_ht} €"
+
+    @classmethod
+    def lock_month(cls, year, month):
+        """
+        Sérialise les recalculs d'un même mois jusqu'à la fin de la transaction en cours.
+        Verrou consultatif sous PostgreSQL (le mois peut n'avoir encore aucune ligne à verrouiller) ;
+        SQLite n'accepte de toute façon qu'une transaction d'écriture à la fois.
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [MONTHLY_REVENUE_LOCK, year * 100 + month])
+
+    @classmethod
+    def refresh_month(cls, year, month):
+        """Recalcule les lignes d'un mois à partir des factures de ce mois"""
+        from factures.models import Invoice
+
+        with transaction.atomic():
+            # Totaux lus après le verrou : ils incluent les factures d'une transaction concurrente
+            # validée entre-temps, que le mode READ COMMITTED rend visibles à la requête suivante
+            cls.lock_month(year, month)
+            rows = list(Invoice.objects.filter(date__year=year, date__month=month).values('type').annotate(
+                total=Sum('amount_ht'),
+                count=Count('id'),
+            ).order_by())
+
+            cls.objects.bulk_create(
+                [
+                    cls(year=year, month=month, type=row['type'], amount_ht=row['total'], invoice_count=row['count'])
+                    for row in rows
+                ],
+                update_conflicts=True,
+                unique_fields=['year', 'month', 'type'],
+                update_fields=['amount_ht', 'invoice_count', 'updated_at'],
+            )
+            # Types qui n'ont plus de facture ce mois-ci
+            cls.objects.filter(year=year, month=month).exclude(type__in=[row['type'] for row in rows]).delete()
+
+    @classmethod
+    def refresh_for_dates(cls, *dates):
+        """Recalcule les mois concernés par une liste de dates (ancienne et nouvelle date d'une facture)"""
+        # Les dates peuvent encore être des chaînes si la facture a été créée sans passer par un formulaire
+        dates = [models.DateField().to_python(date) for date in dates if date]
+        # Mois toujours verrouillés dans le même ordre : pas d'interblocage entre deux déplacements de facture
+        for year, month in sorted({(date.year, date.month) for date in dates}):
+            cls.refresh_month(year, month)
+
+        if settings.CHART_PRERENDER:
+            from utils.charts import prerender_revenue_charts
+            # Après validation de la transaction, pour que le rendu lise les nouveaux montants
+            transaction.on_commit(prerender_revenue_charts)
+
+    @classmethod
+    def rebuild(cls):
+        """Reconstruit toute la table en une requête groupée sur les factures"""
+        from factures.models import Invoice
+
+        rows = Invoice.objects.annotate(
+            year=ExtractYear('date'),
+            month=ExtractMonth('date'),
+        ).values('year', 'month', 'type').annotate(
+            total=Sum('amount_ht'),
+            count=Count('id'),
+        ).order_by()
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            created = cls.objects.bulk_create([
+                cls(year=row['year'], month=row['month'], type=row['type'], amount_ht=row['total'], invoice_count=row['count'])
+                for row in rows
+            ])
+            # Moyennes mensuelles du tableau de bord
+            invalidate_dashboard_cache('factures.Invoice')
+        return len(created)
+
+
+class ExportJob(models.Model):
+    """
+    Export généré en arrière-plan (pool de threads du processus ou commande run_export_jobs).
+    Le fichier produit est stocké sous MEDIA_ROOT/exports et supprimé à l'expiration du job.
+    """
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('echec', 'Échec'),
+    ]
+
+    export_type = models.CharField(max_length=20)
+    export_format = models.CharField(max_length=10)
+    date_debut = models.DateField(null=True, blank=True)
+    date_fin = models.DateField(null=True, blank=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente')
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports', blank=True)
+    # Nom proposé au téléchargement (le fichier stocké porte un préfixe aléatoire)
+    filename = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    author = models.ForeignKey('users.CustomUser', on_delete=models.SET_NULL, related_name='export_jobs', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Export"
+        verbose_name_plural = "Exports"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['statut', 'created_at'], name='export_job_statut_idx'),
+        ]
+
+    def __str__(self):
+        return f"Export {self.export_type} ({self.export_format}) - {self.get_statut_display()}"
+
+    @property
+    def progress(self):
+        """Avancement en pourcentage, d'après le nombre de lignes écrites"""
+        if self.statut == 'termine':
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(99, int(self.rows_done * 100 / self.rows_total))
+
+    def delete_file(self):
+        if self.file:
+            self.file.delete(save=False)
+
+    @classmethod
+    def purge_expired(cls):
+        """
+        Supprime les jobs expirés et leurs fichiers, ainsi que les jobs jamais terminés
+        plus anciens que la durée de conservation (processus interrompu en cours d'export)
+        """
+        from datetime import timedelta
+        from django.utils import timezone
+
+        now = timezone.now()
+        expired = cls.objects.filter(
+            models.Q(expires_at__lt=now)
+            | models.Q(expires_at__isnull=True, created_at__lt=now - timedelta(hours=settings.EXPORT_JOB_TTL_HOURS))
+        )
+        count = 0
+        for job in expired:
+            job.delete_file()
+            job.delete()
+            count += 1
+        return count
+
+
+class DeletedRecord(models.Model):
+    """
+    Trace d'une suppression (client, contact, affaire, facture ou règlement),
+    enregistrée par signal post_delete : les exports incrémentaux la transmettent
+    pour que les copies des données puissent supprimer la ligne.
+    """
+    # Type d'export concerné : 'clients', 'contacts', 'affaires', 'factures' ou 'reglements'
+    export_type = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    # Identifiant lisible de la ligne supprimée (numéro de facture, d'affaire, nom...)
+    label = models.CharField(max_length=200, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Suppression"
+        verbose_name_plural = "Suppressions"
+        ordering = ['deleted_at']
+
+    def __str__(self):
+        return f"{self.export_type} {self.object_id} ({self.label})"
+
+
+class SearchDocument(models.Model):
+    """
+    Document indexé par la recherche globale : une ligne par client, contact, affaire ou facture,
+    avec le texte normalisé de ses champs recherchables (utils/search.py).
+    Tenu à jour par signaux ; l'index plein texte du moteur (FTS5 pour SQLite,
+    tsvector + trigrammes pour PostgreSQL) porte sur la colonne content.
+    """
+    # Section de la recherche : 'clients', 'contacts', 'affaires' ou 'factures'
+    entity_type = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    content = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Document de recherche"
+        verbose_name_plural = "Documents de recherche"
+        constraints = [
+            models.UniqueConstraint(fields=['entity_type', 'object_id'], name='unique_search_document')
+        ]
+
+    def __str__(self):
+        return f"{self.entity_type} {self.object_id}"
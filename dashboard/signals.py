@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from affaires.models import Affaire
+from clients.models import Client, Contact
+from factures.models import Invoice, Payment
+from dashboard.models import DeletedRecord
+from utils.dashboard_cache import invalidate_dashboard_cache
+from utils.search import SEARCH_TYPES, index_objects, remove_objects
+from utils.suggest import SUGGEST_TYPES, suggest_index
+
+
+# Modèles suivis par les exports incrémentaux : type d'export et libellé de la ligne supprimée
+TRACKED_DELETIONS = {
+    Client: ('clients', lambda client: client.entity_name),
+    Contact: ('contacts', str),
+    Affaire: ('affaires', lambda affaire: affaire.affaire_number),
+    Invoice: ('factures', lambda invoice: invoice.invoice_number),
+    Payment: ('reglements', lambda payment: f"{payment.invoice.invoice_number} - {payment.date} - {payment.amount}"),
+}
+
+
+def record_deletion(sender, instance, **kwargs):
+    export_type, get_label = TRACKED_DELETIONS[sender]
+    DeletedRecord.objects.create(export_type=export_type, object_id=instance.pk, label=str(get_label(instance) or '')[:200])
+
+
+for model in TRACKED_DELETIONS:
+    post_delete.connect(record_deletion, sender=model, dispatch_uid=f'record_deletion_{model.__name__}')
+
+
+@receiver(pre_delete, sender=Affaire, dispatch_uid='touch_affaire_contacts')
+def touch_affaire_contacts(sender, instance, **kwargs):
+    """Les contacts d'une affaire supprimée perdent leur affaire (SET_NULL, sans auto_now) : les marquer modifiés"""
+    instance.contacts.update(updated_at=timezone.now())
+
+
+# Lignes dont le parent exporte un agrégat (totaux facturés, total des affaires, contact principal) : clés étrangères vers le parent
+AGGREGATED_PARENTS = {
+    Invoice: 'affaire',
+    Affaire: 'client',
+    Contact: 'affaire',
+}
+
+
+def touch_previous_parent(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Une ligne qui change de parent modifie les agrégats de l'ancien parent, dont la date de modification
+    ne bouge pas et que la jointure de changed_with ne voit plus : le marquer modifié
+    """
+    field = sender._meta.get_field(AGGREGATED_PARENTS[sender])
+    if raw or instance._state.adding or (update_fields is not None and field.name not in update_fields):
+        return
+    field.related_model.objects.filter(**{field.related_query_name(): instance.pk}).exclude(
+        pk=getattr(instance, field.attname),
+    ).update(updated_at=timezone.now())
+
+
+def touch_deleted_parent(sender, instance, **kwargs):
+    """Les agrégats du parent d'une ligne supprimée changent aussi"""
+    field = sender._meta.get_field(AGGREGATED_PARENTS[sender])
+    field.related_model.objects.filter(pk=getattr(instance, field.attname)).update(updated_at=timezone.now())
+
+
+for model in AGGREGATED_PARENTS:
+    pre_save.connect(touch_previous_parent, sender=model, dispatch_uid=f'touch_previous_parent_{model.__name__}')
+    post_delete.connect(touch_deleted_parent, sender=model, dispatch_uid=f'touch_deleted_parent_{model.__name__}')
+
+
+# Index de la recherche globale : section de chaque modèle indexé
+SEARCH_MODELS = {search_type.model: entity_type for entity_type, search_type in SEARCH_TYPES.items()}
+
+
+def touches_search(entity_type, update_fields):
+    """Une sauvegarde limitée à des champs non recherchables (statut, soldes...) ne réindexe pas"""
+    return update_fields is None or bool(SEARCH_TYPES[entity_type].fields & set(update_fields))
+
+
+def index_search_document(sender, instance, update_fields=None, **kwargs):
+    entity_type = SEARCH_MODELS[sender]
+    if touches_search(entity_type, update_fields):
+        index_objects(entity_type, [instance.pk])
+
+
+def remove_search_document(sender, instance, **kwargs):
+    remove_objects(SEARCH_MODELS[sender], [instance.pk])
+
+
+for model in SEARCH_MODELS:
+    post_save.connect(index_search_document, sender=model, dispatch_uid=f'index_search_document_{model.__name__}')
+    post_delete.connect(remove_search_document, sender=model, dispatch_uid=f'remove_search_document_{model.__name__}')
+
+
+@receiver(post_save, sender=Affaire, dispatch_uid='index_affaire_dependents')
+def index_affaire_dependents(sender, instance, update_fields=None, **kwargs):
+    """Le numéro d'affaire figure aussi dans les documents du client et des factures de l'affaire"""
+    if update_fields is not None and not {'affaire_number', 'client'} & set(update_fields):
+        return
+    if instance.client_id:
+        index_objects('clients', [instance.client_id])
+    index_objects('factures', instance.invoices.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Affaire, dispatch_uid='index_deleted_affaire_client')
+def index_deleted_affaire_client(sender, instance, **kwargs):
+    if instance.client_id:
+        index_objects('clients', [instance.client_id])
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='index_author_documents')
+def index_author_documents(sender, instance, update_fields=None, **kwargs):
+    """Nom et email de l'auteur sont recherchables dans ses affaires et factures (pas à chaque connexion)"""
+    if kwargs.get('created') or (update_fields is not None and not {'email', 'first_name', 'last_name'} & set(update_fields)):
+        return
+    index_objects('affaires', instance.affaires.values_list('pk', flat=True))
+    index_objects('factures', instance.invoices.values_list('pk', flat=True))
+
+
+# Index des suggestions (en mémoire) : mis à jour après validation, une écriture annulée ne l'affecte pas
+SUGGEST_MODELS = {suggest_type.model: entity_type for entity_type, suggest_type in SUGGEST_TYPES.items()}
+
+
+def update_suggestion(sender, instance, update_fields=None, **kwargs):
+    entity_type = SUGGEST_MODELS[sender]
+    if update_fields is None or set(SUGGEST_TYPES[entity_type].fields) & set(update_fields):
+        transaction.on_commit(lambda: suggest_index.update(entity_type, instance))
+
+
+def remove_suggestion(sender, instance, **kwargs):
+    entity_type, pk = SUGGEST_MODELS[sender], instance.pk
+    transaction.on_commit(lambda: suggest_index.remove(entity_type, pk))
+
+
+for model in SUGGEST_MODELS:
+    post_save.connect(update_suggestion, sender=model, dispatch_uid=f'update_suggestion_{model.__name__}')
+    post_delete.connect(remove_suggestion, sender=model, dispatch_uid=f'remove_suggestion_{model.__name__}')
+
+
+# Cache des widgets du tableau de bord : invalidé après validation de chaque écriture
+def invalidate_dashboard_widgets(sender, **kwargs):
+    invalidate_dashboard_cache(sender._meta.label)
+
+
+for model in [Invoice, Payment, Affaire, Client]:
+    post_save.connect(invalidate_dashboard_widgets, sender=model, dispatch_uid=f'invalidate_dashboard_widgets_save_{model.__name__}')
+    post_delete.connect(invalidate_dashboard_widgets, sender=model, dispatch_uid=f'invalidate_dashboard_widgets_delete_{model.__name__}')
@@ -0,0 +1,254 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+import glob
+import os
+import tempfile
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from affaires.models import Affaire
+from clients.models import Client, Contact
+from factures.models import Invoice, Payment
+
+
+# Cache des widgets désactivé : chaque requête recalcule les pages
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def create_clients(count, start=0):
+    """`count` clients, chacun avec une affaire en cours, un contact, deux factures et un règlement"""
+    for index in range(start, start + count):
+        client = Client.objects.create(entity_name=f'Client {index}', city='Paris')
+        affaire = Affaire.objects.create(
+            client=client, affaire_number=f'A{index:04d}', affaire_description='Description', budget=Decimal('10000'),
+        )
+        Contact.objects.create(nom=f'Nom {index}', prenom='Prénom', email=f'contact{index}@example.com', affaire=affaire)
+        for number in range(2):
+            invoice = Invoice.objects.create(
+                date=date(2025, 1 + number, 15), affaire=affaire, client=client, invoice_number=f'F{index:04d}{number}',
+                invoice_object='Objet', amount_ht=Decimal('1000'),
+            )
+        Payment.objects.create(invoice=invoice, amount=Decimal('600'), date=date(2025, 3, 1), payment_method='virement')
+
+
+@override_settings(CACHES=NO_CACHE)
+class QueryCountTestCase(TestCase):
+    """Le nombre de requêtes d'une page ne doit pas dépendre du volume de données"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(email='test@example.com', password='test')
+        create_clients(2)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as context:
+            request()
+        return len(context)
+
+    def assertConstantQueries(self, *requests):
+        """Mêmes nombres de requêtes avec 2 puis 7 clients (et leurs affaires, factures, règlements)"""
+        small = [self.count_queries(request) for request in requests]
+        create_clients(5, start=2)
+        self.assertEqual([self.count_queries(request) for request in requests], small)
+
+
+class DashboardQueryCountTests(QueryCountTestCase):
+    def get_clients_page(self):
+        response = self.client.get(reverse('dashboard:clients'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_clients_page(self):
+        self.assertConstantQueries(self.get_clients_page)
+
+
+class MonthlyRevenueTests(TestCase):
+    def setUp(self):
+        create_clients(1)
+        self.invoice = Invoice.objects.get(invoice_number='F00000')
+
+    def month_rows(self, month):
+        from dashboard.models import MonthlyRevenue
+
+        return list(MonthlyRevenue.objects.filter(year=2025, month=month).values_list('type', 'amount_ht', 'invoice_count'))
+
+    def test_refresh_updates_rows_in_place(self):
+        from dashboard.models import MonthlyRevenue
+
+        row_id = MonthlyRevenue.objects.get(year=2025, month=1).pk
+        self.invoice.amount_ht = Decimal('1500')
+        self.invoice.save()
+        self.assertEqual(self.month_rows(1), [('facture', Decimal('1500'), 1)])
+        self.assertEqual(MonthlyRevenue.objects.get(year=2025, month=1).pk, row_id)
+
+    def test_refresh_removes_types_without_invoices(self):
+        self.invoice.type = 'avoir'
+        self.invoice.save()
+        self.assertEqual(self.month_rows(1), [('avoir', Decimal('-1000'), 1)])
+
+    def test_moving_an_invoice_refreshes_both_months(self):
+        self.invoice.date = date(2025, 2, 20)
+        self.invoice.save()
+        self.assertEqual(self.month_rows(1), [])
+        self.assertEqual(self.month_rows(2), [('facture', Decimal('2000'), 2)])
+
+
+class IncrementalExportTests(TestCase):
+    """Une ligne supprimée ou déplacée change les totaux exportés de son ancien parent"""
+
+    def setUp(self):
+        create_clients(2)
+        self.backdate()
+        self.since = timezone.now() - timedelta(hours=1)
+
+    def backdate(self):
+        """Lignes créées par setUp : modifiées avant `since`"""
+        for model in (Client, Contact, Affaire, Invoice, Payment):
+            model.objects.update(updated_at=timezone.now() - timedelta(days=1))
+
+    def changed(self, export_type):
+        from utils.export_rows import EXPORT_ROWS_BY_TYPE
+
+        return [values[1] for values in EXPORT_ROWS_BY_TYPE[export_type](since=self.since)]
+
+    def test_deleted_invoice_exports_its_affaire(self):
+        Invoice.objects.get(invoice_number='F00000').delete()
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('export_changes', since=self.since.isoformat(), types=['affaires'], output_dir=output_dir, stdout=StringIO())
+            path, = glob.glob(os.path.join(output_dir, '*.zip'))
+            with zipfile.ZipFile(path) as zipf:
+                affaires = zipf.read('affaires.csv').decode('utf-8-sig')
+        self.assertIn('A0000', affaires)
+        self.assertNotIn('A0001', affaires)
+
+    def test_moved_invoice_exports_both_affaires(self):
+        invoice = Invoice.objects.get(invoice_number='F00000')
+        invoice.affaire = Affaire.objects.get(affaire_number='A0001')
+        invoice.save()
+        self.assertEqual(self.changed('affaires'), ['A0000', 'A0001'])
+
+    def test_deleted_affaire_exports_its_client(self):
+        affaire = Affaire.objects.create(client=Client.objects.get(entity_name='Client 1'), affaire_number='A9999', budget=Decimal('500'))
+        self.backdate()
+        affaire.delete()
+        self.assertEqual(self.changed('clients'), ['Client 1'])
+
+    def test_moved_affaire_exports_both_clients(self):
+        affaire = Affaire.objects.get(affaire_number='A0000')
+        affaire.client = Client.objects.get(entity_name='Client 1')
+        affaire.save()
+        self.assertEqual(self.changed('clients'), ['Client 0', 'Client 1'])
+
+
+class SearchResultsTests(TestCase):
+    def setUp(self):
+        create_clients(1)
+        affaire = Affaire.objects.get(affaire_number='A0000')
+        for invoice_number in ('12345', 'F1234'):
+            Invoice.objects.create(
+                date=date(2025, 3, 15), affaire=affaire, client=affaire.client, invoice_number=invoice_number,
+                invoice_object='Objet', amount_ht=Decimal('1000'),
+            )
+
+    def test_prefix_and_substring_matches_are_merged(self):
+        from utils.search import SearchResults
+
+        results = SearchResults('factures', '1234')
+        self.assertEqual(results.count(), 2)
+        self.assertEqual([invoice.invoice_number for invoice in results[0:10]], ['12345', 'F1234'])
+
+
+class SuggestIndexTests(TestCase):
+    def setUp(self):
+        create_clients(2)
+
+    def test_writes_during_a_rebuild_are_kept(self):
+        from unittest import mock
+        from utils.suggest import SUGGEST_TYPES, SuggestIndex
+
+        index = SuggestIndex()
+        index.build()
+        suggest_type = SUGGEST_TYPES['clients']
+        renamed, deleted = Client.objects.order_by('pk')
+        # Lecture de la reconstruction faite avant les écritures, qui sont validées avant le remplacement de l'index
+        entries = list(suggest_type.iter_entries())
+
+        def iter_entries():
+            yield from entries
+            renamed.entity_name = 'Nouveau nom'
+            index.update('clients', renamed)
+            index.remove('clients', deleted.pk)
+
+        with mock.patch.object(suggest_type, 'iter_entries', iter_entries):
+            index.build()
+        self.assertEqual([result['label'] for result in index.suggest('client', 10)['clients']], [])
+        self.assertEqual([result['label'] for result in index.suggest('nouveau', 10)['clients']], ['Nouveau nom'])
+
+
+class ExportQueryCountTests(QueryCountTestCase):
+    """Chaque export (CSV et Excel) lit ses lignes en un nombre fixe de requêtes"""
+
+    def export(self, export_function):
+        def request():
+            response = export_function()
+            # Réponse lue en entier : les requêtes d'un export CSV sont faites pendant l'envoi
+            content = b''.join(response.streaming_content)
+            response.close()
+            self.assertTrue(content)
+        return request
+
+    def assertConstantExportQueries(self, csv_export, xlsx_export):
+        self.assertConstantQueries(self.export(csv_export), self.export(xlsx_export))
+
+    def test_factures(self):
+        from utils.exports import export_factures_csv, export_factures_xlsx
+        self.assertConstantExportQueries(export_factures_csv, export_factures_xlsx)
+
+    def test_reglements(self):
+        from utils.exports import export_reglements_csv, export_reglements_xlsx
+        self.assertConstantExportQueries(export_reglements_csv, export_reglements_xlsx)
+
+    def test_affaires(self):
+        from utils.exports import export_affaires_csv, export_affaires_xlsx
+        self.assertConstantExportQueries(export_affaires_csv, export_affaires_xlsx)
+
+    def test_clients(self):
+        from utils.exports import export_clients_csv, export_clients_xlsx
+        self.assertConstantExportQueries(export_clients_csv, export_clients_xlsx)
+
+    def test_contacts(self):
+        from utils.exports import export_contacts_csv, export_contacts_xlsx
+        self.assertConstantExportQueries(export_contacts_csv, export_contacts_xlsx)
+
+
+class DatabaseExportTests(TestCase):
+    """La sauvegarde n'est envoyée qu'une fois pg_dump terminé avec succès"""
+
+    def export_with_command(self, command):
+        from unittest import mock
+        from utils.backups import PostgreSQLBackup
+        from utils.exports import export_database
+
+        backup = PostgreSQLBackup()
+        with mock.patch('utils.exports.get_database_backup', return_value=backup), \
+                mock.patch.object(backup, 'get_command', return_value=command):
+            return export_database()
+
+    def test_failed_dump_raises_before_response(self):
+        with self.assertRaisesMessage(Exception, 'connexion refusée'):
+            self.export_with_command(['sh', '-c', 'printf partiel; echo "connexion refusée" >&2; exit 1'])
+
+    def test_successful_dump_is_sent(self):
+        response = self.export_with_command(['sh', '-c', 'printf archive'])
+        self.assertEqual(b''.join(response.streaming_content), b'archive')
+        response.close()
@@ -1,6 +1,6 @@
 
 from django.urls import path
-from .views import login, dashboard, chiffre_d_affaires, affaires, clients, logout_view, export_modal
+from .views import login, dashboard, chiffre_d_affaires, affaires, clients, logout_view, export_modal, export_job_status, export_job_download, revenue_api, revenue_chart_png
 
 app_name = 'dashboard'
 
@@ -11,5 +11,9 @@ urlpatterns = [
     path('dashboard/chiffre_d_affaires', chiffre_d_affaires, name="chiffre_d_affaires"),
     path('dashboard/affaires', affaires, name="affaires"),
     path('dashboard/clients', clients, name="clients"),
+    path('dashboard/api/revenue/', revenue_api, name="revenue_api"),
+    path('dashboard/charts/<str:kind>.png', revenue_chart_png, name="revenue_chart_png"),
     path('export/', export_modal, name="export"),
+    path('export/jobs/<int:pk>/', export_job_status, name="export_job_status"),
+    path('export/jobs/<int:pk>/telecharger/', export_job_download, name="export_job_download"),
 ]
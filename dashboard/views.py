@@ -1,20 +1,35 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth import authenticate, login as auth_login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.http import JsonResponse, Http404, FileResponse
+from django.conf import settings
+from django.utils.cache import add_never_cache_headers, get_conditional_response, patch_cache_control
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.http import http_date, quote_etag
 from factures.models import Invoice
 from affaires.models import Affaire
-from clients.models import Client, Contact
+from dashboard.models import ExportJob
 from datetime import datetime
-from utils.charts import generate_revenue_chart, generate_revenue_histogram_chart, generate_cumulative_revenue_chart, get_available_years, get_monthly_revenue_by_year, calculate_monthly_averages
+import hashlib
+import json
+import os
+from urllib.parse import urlencode
+from utils.charts import REVENUE_CHARTS, render_revenue_charts, get_available_years, get_monthly_revenue_by_year, calculate_monthly_averages, get_revenue_series
 from utils.exports import (
     export_database, export_clients_csv, export_clients_xlsx, 
     export_affaires_csv, export_affaires_xlsx, export_factures_csv, export_factures_xlsx, 
     export_database_csv, export_database_xlsx, export_contacts_csv, export_contacts_xlsx,
-    export_reglements_csv, export_reglements_xlsx
+    export_reglements_csv, export_reglements_xlsx, export_columnar, COLUMNAR_FORMATS
 )
+from utils.dashboard_cache import cached_widget
+from utils.export_jobs import is_async_export, create_export_job
+from utils.search import SEARCH_TYPES, SearchResults, count_results
+from utils.suggest import suggest_index
 from users.forms import CustomAuthenticationForm
 
 # Create your views here.
@@ -38,249 +53,282 @@ def login(request):
     
     return render(request, 'registration/login.html', {'form': form})
 
-@login_required
-def dashboard(request):
-    current_year = datetime.now().year
-    passed_year = datetime.now().year - 1
+def get_selected_years(request, available_years):
+    """
+    Années demandées (?years=2024&years=2025 ou ?years=2024,2025),
+    par défaut les deux dernières années disponibles
+    """
+    selected_years = [
+        int(year)
+        for value in request.GET.getlist('years')
+        for year in value.split(',')
+        if year.strip().isdigit()
+    ]
+    if selected_years:
+        return sorted(set(selected_years), reverse=True)
+    return available_years[:2]
+
+
+def get_years_query(years):
+    """Paramètres d'URL des années sélectionnées, transmis à l'API et aux images de secours"""
+    return urlencode([('years', year) for year in years])
+
+
+def format_euros(amount):
+    return f"{amount:,.2f} €".replace(",", " ").replace(".", ",")
+
+
+def compute_dashboard_kpis(current_year):
+    """Indicateurs de facturation du tableau de bord principal (widget 'kpis')"""
+    passed_year = current_year - 1
 
-    
     facturation = Invoice.objects.filter(date__year=current_year)
     total_facturation = sum(facture.amount_ht for facture in facturation)
-    formatted_total_facturation = f"{total_facturation:,.2f} €".replace(",", " ").replace(".", ",")
 
     # Total facture dues N
     factures_dues = [facture for facture in facturation if facture.statut != "payee"]
-    factures_dues_sorted = sorted(factures_dues, key=lambda facture: facture.due_date, reverse=False)
-    total_factures_dues = f"{sum(facture.amount_ttc for facture in factures_dues):,.2f} €".replace(",", " ").replace(".", ",")
 
     # Total facture dues cumulé
-    total_facturation_cumulee = Invoice.objects.all()
+    # Les statuts sont recalculés en tâche planifiée (commande refresh_invoice_statuses)
+    total_facturation_cumulee = Invoice.objects.select_related('client')
     total_factures_dues_cumule = [facture for facture in total_facturation_cumulee if facture.statut != "payee"]
-    
-    # Mise à jour automatique des statuts des factures non payées
-    for facture in total_factures_dues_cumule:
-        if facture.statut in ['a_payer', 'partiellement_payee']:
-            facture.update_statut()
-    
-    # Recalculer la liste après mise à jour des statuts
-    total_facturation_cumulee = Invoice.objects.all()
-    total_factures_dues_cumule = [facture for facture in total_facturation_cumulee if facture.statut != "payee"]
-    total_factures_dues_sorted = sorted(total_factures_dues_cumule, key=lambda facture: facture.due_date, reverse=False)
-    total_factures_dues_cumule_montant = f"{sum(facture.amount_ttc for facture in total_factures_dues_cumule):,.2f} €".replace(",", " ").replace(".", ",")
-
 
     # Factures en retard N
     factures_retard = [facture for facture in factures_dues if facture.statut == "en_retard"]
-    total_factures_retard = f"{sum(facture.amount_ttc for facture in factures_retard):,.2f} €".replace(",", " ").replace(".", ",")
 
     # Factures en retard N-1
     passed_facturation = Invoice.objects.filter(date__year=passed_year)
     passed_factures_retard = [facture for facture in passed_facturation if facture.statut == "en_retard"]
-    total_passed_factures_retard = f"{sum(facture.amount_ttc for facture in passed_factures_retard):,.2f} €".replace(",", " ").replace(".", ",")
 
+    return {
+        'total_facturation': total_facturation,
+        'formatted_total_facturation': format_euros(total_facturation),
+        'total_factures_dues': format_euros(sum(facture.amount_ttc for facture in factures_dues)),
+        'total_factures_dues_cumule': format_euros(sum(facture.amount_ttc for facture in total_factures_dues_cumule)),
+        'total_factures_retard': format_euros(sum(facture.amount_ttc for facture in factures_retard)),
+        'total_passed_factures_retard': format_euros(sum(facture.amount_ttc for facture in passed_factures_retard)),
+        # Total factures en retard cumulé : lignes du tableau rendues une fois, bien plus légères
+        # en cache que les factures elles-mêmes (plusieurs dizaines de milliers sur une grosse base)
+        'factures_retard_rows': render_to_string('pages/dashboard/factures_retard_rows.html', {
+            'factures_retard_cumule': [facture for facture in total_factures_dues_cumule if facture.statut == "en_retard"],
+        }),
+    }
+
+
+def compute_affaires_en_cours(ordering):
+    """Affaires restant à facturer et total formaté (widget 'open_affaires')"""
+    affaires_en_cours = list(
+        Affaire.objects.with_financials().select_related('client')
+        .filter(annotated_reste_a_facturer__gt=0)
+        .order_by(*ordering)
+    )
+    return affaires_en_cours, format_euros(sum(affaire.reste_a_facturer for affaire in affaires_en_cours))
+
+
+def get_revenue_widgets(request):
+    """Années disponibles, années sélectionnées et moyennes mensuelles du graphique de chiffre d'affaires"""
+    available_years = cached_widget('available_years', get_available_years)
+    selected_years = get_selected_years(request, available_years)
 
-    # Total factures en retard cumulé
-    factures_retard_cumule = [facture for facture in total_factures_dues_cumule if facture.statut == "en_retard"]
+    monthly_averages = None
+    if selected_years:
+        # Calculer les moyennes mensuelles
+        monthly_averages = cached_widget(
+            'monthly_averages',
+            lambda: calculate_monthly_averages(get_monthly_revenue_by_year(selected_years), selected_years),
+            ','.join(map(str, selected_years)),
+        )
+    return {
+        'available_years': available_years,
+        'selected_years': selected_years,
+        'monthly_averages': monthly_averages,
+        'years_query': get_years_query(selected_years),
+    }
 
-    # Affaires en cours
-    affaires = Affaire.objects.all()
-    affaires_en_cours = [affaire for affaire in affaires if affaire.reste_a_facturer > 0]
-    affaires_en_cours_sorted = sorted(affaires_en_cours, key=lambda affaire: affaire.reste_a_facturer, reverse=False)
-    total_affaires_en_cours = f"{sum(affaire.reste_a_facturer for affaire in affaires_en_cours):,.2f} €".replace(",", " ").replace(".", ",")
 
+@login_required
+def dashboard(request):
+    # Widgets en cache (utils/dashboard_cache.py), invalidés par les écritures sur les factures, paiements, affaires et clients
+    current_year = datetime.now().year
+    passed_year = datetime.now().year - 1
 
+    kpis = cached_widget('kpis', lambda: compute_dashboard_kpis(current_year), current_year)
 
-    # Gestion du graphique des chiffres d'affaires
-    available_years = get_available_years()
-    selected_years = request.GET.getlist('years')
-    
-    if selected_years:
-        selected_years = [int(year) for year in selected_years if year.isdigit()]
-    else:
-        # Par défaut, sélectionner les deux dernières années disponibles
-        selected_years = available_years[:2] if len(available_years) >= 2 else available_years
-    
-    chart_path = None
-    histogram_chart_path = None
-    cumulative_chart_path = None
-    monthly_averages = None
-    if selected_years:
-        try:
-            chart_path = generate_revenue_chart(selected_years)
-            histogram_chart_path = generate_revenue_histogram_chart(selected_years)
-            cumulative_chart_path = generate_cumulative_revenue_chart(selected_years)
-            
-            # Calculer les moyennes mensuelles
-            invoices = Invoice.objects.filter(date__year__in=selected_years)
-            revenue_data = get_monthly_revenue_by_year(invoices, selected_years)
-            monthly_averages = calculate_monthly_averages(revenue_data, selected_years)
-        except Exception as e:
-            print(f"Erreur lors de la génération du graphique: {e}")
+    # Affaires en cours
+    affaires_en_cours_sorted, total_affaires_en_cours = cached_widget(
+        'open_affaires', lambda: compute_affaires_en_cours(['annotated_reste_a_facturer', 'id']), 'asc'
+    )
 
+    # Gestion du graphique des chiffres d'affaires : les courbes sont dessinées par le navigateur
+    # à partir de revenue_api, la page ne transmet que les années sélectionnées
     return render(request, 'pages/dashboard/dashboard.html', {
         'current_year': current_year,
         'passed_year': passed_year,
-        'facturation': facturation,
-        'total_facturation': total_facturation,
-        'total_factures_dues_cumule': total_factures_dues_cumule_montant,
-        'factures_dues_sorted': factures_dues_sorted,
-        'formatted_total_facturation': formatted_total_facturation,
+        **kpis,
         'affaires_en_cours': affaires_en_cours_sorted,
         'total_affaires_en_cours': total_affaires_en_cours,
-        'factures_dues_sorted': factures_dues_sorted,
-        'total_factures_dues': total_factures_dues,
-        'factures_retard': factures_retard,
-        'total_factures_retard': total_factures_retard,
-        'total_passed_factures_retard': total_passed_factures_retard,
-        'factures_retard_cumule': factures_retard_cumule,
-        'chart_path': chart_path,
-        'histogram_chart_path': histogram_chart_path,
-        'cumulative_chart_path': cumulative_chart_path,
-        'monthly_averages': monthly_averages,
-        'available_years': available_years,
-        'selected_years': selected_years,
+        **get_revenue_widgets(request),
     })
 
 
+def compute_revenue_totals(current_year):
+    """Chiffre d'affaires HT de l'année en cours et de l'année précédente (widget 'revenue_totals')"""
+    total_facturation = sum(facture.amount_ht for facture in Invoice.objects.filter(date__year=current_year))
+    passed_total_facturation = sum(facture.amount_ht for facture in Invoice.objects.filter(date__year=current_year - 1))
+    return {
+        'formatted_total_facturation': format_euros(total_facturation),
+        'passed_formatted_total_facturation': format_euros(passed_total_facturation),
+    }
 
 
 @login_required
 def chiffre_d_affaires(request):
-    # Facturation année en cours
+    # Facturation année en cours et année dernière
     current_year = datetime.now().year
-    facturation = Invoice.objects.filter(date__year=current_year)
-    total_facturation = sum(facture.amount_ht for facture in facturation)
-    formatted_total_facturation = f"{total_facturation:,.2f} €".replace(",", " ").replace(".", ",")
-    
-    # Facturation année dernière
     passed_year = datetime.now().year - 1
-    passed_facturation = Invoice.objects.filter(date__year=passed_year)
-    passed_total_facturation = sum(facture.amount_ht for facture in passed_facturation)
-    passed_formatted_total_facturation = f"{passed_total_facturation:,.2f} €".replace(",", " ").replace(".", ",")
-
-
-
-
-        # Gestion du graphique des chiffres d'affaires
-    available_years = get_available_years()
-    selected_years = request.GET.getlist('years')
-    
-    if selected_years:
-        selected_years = [int(year) for year in selected_years if year.isdigit()]
-    else:
-        # Par défaut, sélectionner les deux dernières années disponibles
-        selected_years = available_years[:2] if len(available_years) >= 2 else available_years
-    
-    chart_path = None
-    histogram_chart_path = None
-    cumulative_chart_path = None
-    monthly_averages = None
-    if selected_years:
-        try:
-            chart_path = generate_revenue_chart(selected_years)
-            histogram_chart_path = generate_revenue_histogram_chart(selected_years)
-            cumulative_chart_path = generate_cumulative_revenue_chart(selected_years)
-            
-            # Calculer les moyennes mensuelles
-            invoices = Invoice.objects.filter(date__year__in=selected_years)
-            revenue_data = get_monthly_revenue_by_year(invoices, selected_years)
-            monthly_averages = calculate_monthly_averages(revenue_data, selected_years)
-        except Exception as e:
-            print(f"Erreur lors de la génération du graphique: {e}")
 
+    # Gestion du graphique des chiffres d'affaires : les courbes sont dessinées par le navigateur
+    # à partir de revenue_api, la page ne transmet que les années sélectionnées
     return render(request, 'pages/dashboard/chiffre_d_affaires.html', {
         'current_year': current_year,
         'passed_year': passed_year,
-        'formatted_total_facturation': formatted_total_facturation,
-        'passed_formatted_total_facturation': passed_formatted_total_facturation,
-        'chart_path': chart_path,
-        'histogram_chart_path': histogram_chart_path,
-        'available_years': available_years,
-        'cumulative_chart_path': cumulative_chart_path,
-        'monthly_averages': monthly_averages,
-        'selected_years': selected_years,
+        **cached_widget('revenue_totals', lambda: compute_revenue_totals(current_year), current_year),
+        **get_revenue_widgets(request),
     })
 
 
 @login_required
-def clients(request):
-    from django.db.models import Sum, Count
-    from clients.models import Client
-    from factures.models import Invoice
+def revenue_api(request):
+    """
+    Données JSON des graphiques de chiffre d'affaires (mensuel, histogramme, cumulé).
+    Réponse conditionnelle : ETag calculé sur les données, Last-Modified sur la table MonthlyRevenue,
+    le navigateur ne retélécharge les séries que si une facture des années demandées a changé.
+    """
+    from dashboard.models import MonthlyRevenue
     
-    # Top 5 des meilleurs clients par CA (chiffre d'affaires facturé)
-    top_5_clients_ca = []
-    clients_with_invoices = Client.objects.filter(affaires__invoices__isnull=False).distinct()
+    selected_years = get_selected_years(request, get_available_years())
+    payload = get_revenue_series(selected_years)
     
-    for client in clients_with_invoices:
-        total_facture = sum(invoice.amount_ht for invoice in Invoice.objects.filter(affaire__client=client))
-        nb_affaires = client.affaires.count()
-        
-        if total_facture > 0:
-            client.total_facture = total_facture
-            client.formatted_total_facture = f"{total_facture:,.2f} €".replace(",", " ").replace(".", ",")
-            client.nb_affaires = nb_affaires
-            top_5_clients_ca.append(client)
+    etag = quote_etag(hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16])
+    last_modified = MonthlyRevenue.objects.filter(year__in=selected_years).aggregate(last=Max('updated_at'))['last']
+    last_modified = int(last_modified.timestamp()) if last_modified else None
     
-    # Trier par total facturé décroissant et prendre les 5 premiers
-    top_5_clients_ca = sorted(top_5_clients_ca, key=lambda x: x.total_facture, reverse=True)[:5]
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(payload)
+    response.headers['ETag'] = etag
+    if last_modified:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    # Toujours revalider : les données changent à chaque facture saisie
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def revenue_chart_png(request, kind):
+    """
+    Image PNG de secours (navigateur sans JavaScript ou API indisponible).
+    Le rendu matplotlib se fait dans le pool de rendu : tant qu'il n'est pas terminé,
+    la page reçoit immédiatement une image d'attente au lieu de bloquer.
+    """
+    if kind not in REVENUE_CHARTS:
+        raise Http404("Graphique inconnu")
     
-    # Affaires en cours par client avec détails
-    clients_affaires_en_cours = []
-    all_clients = Client.objects.all()
+    selected_years = get_selected_years(request, get_available_years())
+    if not selected_years:
+        raise Http404("Aucune donnée disponible pour générer le graphique")
     
-    for client in all_clients:
-        affaires_en_cours = [affaire for affaire in client.affaires.all() if affaire.reste_a_facturer > 0]
-        if affaires_en_cours:
-            total_reste = sum(affaire.reste_a_facturer for affaire in affaires_en_cours)
-            client_data = {
-                'client': client,
-                'affaires_en_cours': affaires_en_cours,
-                'nb_affaires_en_cours': len(affaires_en_cours),
-                'total_reste_a_facturer': total_reste,
-                'formatted_total_reste': f"{total_reste:,.2f} €".replace(",", " ").replace(".", ",")
-            }
-            clients_affaires_en_cours.append(client_data)
+    chart_path = render_revenue_charts(selected_years, [kind], wait=False)[kind]
+    if chart_path is None:
+        response = redirect(static('img/chart-pending.svg'))
+        add_never_cache_headers(response)
+        return response
     
-    # Trier par nom de client alphabétique
-    clients_affaires_en_cours = sorted(clients_affaires_en_cours, key=lambda x: x['client'].entity_name.lower())
+    # Le nom du fichier contient l'empreinte des données : l'URL média peut être mise en cache sans limite
+    return redirect(f'{settings.MEDIA_URL}{chart_path}')
+
+
+def compute_top_clients_revenue():
+    """Top 5 des meilleurs clients par CA (chiffre d'affaires facturé) : une requête groupée (widget 'top_clients_revenue')"""
+    from django.db.models import Sum, Count
+    from clients.models import Client
+
+    top_5_clients_ca = list(
+        Client.objects.annotate(
+            total_facture=Sum('affaires__invoices__amount_ht'),
+            nb_affaires=Count('affaires', distinct=True),
+        ).filter(total_facture__gt=0).order_by('-total_facture')[:5]
+    )
+    for client in top_5_clients_ca:
+        client.formatted_total_facture = format_euros(client.total_facture)
+    return top_5_clients_ca
+
+
+def compute_clients_affaires_en_cours():
+    """Affaires en cours par client avec détails (widget 'clients_open_affaires')"""
+    from django.db.models import Prefetch
+    from django.db.models.functions import Lower
+    from clients.models import Client
+
+    # Clients concernés + un prefetch annoté des affaires
+    affaires_en_cours = Affaire.objects.with_financials().filter(annotated_reste_a_facturer__gt=0)
+    clients_en_cours = Client.objects.filter(
+        id__in=affaires_en_cours.values('client_id')
+    ).prefetch_related(
+        Prefetch('affaires', queryset=affaires_en_cours.order_by('id'), to_attr='affaires_en_cours')
+    ).order_by(Lower('entity_name'))
     
+    clients_affaires_en_cours = []
+    for client in clients_en_cours:
+        total_reste = sum(affaire.reste_a_facturer for affaire in client.affaires_en_cours)
+        clients_affaires_en_cours.append({
+            'client': client,
+            'affaires_en_cours': client.affaires_en_cours,
+            'nb_affaires_en_cours': len(client.affaires_en_cours),
+            'total_reste_a_facturer': total_reste,
+            'formatted_total_reste': format_euros(total_reste)
+        })
+    return clients_affaires_en_cours
+
+
+@login_required
+def clients(request):
     return render(request, 'pages/dashboard/clients.html', {
-        'top_5_clients_ca': top_5_clients_ca,
-        'clients_affaires_en_cours': clients_affaires_en_cours,
+        'top_5_clients_ca': cached_widget('top_clients_revenue', compute_top_clients_revenue),
+        'clients_affaires_en_cours': cached_widget('clients_open_affaires', compute_clients_affaires_en_cours),
     })
 
 
-@login_required
-def affaires(request):
+def compute_top_clients_budget():
+    """Top 10 des clients par total d'affaires (widget 'top_clients_budget')"""
     from django.db.models import Sum
     from clients.models import Client
-    
-    # Top 10 des affaires par budget (ordre décroissant)
-    top_10_affaires = Affaire.objects.all().order_by('-budget')[:10]
-    
-    # Top 10 des clients par total d'affaires
-    top_10_clients_raw = Client.objects.annotate(
-        total_budget=Sum('affaires__budget')
-    ).exclude(total_budget=None).order_by('-total_budget')[:10]
-    
+
+    top_10_clients = list(
+        Client.objects.annotate(
+            total_budget=Sum('affaires__budget')
+        ).exclude(total_budget=None).order_by('-total_budget')[:10]
+    )
     # Formatage des montants
-    top_10_clients = []
-    for client in top_10_clients_raw:
-        client.formatted_total_budget = f"{client.total_budget:,.2f} €".replace(",", " ").replace(".", ",")
-        top_10_clients.append(client)
+    for client in top_10_clients:
+        client.formatted_total_budget = format_euros(client.total_budget)
+    return top_10_clients
 
-    # Affaires en cours
-    affaires = Affaire.objects.all()
-    affaires_en_cours = [affaire for affaire in affaires if affaire.reste_a_facturer > 0]
-    affaires_en_cours_sorted = sorted(affaires_en_cours, key=lambda affaire: affaire.reste_a_facturer, reverse=True)
-    total_affaires_en_cours = f"{sum(affaire.reste_a_facturer for affaire in affaires_en_cours):,.2f} €".replace(",", " ").replace(".", ",")
 
+@login_required
+def affaires(request):
+    # Top 10 des affaires par budget (ordre décroissant)
+    top_10_affaires = cached_widget('top_affaires_budget', lambda: list(Affaire.objects.all().order_by('-budget')[:10]))
 
+    # Affaires en cours
+    affaires = Affaire.objects.all()
+    affaires_en_cours_sorted, total_affaires_en_cours = cached_widget(
+        'open_affaires', lambda: compute_affaires_en_cours(['-annotated_reste_a_facturer', 'id']), 'desc'
+    )
     
     return render(request, 'pages/dashboard/affaires.html', {
         'top_10_affaires': top_10_affaires,
-        'top_10_clients': top_10_clients,
+        'top_10_clients': cached_widget('top_clients_budget', compute_top_clients_budget),
         'affaires': affaires,
         'affaires_en_cours': affaires_en_cours_sorted,
         'total_affaires_en_cours': total_affaires_en_cours
@@ -293,62 +341,53 @@ def search(request):
     context = {'query': query}
     
     if query:
-        # Recherche dans les clients
-        clients = Client.objects.filter(
-            Q(entity_name__icontains=query) | 
-            Q(address__icontains=query) |
-            Q(affaires__affaire_number__icontains=query) |
-            Q(email__icontains=query)
-        ).distinct()
-        
-        # Recherche dans les contacts
-        contacts = Contact.objects.filter(
-            Q(prenom__icontains=query) |
-            Q(nom__icontains=query) |
-            Q(email__icontains=query) |
-            Q(phone_number__icontains=query)
-        )
-        
-        # Recherche dans les affaires
-        affaires = Affaire.objects.filter(
-            Q(affaire_number__icontains=query) |
-            Q(author__email__icontains=query) |
-            Q(author__first_name__icontains=query) |
-            Q(author__last_name__icontains=query) |
-            Q(affaire_description__icontains=query) |
-            Q(client_entity_name__icontains=query)
-        )
-        
-        # Recherche dans les factures
-        factures = Invoice.objects.filter(
-            Q(invoice_number__icontains=query) |
-            Q(client_entity_name__icontains=query) |
-            Q(invoice_object__icontains=query) |
-            Q(affaire__affaire_number__icontains=query)
-        )
-
-        # Recherche dans les autheurs  
-        factures = Invoice.objects.filter(
-            Q(invoice_number__icontains=query) |
-            Q(client_entity_name__icontains=query) |
-            Q(invoice_object__icontains=query) |
-            Q(affaire__affaire_number__icontains=query) |
-            Q(author__email__icontains=query) |
-            Q(author__first_name__icontains=query) |
-            Q(author__last_name__icontains=query)
-        )
-        
+        # Index de recherche (utils/search.py) : seuls les identifiants (plafonnés) sont lus ici,
+        # les résultats de chaque section sont chargés ensuite par search_section
+        results = count_results(query)
         context.update({
-            'clients': clients,
-            'contacts': contacts,
-            'affaires': affaires,
-            'factures': factures,
-            'has_results': any([clients, contacts, affaires, factures])
+            'sections': [
+                {
+                    'entity_type': entity_type,
+                    'label': SEARCH_TYPES[entity_type].label,
+                    'count': section.count(),
+                    'capped': section.capped,
+                }
+                for entity_type, section in results.items()
+            ],
+            'has_results': bool(results)
         })
     
     return render(request, 'pages/search/search_results.html', context)
 
 
+@login_required
+def search_section(request, entity_type):
+    """Page de résultats d'une section de la recherche (fragment HTML chargé par la page de recherche)"""
+    if entity_type not in SEARCH_TYPES:
+        raise Http404("Section de recherche inconnue")
+    query = request.GET.get('search', '').strip()
+    section = SearchResults(entity_type, query)
+    page = Paginator(section, settings.SEARCH_RESULTS_PER_PAGE).get_page(request.GET.get('page'))
+    return render(request, 'pages/search/search_section.html', {
+        'query': query,
+        'entity_type': entity_type,
+        'page': page,
+        'page_range': page.paginator.get_elided_page_range(page.number, on_each_side=2, on_ends=1),
+        'capped': section.capped,
+    })
+
+
+@login_required
+def search_suggest(request):
+    """Suggestions de la barre de recherche (à chaque frappe) : index en mémoire, sans requête en base"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', settings.SEARCH_SUGGEST_LIMIT)), 1), 20)
+    except ValueError:
+        limit = settings.SEARCH_SUGGEST_LIMIT
+    return JsonResponse({'query': query, 'results': suggest_index.suggest(query, limit)})
+
+
 @login_required
 def export_modal(request):
     """Vue pour gérer les exports via la modale"""
@@ -365,6 +404,15 @@ def export_modal(request):
             if date_fin:
                 date_fin = datetime.strptime(date_fin, '%Y-%m-%d').date()
             
+            # Exports longs (base complète) : générés en arrière-plan, la modale suit l'avancement
+            if is_async_export(export_type, export_format):
+                job = create_export_job(export_type, export_format, date_debut, date_fin, author=request.user)
+                return JsonResponse(export_job_payload(job), status=202)
+            
+            # Formats colonnes (Parquet / Arrow) pour les outils d'analyse
+            if export_format in COLUMNAR_FORMATS and export_type != 'database':
+                return export_columnar(export_type, export_format, date_debut, date_fin)
+            
             # Export de la base de données
             if export_type == 'database':
                 if export_format == 'sql':
@@ -417,6 +465,40 @@ def export_modal(request):
     return JsonResponse({'error': 'Méthode non autorisée'}, status=405)
 
 
+def export_job_payload(job):
+    """État d'un export en arrière-plan, tel que lu par la modale d'export"""
+    return {
+        'id': job.pk,
+        'statut': job.statut,
+        'statut_display': job.get_statut_display(),
+        'rows_done': job.rows_done,
+        'rows_total': job.rows_total,
+        'progress': job.progress,
+        'error': job.error,
+        'status_url': reverse('dashboard:export_job_status', args=[job.pk]),
+        'download_url': reverse('dashboard:export_job_download', args=[job.pk]) if job.statut == 'termine' else None,
+    }
+
+
+@login_required
+def export_job_status(request, pk):
+    """Avancement d'un export en arrière-plan (interrogé régulièrement par la modale)"""
+    job = get_object_or_404(ExportJob, pk=pk, author=request.user)
+    response = JsonResponse(export_job_payload(job))
+    add_never_cache_headers(response)
+    return response
+
+
+@login_required
+def export_job_download(request, pk):
+    """Téléchargement du fichier d'un export terminé"""
+    job = get_object_or_404(ExportJob, pk=pk, author=request.user, statut='termine')
+    if not job.file or not os.path.exists(job.file.path):
+        raise Http404("Le fichier d'export n'existe plus")
+    
+    return FileResponse(open(job.file.path, 'rb'), as_attachment=True, filename=job.filename)
+
+
 def logout_view(request):
     logout(request)
     # messages.success(request, 'Vous avez été déconnecté avec succès.')
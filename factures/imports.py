@@ -0,0 +1,428 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+import hashlib
+import os
+import django
+import pandas as pd
+from django.db import transaction
+
+from affaires.models import Affaire
+from clients.models import Client
+from factures.models import Invoice, Payment
+from factures.services import refresh_invoice_statuses
+from utils.dashboard_cache import invalidate_dashboard_cache
+from utils.search import index_objects, index_loaded_objects
+from utils.suggest import suggest_index
+
+
+# Colonnes du fichier d'import -> colonnes utilisées par l'import
+IMPORT_COLUMNS = {
+    'CLIENT': 'client_name',
+    'N° Affaire': 'affaire_number',
+    'Designation affaire': 'affaire_description',
+    'N° facture': 'invoice_number',
+    'Type': 'type',
+    'Montant HT': 'amount_ht',
+    'Date Facture': 'date',
+    'Date encaissement': 'payment_date',
+    'Montant encaissé €TTC': 'payment_amount',
+}
+
+# Valeurs acceptées dans la colonne Type
+IMPORT_TYPES = [value for value, _ in Invoice.TYPE_CHOICES]
+# Taux de TVA appliqué aux factures importées
+IMPORT_VAT_RATE = Decimal('20.0')
+# Moyen de paiement des encaissements importés (virement)
+IMPORT_PAYMENT_METHOD = 'VRT'
+# Nombre de valeurs par requête IN (...) : reste sous la limite de variables de SQLite
+LOOKUP_CHUNK_SIZE = 500
+
+
+def file_sha256(path):
+    """Empreinte du fichier importé, pour ne reprendre un import que sur le même contenu"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_import_chunks(path, chunk_size, start=0, delimiter=';'):
+    """
+    Lit le fichier d'import par paquets de `chunk_size` lignes de données, à partir de la ligne `start`,
+    sans charger tout le fichier : openpyxl en lecture seule pour Excel, read_csv par morceaux pour CSV.
+    Produit des tuples (nombre de lignes lues, DataFrame) ; l'index du DataFrame est la position
+    de la ligne dans le fichier, les numéros de ligne des erreurs restent donc ceux du fichier complet.
+    """
+    if os.path.splitext(path)[1].lower() == '.csv':
+        reader = pd.read_csv(
+            path, sep=delimiter, dtype=str, encoding='utf-8-sig',
+            chunksize=chunk_size, skiprows=range(1, start + 1),
+        )
+        with reader:
+            for chunk in reader:
+                chunk.index = chunk.index + start
+                chunk.columns = chunk.columns.str.strip()
+                yield len(chunk), chunk
+        return
+
+    # Import différé : openpyxl ne sert qu'à la lecture des fichiers Excel
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        headers = [str(header).strip() if header is not None else '' for header in next(rows, ())]
+        rows = islice(rows, start, None)
+        position = start
+        while values := list(islice(rows, chunk_size)):
+            chunk = pd.DataFrame(values, columns=headers, index=range(position, position + len(values)))
+            position += len(values)
+            # Lignes entièrement vides (fin de feuille) : ignorées, comme le fait pd.read_excel
+            yield len(values), chunk.dropna(how='all')
+    finally:
+        wb.close()
+
+
+def normalize_currency_column(series):
+    """Retire espaces et symbole € et remplace la virgule décimale : texte prêt pour Decimal"""
+    return (
+        series.astype(str)
+        .str.replace('€', '', regex=False)
+        .str.replace(r'\s', '', regex=True)
+        .str.replace(',', '.', regex=False)
+    )
+
+
+def invalid_currency_mask(series):
+    """Lignes dont le montant est renseigné mais illisible (importé à 0 sinon)"""
+    cleaned = normalize_currency_column(series)
+    return series.notna() & (cleaned != '') & pd.to_numeric(cleaned, errors='coerce').isna()
+
+
+def clean_currency_column(series):
+    """
+    Nettoie une colonne de montants (espaces, €, virgule décimale) en une fois
+    et la convertit en Decimal ; une valeur vide ou illisible vaut 0
+    """
+    cleaned = normalize_currency_column(series)
+    valid = series.notna() & pd.to_numeric(cleaned, errors='coerce').notna()
+    return pd.Series(
+        [Decimal(value) if ok else Decimal('0') for value, ok in zip(cleaned, valid)],
+        index=series.index, dtype=object,
+    )
+
+
+def parse_date_column(series):
+    """
+    Convertit une colonne de dates Excel (dates ou texte JJ/MM/AAAA) en dates Python ;
+    une valeur vide ou illisible vaut None
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        parsed = series
+    else:
+        is_text = series.map(lambda value: isinstance(value, str))
+        parsed = pd.to_datetime(series.where(is_text).str.strip(), format='%d/%m/%Y', errors='coerce')
+        is_date = series.map(lambda value: isinstance(value, (datetime, date)))
+        parsed = parsed.fillna(pd.to_datetime(series.where(is_date), errors='coerce'))
+    return parsed.dt.date.astype(object).where(parsed.notna(), None)
+
+
+def clean_rows(df):
+    """Colonnes du fichier nettoyées et converties (une ligne par ligne du fichier, sans filtrage)"""
+    missing = [column for column in IMPORT_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+
+    rows = pd.DataFrame({'line': df.index + 1}, index=df.index)
+    for source in ('CLIENT', 'N° Affaire', 'Designation affaire', 'N° facture', 'Type'):
+        rows[IMPORT_COLUMNS[source]] = df[source].astype(str).str.strip()
+    rows['amount_ht'] = clean_currency_column(df['Montant HT'])
+    rows['date'] = parse_date_column(df['Date Facture'])
+    rows['payment_date'] = parse_date_column(df['Date encaissement'])
+    rows['payment_amount'] = clean_currency_column(df['Montant encaissé €TTC'])
+    rows['has_payment'] = rows['payment_date'].notna() & df['Montant encaissé €TTC'].notna()
+    return rows
+
+
+def signs(series):
+    """Signe (-1, 0, 1) d'une colonne de Decimal"""
+    return series.map(lambda amount: (amount > 0) - (amount < 0)).astype(int)
+
+
+def get_row_checks(df, rows):
+    """
+    Contrôles qui écartent une ligne, à l'import comme à la validation seule :
+    tuples (masque des lignes en erreur, colonne du fichier, code, message)
+    """
+    return [
+        (df['N° facture'].isna() | (rows['invoice_number'] == ''), 'N° facture', 'missing_invoice_number', "Numéro de facture manquant"),
+        (rows['invoice_number'].str.len() > 10, 'N° facture', 'invoice_number_too_long', "Numéro de facture trop long (10 caractères maximum)"),
+        (rows['affaire_number'].str.len() > 10, 'N° Affaire', 'affaire_number_too_long', "Numéro d'affaire trop long (10 caractères maximum)"),
+        (rows['client_name'].str.len() > 100, 'CLIENT', 'client_name_too_long', "Nom de client trop long (100 caractères maximum)"),
+        (rows['type'].str.len() > 10, 'Type', 'type_too_long', "Type de facture trop long (10 caractères maximum)"),
+        (~rows['type'].isin(IMPORT_TYPES), 'Type', 'unknown_type', f"Type inconnu (valeurs acceptées : {', '.join(IMPORT_TYPES)})"),
+        (rows['amount_ht'].map(lambda amount: abs(amount) >= Decimal('1e8')), 'Montant HT', 'amount_too_large', "Montant HT trop élevé"),
+        (rows['date'].isna(), 'Date Facture', 'invalid_date', "Date de facture manquante ou invalide"),
+        # Un avoir peut être saisi en positif (inversé à l'import, voir Invoice.clean),
+        # mais son montant et son encaissement doivent être de même signe
+        (
+            (rows['type'] == 'avoir') & rows['has_payment'] & (signs(rows['amount_ht']) * signs(rows['payment_amount']) < 0),
+            'Montant encaissé €TTC', 'avoir_sign_mismatch', "Avoir dont le montant et l'encaissement sont de signes opposés",
+        ),
+    ]
+
+
+def get_row_warnings(df, rows):
+    """
+    Anomalies qui n'écartent pas la ligne (valeur remplacée ou ignorée à l'import),
+    signalées par la validation seule : même format que get_row_checks
+    """
+    return [
+        (invalid_currency_mask(df['Montant HT']), 'Montant HT', 'invalid_amount', "Montant HT illisible (importé à 0)"),
+        (invalid_currency_mask(df['Montant encaissé €TTC']), 'Montant encaissé €TTC', 'invalid_payment_amount', "Montant encaissé illisible (importé à 0)"),
+        (df['Date encaissement'].notna() & rows['payment_date'].isna(), 'Date encaissement', 'invalid_payment_date', "Date d'encaissement invalide (encaissement ignoré)"),
+        # Une facture négative est sans doute un avoir
+        ((rows['type'] != 'avoir') & (signs(rows['amount_ht']) < 0), 'Montant HT', 'negative_amount', "Montant négatif sur une ligne qui n'est pas un avoir"),
+    ]
+
+
+def prepare_rows(df):
+    """
+    Nettoie le fichier colonne par colonne. Retourne (lignes valides, erreurs) :
+    les erreurs sont des tuples (numéro de ligne, message) pour les lignes écartées.
+    """
+    rows = clean_rows(df)
+
+    # Contrôles faits avant l'insertion : une ligne invalide ferait échouer tout un lot
+    checks = [(mask, message) for mask, _, _, message in get_row_checks(df, rows)]
+    checks.append((rows.duplicated('invoice_number', keep='first'), "Numéro de facture en double dans le fichier"))
+    invalid = pd.Series(False, index=rows.index)
+    errors = []
+    for mask, message in checks:
+        mask = mask & ~invalid
+        errors.extend((line, message) for line in rows.loc[mask, 'line'])
+        invalid |= mask
+
+    # Les avoirs sont toujours négatifs (voir Invoice.clean)
+    avoir = (rows['type'] == 'avoir') & rows['amount_ht'].map(lambda amount: amount > 0)
+    rows.loc[avoir, 'amount_ht'] = rows.loc[avoir, 'amount_ht'].map(lambda amount: -amount)
+
+    return rows[~invalid], sorted(errors)
+
+
+def report_value(value):
+    """Valeur brute d'une cellule, sérialisable en JSON pour le rapport de validation"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (int, float, str)):
+        return value
+    return str(value)
+
+
+def validate_chunk(df):
+    """
+    Contrôle d'un paquet de lignes, sans accès à la base (exécuté dans un processus du pool).
+    Retourne (anomalies, numéros de facture [(ligne, numéro)]) : les doublons entre paquets
+    sont recherchés ensuite sur l'ensemble du fichier.
+    """
+    rows = clean_rows(df)
+    checks = [(*check, 'error') for check in get_row_checks(df, rows)]
+    checks += [(*check, 'warning') for check in get_row_warnings(df, rows)]
+
+    issues = []
+    for mask, column, code, message, level in checks:
+        for index in rows.index[mask.fillna(False).astype(bool)]:
+            issues.append({
+                'line': int(rows.at[index, 'line']),
+                'column': column,
+                'value': report_value(df.at[index, column]),
+                'code': code,
+                'level': level,
+                'message': message,
+            })
+
+    filled = df['N° facture'].notna() & (rows['invoice_number'] != '')
+    numbers = list(zip(rows.loc[filled, 'line'].astype(int), rows.loc[filled, 'invoice_number']))
+    return issues, numbers
+
+
+def validate_file(path, chunk_size=1000, workers=None, delimiter=';'):
+    """
+    Validation complète d'un fichier d'import sans écrire en base : les paquets de lignes
+    sont contrôlés en parallèle par un pool de processus, puis les numéros de facture
+    en double sont recherchés sur tout le fichier. Retourne le rapport (dictionnaire sérialisable en JSON).
+    """
+    workers = workers or os.cpu_count() or 1
+    rows_count = 0
+    issues = []
+    numbers = []
+
+    def collect(future):
+        chunk_issues, chunk_numbers = future.result()
+        issues.extend(chunk_issues)
+        numbers.extend(chunk_numbers)
+
+    # Chaque processus configure Django pour pouvoir importer ce module
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        pending = deque()
+        for read, chunk in read_import_chunks(path, chunk_size, delimiter=delimiter):
+            rows_count += read
+            pending.append(executor.submit(validate_chunk, chunk))
+            # Deux paquets en attente par processus au plus : le fichier n'est jamais entier en mémoire
+            if len(pending) >= 2 * workers:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+
+    first_lines = {}
+    for line, number in sorted(numbers):
+        if number in first_lines:
+            issues.append({
+                'line': line,
+                'column': 'N° facture',
+                'value': number,
+                'code': 'duplicate_invoice_number',
+                'level': 'error',
+                'message': "Numéro de facture en double dans le fichier",
+                'first_line': first_lines[number],
+            })
+        else:
+            first_lines[number] = line
+
+    issues.sort(key=lambda issue: (issue['line'], issue['column']))
+    errors_count = sum(1 for issue in issues if issue['level'] == 'error')
+    return {
+        'file': os.path.basename(path),
+        'rows': rows_count,
+        'invalid_rows': len({issue['line'] for issue in issues if issue['level'] == 'error'}),
+        'errors': errors_count,
+        'warnings': len(issues) - errors_count,
+        'issues': issues,
+    }
+
+
+def chunked(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def get_or_create_clients(names, batch_size):
+    """Clients par nom : une requête par paquet de noms, puis création groupée des manquants"""
+    clients = {}
+    for names_chunk in chunked(names):
+        for client in Client.objects.filter(entity_name__in=names_chunk).order_by('pk'):
+            clients.setdefault(client.entity_name, client)
+
+    missing = [Client(entity_name=name) for name in names if name not in clients]
+    for client in Client.objects.bulk_create(missing, batch_size=batch_size):
+        clients[client.entity_name] = client
+    return clients, missing
+
+
+def get_or_create_affaires(rows, clients, batch_size):
+    """Affaires par numéro ; une affaire manquante reprend le client et la désignation de sa première ligne"""
+    first_rows = rows.drop_duplicates('affaire_number')
+    affaires = {}
+    for numbers_chunk in chunked(first_rows['affaire_number']):
+        for affaire in Affaire.objects.filter(affaire_number__in=numbers_chunk):
+            affaires[affaire.affaire_number] = affaire
+
+    missing = []
+    for row in first_rows.itertuples(index=False):
+        if row.affaire_number not in affaires:
+            client = clients[row.client_name]
+            missing.append(Affaire(
+                affaire_number=row.affaire_number,
+                client=client,
+                client_entity_name=client.entity_name,
+                affaire_description=row.affaire_description,
+                # Budget à ajuster manuellement après import
+                budget=Decimal('0'),
+            ))
+    for affaire in Affaire.objects.bulk_create(missing, batch_size=batch_size):
+        affaires[affaire.affaire_number] = affaire
+    return affaires, missing
+
+
+def import_invoice_rows(df, batch_size=1000):
+    """
+    Import groupé des factures et encaissements d'un fichier Excel, dans une seule transaction :
+    colonnes nettoyées par pandas, clients et affaires résolus en mémoire, insertions par bulk_create.
+    Les statuts, le chiffre d'affaires mensuel et l'index de recherche sont mis à jour une fois à la fin.
+    Retourne (nombre d'objets créés par type, erreurs [(ligne, message)]).
+    """
+    rows, errors = prepare_rows(df)
+
+    with transaction.atomic():
+        # Factures déjà présentes en base : écartées comme le faisait la contrainte d'unicité
+        existing = set()
+        for numbers_chunk in chunked(rows['invoice_number']):
+            existing.update(Invoice.objects.filter(invoice_number__in=numbers_chunk).values_list('invoice_number', flat=True))
+        duplicate = rows['invoice_number'].isin(existing)
+        errors.extend((line, "La facture existe déjà") for line in rows.loc[duplicate, 'line'])
+        errors.sort()
+        rows = rows[~duplicate]
+
+        clients, created_clients = get_or_create_clients(rows['client_name'].unique().tolist(), batch_size)
+        affaires, created_affaires = get_or_create_affaires(rows, clients, batch_size)
+
+        invoices = []
+        payments = []
+        for row in rows.itertuples(index=False):
+            client = clients[row.client_name]
+            invoice = Invoice(
+                invoice_number=row.invoice_number,
+                affaire=affaires[row.affaire_number],
+                client=client,
+                client_entity_name=client.entity_name,
+                type=row.type,
+                amount_ht=row.amount_ht,
+                vat_rate=IMPORT_VAT_RATE,
+                date=row.date,
+            )
+            # Colonnes calculées habituellement par Invoice.save() et Payment.save()
+            invoice.amount_ttc = invoice.compute_amount_ttc()
+            invoice.total_paid = row.payment_amount if row.has_payment else Decimal('0')
+            invoice.balance = invoice.amount_ttc - invoice.total_paid
+            invoices.append(invoice)
+            if row.has_payment:
+                payments.append(Payment(invoice=invoice, amount=row.payment_amount, date=row.payment_date, payment_method=IMPORT_PAYMENT_METHOD))
+
+        Invoice.objects.bulk_create(invoices, batch_size=batch_size)
+        Payment.objects.bulk_create(payments, batch_size=batch_size)
+
+        # Statuts calculés une seule fois, par requêtes UPDATE groupées
+        for ids_chunk in chunked([invoice.pk for invoice in invoices]):
+            refresh_invoice_statuses(invoices=Invoice.objects.filter(pk__in=ids_chunk))
+
+        # Import local pour éviter les problèmes de circularité
+        from dashboard.models import MonthlyRevenue
+        MonthlyRevenue.refresh_for_dates(*{invoice.date.replace(day=1) for invoice in invoices})
+
+        # bulk_create n'envoie pas de signaux : index de recherche mis à jour ici
+        # (les clients des nouvelles affaires gagnent un numéro d'affaire recherchable)
+        index_objects('clients', {client.pk for client in created_clients} | {affaire.client_id for affaire in created_affaires})
+        index_loaded_objects('affaires', created_affaires)
+        index_loaded_objects('factures', invoices)
+        transaction.on_commit(lambda: (
+            suggest_index.update_many('clients', created_clients),
+            suggest_index.update_many('affaires', created_affaires),
+            suggest_index.update_many('factures', invoices),
+        ))
+        # Ni les signaux d'invalidation du cache des widgets du tableau de bord
+        invalidate_dashboard_cache()
+
+    counts = {
+        'clients': len(created_clients),
+        'affaires': len(created_affaires),
+        'factures': len(invoices),
+        'paiements': len(payments),
+    }
+    return counts, errors
@@ -1,147 +1,132 @@
-import pandas as pd
-from django.core.management.base import BaseCommand
-from clients.models import Client
-from affaires.models import Affaire
-from factures.models import Invoice
-from decimal import Decimal
-from datetime import datetime
+import json
+import os
+import sys
+import time
+from collections import Counter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from factures.imports import file_sha256, read_import_chunks, import_invoice_rows, validate_file
+from factures.models import ImportRun
 
 class Command(BaseCommand):
-    help = 'Importe les factures depuis un fichier Excel'
+    help = (
+        'Importe les factures depuis un fichier Excel (ou CSV), par lots validés un à un. '
+        'Après une interruption, --resume reprend après le dernier lot validé. '
+        '--validate-only contrôle tout le fichier sans rien écrire en base.'
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument('excel_file', type=str, help='Chemin vers le fichier Excel')
+        parser.add_argument('excel_file', type=str, help='Chemin vers le fichier Excel (.xlsx) ou CSV')
+        parser.add_argument('--batch-size', type=int, default=1000, help="Nombre de lignes lues, insérées et validées par lot")
+        parser.add_argument('--resume', action='store_true', help="Reprendre le dernier import interrompu de ce fichier")
+        parser.add_argument('--delimiter', type=str, default=';', help="Séparateur des fichiers CSV")
+        parser.add_argument('--validate-only', action='store_true', help="Contrôler toutes les lignes sans rien importer")
+        parser.add_argument('--workers', type=int, default=None, help="Nombre de processus de validation (par défaut : nombre de CPU)")
+        parser.add_argument('--report', type=str, default=None, help="Rapport de validation JSON à écrire ('-' pour la sortie standard)")
 
     def handle(self, *args, **options):
         excel_file = options['excel_file']
-        
-        # Lire le fichier Excel
-        df = pd.read_excel(excel_file)
-        
-        # Nettoyer les colonnes (enlever les espaces)
-        df.columns = df.columns.str.strip()
-        
-        self.stdout.write("Début de l'importation...")
-        
-        for index, row in df.iterrows():
-            try:
-                # 1. Créer ou récupérer le client
-                client_name = str(row['CLIENT']).strip()
-                client, created = Client.objects.get_or_create(
-                    entity_name=client_name,
-                    defaults={'entity_name': client_name}
-                )
-                if created:
-                    self.stdout.write(f"Client créé: {client_name}")
-                
-                # 2. Créer ou récupérer l'affaire
-                affaire_number = str(row['N° Affaire']).strip()
-                affaire_desc = str(row['Designation affaire']).strip()
-                
-                # Estimer le budget basé sur le montant de la facture (à ajuster)
-                montant_ht = 0.00 # Montant à ajuster manuellement après import
-                
-                affaire, created = Affaire.objects.get_or_create(
-                    affaire_number=affaire_number,
-                    defaults={
-                        'client': client,
-                        'affaire_description': affaire_desc,
-                        'budget': montant_ht  # À ajuster selon tes besoins
-                    }
-                )
-                if created:
-                    self.stdout.write(f"Affaire créée: {affaire_number}")
-                
-                # 3. Créer la facture
-                invoice_number = str(row['N° facture']).strip()
-                invoice_type = str(row['Type']).strip()
-                
-                # Nettoyer les montants
-                amount_ht = self.clean_currency(row['Montant HT'])
-                amount_tva = self.clean_currency(row['Montant TVA'])
-                # amount_ttc = self.clean_currency(row['Montant TTC'])  # Non necessaire, calculé automatiquement mais pourrait servir par la suite
-                
-                # Calculer le taux de TVA
-                # if amount_ht > 0:
-                #     vat_rate = (amount_tva / amount_ht) * 100
-                # else:
-                #     vat_rate = 20.0  # Taux par défaut
-                vat_rate = Decimal('20.0')  # Taux par défaut
-                
-                # Dates : conversion et nettoyage de la date excel en date python pour être reconnu par le model
-                date_facture = self.parse_date(row['Date Facture'])
-                date_encaissement = self.parse_date(row['Date encaissement'])
-                
-                # Créer la facture
-                invoice = Invoice.objects.create(
-                    invoice_number=invoice_number,
-                    affaire=affaire,
-                    client=client,
-                    type=invoice_type,
-                    amount_ht=amount_ht,
-                    vat_rate=vat_rate,
-                    date=date_facture,
-                )
-                
-                self.stdout.write(f"Facture créée: {invoice_number}")
-                
-                # 4. Créer le paiement si encaissement
-                if date_encaissement and not pd.isna(row['Montant encaissé €TTC']):
-                    from factures.models import Payment
-                    montant_encaisse = self.clean_currency(row['Montant encaissé €TTC'])
-                    
-                    Payment.objects.create(
-                        invoice=invoice,
-                        amount=montant_encaisse,
-                        date=date_encaissement,
-                        payment_method='VRT'  # Virement par défaut comme demandé
-                    )
-                    self.stdout.write(f"Paiement créé pour {invoice_number}")
-                    
-                    # 🔍 Debug
-                    invoice.refresh_from_db()  # Recharge depuis la DB
-                    self.stdout.write(f"Statut après paiement: {invoice.statut}")
-                    self.stdout.write(f"Balance restante: {invoice.balance}")
+        batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        if not os.path.exists(excel_file):
+            raise CommandError(f"Fichier introuvable : {excel_file}")
+        if options['validate_only']:
+            return self.validate(excel_file, batch_size, options)
+        file_hash = file_sha256(excel_file)
 
-                
-            except Exception as e:
-                self.stdout.write(f"Erreur ligne {index + 1}: {str(e)}")
-                continue
-        
-        self.stdout.write(self.style.SUCCESS("Importation terminée !"))
+        if options['resume']:
+            run = ImportRun.objects.filter(file_hash=file_hash).exclude(statut='termine').first()
+            if run is None:
+                raise CommandError("Aucun import interrompu à reprendre pour ce fichier")
+            run.statut = 'en_cours'
+            run.batch_size = batch_size
+            run.save()
+            self.stdout.write(f"Reprise de l'import après la ligne {run.rows_done}...")
+        else:
+            run = ImportRun.objects.create(source=os.path.abspath(excel_file)[-255:], file_hash=file_hash, batch_size=batch_size)
+            self.stdout.write("Début de l'importation...")
 
-        # 🔍 Debug
-        invoice.refresh_from_db()  # Recharge depuis la DB
-        self.stdout.write(f"Statut après paiement: {invoice.statut}")
-        self.stdout.write(f"Balance restante: {invoice.balance}")
-    
-    def clean_currency(self, value):
-        """Nettoie une valeur monétaire et la convertit en Decimal"""
-        if pd.isna(value):
-            return Decimal('0')
-        
-        # Enlever les espaces, € et remplacer virgule par point
-        cleaned = str(value).replace('€', '').replace(' ', '').replace(',', '.')
-        
+        started = time.monotonic()
+        rows_read = 0
         try:
-            return Decimal(cleaned)
-        except:
-            return Decimal('0')
-    
-    def parse_date(self, date_value):
-        """Parse une date depuis Excel"""
-        if pd.isna(date_value):
-            return None
-        
-        if isinstance(date_value, str):
-            try:
-                # Format DD/MM/YYYY
-                return datetime.strptime(date_value, '%d/%m/%Y').date()
-            except:
-                return None
-        
-        # Si c'est déjà un datetime
-        if hasattr(date_value, 'date'):
-            return date_value.date()
-        
-        return None
\ No newline at end of file
+            chunks = read_import_chunks(excel_file, batch_size, start=run.rows_done, delimiter=options['delimiter'])
+            for number, (read, chunk) in enumerate(chunks, 1):
+                batch_started = time.monotonic()
+                first_line = run.rows_done + 1
+
+                # Le lot et le point de reprise sont validés ensemble
+                with transaction.atomic():
+                    counts, errors = import_invoice_rows(chunk, batch_size=batch_size)
+                    run.record_batch(read, counts, len(errors))
+                rows_read += read
+
+                self.report_batch(number, first_line, run.rows_done, counts, errors, read / max(time.monotonic() - batch_started, 1e-6))
+        except Exception as e:
+            # Le lot en cours a été annulé : le point de reprise est celui enregistré en base
+            run.refresh_from_db()
+            run.statut = 'echec'
+            run.last_error = str(e)
+            run.save()
+            raise CommandError(f"{e}\nImport interrompu après la ligne {run.rows_done} : relancer avec --resume pour reprendre")
+
+        run.statut = 'termine'
+        run.finished_at = timezone.now()
+        run.save()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"clients: {run.clients_created} créé(s)\n"
+            f"affaires: {run.affaires_created} créé(s)\n"
+            f"factures: {run.invoices_created} créé(s)\n"
+            f"paiements: {run.payments_created} créé(s)"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Importation terminée ! {rows_read} ligne(s) en {elapsed:.1f} s "
+            f"({rows_read / elapsed if elapsed else 0:.0f} lignes/s), {run.errors_count} ligne(s) en erreur au total"
+        ))
+
+    def validate(self, excel_file, batch_size, options):
+        """Validation seule : rapport des anomalies, sortie en erreur si une ligne serait écartée"""
+        started = time.monotonic()
+        try:
+            report = validate_file(excel_file, batch_size, options['workers'], options['delimiter'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+
+        if options['report'] == '-':
+            json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write('\n')
+        elif options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stderr.write(f"Rapport écrit dans {options['report']}")
+
+        # Résumé sur la sortie d'erreur : la sortie standard peut porter le rapport JSON
+        self.stderr.write(
+            f"{report['rows']} ligne(s) contrôlée(s) en {elapsed:.1f} s "
+            f"({report['rows'] / elapsed if elapsed else 0:.0f} lignes/s) : "
+            f"{report['errors']} erreur(s) sur {report['invalid_rows']} ligne(s), {report['warnings']} avertissement(s)"
+        )
+        for (level, message), count in Counter((issue['level'], issue['message']) for issue in report['issues']).most_common():
+            self.stderr.write(f"    [{level}] {message} : {count} ligne(s)")
+        if self.verbosity >= 2:
+            for issue in report['issues']:
+                self.stderr.write(f"    Ligne {issue['line']} ({issue['column']} = {issue['value']!r}) : {issue['message']}")
+
+        if report['errors']:
+            raise CommandError(f"{report['invalid_rows']} ligne(s) en erreur : fichier à corriger avant import")
+        self.stderr.write(self.style.SUCCESS("Fichier valide : aucune ligne ne serait écartée"))
+
+    def report_batch(self, number, first_line, last_line, counts, errors, rate):
+        """Résumé d'un lot : créations, débit et erreurs regroupées par message (détail ligne par ligne avec -v 2)"""
+        self.stdout.write(
+            f"Lot {number} (lignes {first_line}-{last_line}) : {counts['factures']} facture(s), "
+            f"{counts['paiements']} paiement(s), {len(errors)} erreur(s), {rate:.0f} lignes/s"
+        )
+        for message, count in Counter(message for _, message in errors).most_common():
+            self.stdout.write(f"    {message} : {count} ligne(s)")
+        if self.verbosity >= 2:
+            for line, message in errors:
+                self.stdout.write(f"    Erreur ligne {line}: {message}")
@@ -0,0 +1,61 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from factures.models import Invoice
+from utils.dashboard_cache import invalidate_dashboard_cache
+
+
+class Command(BaseCommand):
+    help = 'Recalcule et vérifie les colonnes amount_ttc, total_paid et balance des factures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Vérifie uniquement, sans corriger les écarts')
+        parser.add_argument('--batch-size', type=int, default=500, help='Nombre de factures mises à jour par lot')
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        batch_size = options['batch_size']
+
+        # Une seule requête : somme des paiements par facture
+        invoices = Invoice.objects.annotate(
+            paid=Coalesce(Sum('payments__amount'), Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2))
+        ).only('id', 'invoice_number', 'amount_ht', 'vat_rate', 'amount_ttc', 'total_paid', 'balance', 'updated_at')
+
+        # bulk_update() ne renseigne pas updated_at (auto_now) : date de modification explicite
+        now = timezone.now()
+        to_update = []
+        checked = 0
+        for invoice in invoices.iterator(chunk_size=batch_size):
+            checked += 1
+            amount_ttc = invoice.compute_amount_ttc()
+            total_paid = invoice.paid
+            balance = amount_ttc - total_paid
+
+            if (invoice.amount_ttc, invoice.total_paid, invoice.balance) != (amount_ttc, total_paid, balance):
+                self.stdout.write(
+                    f"Écart facture {invoice.invoice_number}: "
+                    f"TTC {invoice.amount_ttc} -> {amount_ttc}, "
+                    f"payé {invoice.total_paid} -> {total_paid}, "
+                    f"solde {invoice.balance} -> {balance}"
+                )
+                invoice.amount_ttc = amount_ttc
+                invoice.total_paid = total_paid
+                invoice.balance = balance
+                invoice.updated_at = now
+                to_update.append(invoice)
+
+        if check_only:
+            if to_update:
+                raise CommandError(f"{len(to_update)} facture(s) sur {checked} ont un solde incohérent")
+            self.stdout.write(self.style.SUCCESS(f"{checked} facture(s) vérifiée(s), aucun écart"))
+            return
+
+        with transaction.atomic():
+            Invoice.objects.bulk_update(to_update, ['amount_ttc', 'total_paid', 'balance', 'updated_at'], batch_size=batch_size)
+            if to_update:
+                invalidate_dashboard_cache('factures.Invoice')
+
+        self.stdout.write(self.style.SUCCESS(f"{checked} facture(s) vérifiée(s), {len(to_update)} corrigée(s)"))
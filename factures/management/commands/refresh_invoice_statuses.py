@@ -0,0 +1,24 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from factures.services import refresh_invoice_statuses
+
+
+class Command(BaseCommand):
+    help = 'Met à jour en masse le statut des factures (à lancer périodiquement, par exemple via cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=str, help="Date de référence au format AAAA-MM-JJ (aujourd'hui par défaut)")
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Format de date invalide, attendu AAAA-MM-JJ')
+
+        counts = refresh_invoice_statuses(today)
+
+        for statut, count in counts.items():
+            self.stdout.write(f"{statut}: {count} facture(s) mise(s) à jour")
+        self.stdout.write(self.style.SUCCESS(f"Statuts mis à jour ({sum(counts.values())} facture(s) modifiée(s))"))
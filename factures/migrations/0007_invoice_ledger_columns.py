@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:41
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_ledger_columns(apps, schema_editor):
+    Invoice = apps.get_model('factures', 'Invoice')
+    invoices = Invoice.objects.annotate(paid=Sum('payments__amount'))
+    for invoice in invoices.iterator(chunk_size=500):
+        amount_ttc = (invoice.amount_ht * (1 + invoice.vat_rate / Decimal('100'))).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        total_paid = invoice.paid or Decimal('0')
+        Invoice.objects.filter(pk=invoice.pk).update(
+            amount_ttc=amount_ttc,
+            total_paid=total_paid,
+            balance=amount_ttc - total_paid,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factures', '0006_alter_invoice_affaire_alter_payment_invoice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_ttc',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(fill_ledger_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+def fill_deleted_client_entity_name(apps, schema_editor):
+    # Auparavant fait à chaque affichage de la liste des factures et des règlements
+    Invoice = apps.get_model('factures', 'Invoice')
+    Invoice.objects.filter(client__isnull=True).filter(
+        Q(client_entity_name__isnull=True) | Q(client_entity_name='')
+    ).update(client_entity_name='Client supprimé')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factures', '0007_invoice_ledger_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_deleted_client_entity_name, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('factures', '0009_invoice_updated_at_payment_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255)),
+                ('file_hash', models.CharField(db_index=True, max_length=64)),
+                ('statut', models.CharField(choices=[('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='en_cours', max_length=20)),
+                ('batch_size', models.PositiveIntegerField()),
+                ('rows_done', models.PositiveIntegerField(default=0)),
+                ('clients_created', models.PositiveIntegerField(default=0)),
+                ('affaires_created', models.PositiveIntegerField(default=0)),
+                ('invoices_created', models.PositiveIntegerField(default=0)),
+                ('payments_created', models.PositiveIntegerField(default=0)),
+                ('errors_count', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Import de factures',
+                'verbose_name_plural': 'Imports de factures',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
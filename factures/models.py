@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Sum
 from django.core.exceptions import ValidationError
 from datetime import datetime, timedelta
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 
 # Create your models here.
 
@@ -37,6 +38,12 @@ class Invoice(models.Model):
     vat_rate = models.DecimalField(max_digits=5, decimal_places=2, default=20.0)
     statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='a_payer')
     facture_pdf = models.FileField(upload_to='factures', validators = [validateur_extentions], null=True, blank=True)
+    # Colonnes dénormalisées, tenues à jour à chaque sauvegarde de la facture et de ses paiements
+    amount_ttc = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    # Date de dernière modification, sert aux exports incrémentaux
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "Facture"
@@ -49,9 +56,9 @@ class Invoice(models.Model):
     def formatted_amount_ht(self):
         return f"{self.amount_ht:,.2f} €".replace(",", " ").replace(".", ",")
     
-    @property
-    def amount_ttc(self):
-        return self.amount_ht * (1 + self.vat_rate / Decimal('100'))
+    def compute_amount_ttc(self):
+        amount_ttc = Decimal(str(self.amount_ht)) * (1 + Decimal(str(self.vat_rate)) / Decimal('100'))
+        return amount_ttc.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
     
     def formatted_amount_ttc(self):
         return f"{self.amount_ttc:,.2f} €".replace(",", " ").replace(".", ",")
@@ -64,27 +71,29 @@ class Invoice(models.Model):
     def due_date(self):
         return self.date + timedelta(days=30)
     
-    @property
-    def balance(self):
-        payments = self.payments.all()
-        total_payments = sum(payment.amount for payment in payments)
-        return self.amount_ttc - total_payments
-    
+    def update_ledger(self):
+        """Recalcule total_paid et balance en une seule requête d'agrégat sur les paiements"""
+        total_payments = self.payments.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        self.amount_ttc = self.compute_amount_ttc()
+        self.total_paid = total_payments
+        self.balance = self.amount_ttc - total_payments
 
     def update_statut(self):
-        total_payments = sum(payment.amount for payment in self.payments.all())   
-        amount_ttc = self.amount_ht * (1 + self.vat_rate / Decimal('100'))  # Calculer ici
-
-        if total_payments >= amount_ttc:
-            self.statut = 'payee'
-        elif self.due_date < datetime.now().date() and total_payments < amount_ttc:
-            self.statut = 'en_retard'
-        elif total_payments > 0 and self.due_date >= datetime.now().date():
-            self.statut = 'partiellement_payee'
-        else:
-            self.statut = 'a_payer'
-
-        self.save()
+        with transaction.atomic():
+            # Verrouille la facture pour sérialiser les mises à jour concurrentes du solde
+            Invoice.objects.select_for_update().only('pk').get(pk=self.pk)
+            self.update_ledger()
+
+            if self.total_paid >= self.amount_ttc:
+                self.statut = 'payee'
+            elif self.due_date < datetime.now().date() and self.total_paid < self.amount_ttc:
+                self.statut = 'en_retard'
+            elif self.total_paid > 0 and self.due_date >= datetime.now().date():
+                self.statut = 'partiellement_payee'
+            else:
+                self.statut = 'a_payer'
+
+            self.save(update_fields=['statut', 'amount_ttc', 'total_paid', 'balance', 'updated_at'])
 
     def clean(self):
         """Validation automatique des montants pour les avoirs"""
@@ -99,7 +108,32 @@ class Invoice(models.Model):
         # Si le client existe, copie son nom dans client_entity_name
         if self.client:
             self.client_entity_name = self.client.entity_name
-        super().save(*args, **kwargs)
+        elif not self.client_entity_name:
+            self.client_entity_name = "Client supprimé"
+        # Le TTC et le solde suivent toujours le HT et le taux de TVA
+        self.amount_ttc = self.compute_amount_ttc()
+        self.balance = self.amount_ttc - (self.total_paid or Decimal('0'))
+
+        # Le chiffre d'affaires mensuel n'est recalculé que si la date, le type ou le montant peuvent avoir changé
+        update_fields = kwargs.get('update_fields')
+        revenue_changed = update_fields is None or bool({'date', 'type', 'amount_ht'} & set(update_fields))
+
+        with transaction.atomic():
+            previous_date = None
+            if revenue_changed and self.pk:
+                previous_date = Invoice.objects.filter(pk=self.pk).values_list('date', flat=True).first()
+            super().save(*args, **kwargs)
+            if revenue_changed:
+                # Import local pour éviter les problèmes de circularité
+                from dashboard.models import MonthlyRevenue
+                MonthlyRevenue.refresh_for_dates(self.date, previous_date)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            from dashboard.models import MonthlyRevenue
+            MonthlyRevenue.refresh_for_dates(self.date)
+        return result
 
     
 
@@ -108,6 +142,8 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     invoice = models.ForeignKey(Invoice, on_delete=models.PROTECT, related_name='payments')
     payment_method = models.CharField(max_length=50)
+    # Date de dernière modification, sert aux exports incrémentaux
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "Paiement"
@@ -121,8 +157,68 @@ class Payment(models.Model):
         return f"{self.amount:,.2f} €".replace(",", " ").replace(".", ",")
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.invoice.update_statut()
+        with transaction.atomic():
+            # Si le paiement change de facture, l'ancienne facture doit aussi être recalculée
+            previous_invoice_id = None
+            if self.pk:
+                previous_invoice_id = Payment.objects.filter(pk=self.pk).values_list('invoice_id', flat=True).first()
+            super().save(*args, **kwargs)
+            self.invoice.update_statut()
+            if previous_invoice_id and previous_invoice_id != self.invoice_id:
+                Invoice.objects.get(pk=previous_invoice_id).update_statut()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.invoice.update_statut()
+        return result
+
+class ImportRun(models.Model):
+    """
+    Exécution de la commande import_excel_factures : le point de reprise (dernière ligne
+    validée) est enregistré dans la même transaction que chaque lot, --resume repart de là.
+    """
+    STATUT_CHOICES = [
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('echec', 'Échec'),
+    ]
+
+    source = models.CharField(max_length=255)
+    # Empreinte SHA-256 du fichier : une reprise n'est possible que sur le même contenu
+    file_hash = models.CharField(max_length=64, db_index=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_cours')
+    batch_size = models.PositiveIntegerField()
+    # Nombre de lignes de données traitées et validées (point de reprise)
+    rows_done = models.PositiveIntegerField(default=0)
+    clients_created = models.PositiveIntegerField(default=0)
+    affaires_created = models.PositiveIntegerField(default=0)
+    invoices_created = models.PositiveIntegerField(default=0)
+    payments_created = models.PositiveIntegerField(default=0)
+    errors_count = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Import de factures"
+        verbose_name_plural = "Imports de factures"
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Import {self.source} ({self.get_statut_display()}, {self.rows_done} ligne(s))"
+
+    def record_batch(self, rows, counts, errors_count):
+        """Avance le point de reprise après un lot (à appeler dans la transaction du lot)"""
+        self.rows_done += rows
+        self.clients_created += counts['clients']
+        self.affaires_created += counts['affaires']
+        self.invoices_created += counts['factures']
+        self.payments_created += counts['paiements']
+        self.errors_count += errors_count
+        self.save()
+
 
 # class Comment(models.Model):
 #     invoice_number = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='comments')
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import F, Q
+from utils.dashboard_cache import invalidate_dashboard_cache
+from .models import Invoice
+
+
+# Délai de paiement appliqué à toutes les factures (voir Invoice.due_date)
+PAYMENT_TERM_DAYS = 30
+
+
+def refresh_invoice_statuses(today=None, invoices=None):
+    """
+    Recalcule le statut de toutes les factures non annulées (ou de la requête `invoices`)
+    en une requête UPDATE par statut.
+    S'appuie sur les colonnes total_paid / amount_ttc tenues à jour par les paiements,
+    sans charger les factures en mémoire. Retourne le nombre de factures passées à chaque statut.
+    """
+    if today is None:
+        today = datetime.now().date()
+    # due_date < today  <=>  date < today - 30 jours
+    overdue_limit = today - timedelta(days=PAYMENT_TERM_DAYS)
+
+    paid = Q(total_paid__gte=F('amount_ttc'))
+    overdue = Q(date__lt=overdue_limit)
+
+    transitions = [
+        ('payee', paid),
+        ('en_retard', ~paid & overdue),
+        ('partiellement_payee', ~paid & ~overdue & Q(total_paid__gt=0)),
+        ('a_payer', ~paid & ~overdue & Q(total_paid__lte=0)),
+    ]
+
+    # update() ne renseigne pas updated_at (auto_now) : date de modification explicite
+    now = timezone.now()
+    counts = {}
+    with transaction.atomic():
+        invoices = (Invoice.objects.all() if invoices is None else invoices).exclude(statut='annulee')
+        for statut, condition in transitions:
+            counts[statut] = invoices.filter(condition).exclude(statut=statut).update(statut=statut, updated_at=now)
+        # update() n'envoie pas de signaux : widgets du tableau de bord invalidés ici
+        if any(counts.values()):
+            invalidate_dashboard_cache('factures.Invoice')
+    return counts
@@ -0,0 +1,48 @@
+import csv
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from factures.imports import IMPORT_COLUMNS, prepare_rows, read_import_chunks, validate_file
+
+
+# Lignes du fichier d'import, colonnes dans l'ordre de IMPORT_COLUMNS
+IMPORT_LINES = [
+    ('Client A', 'A001', 'Désignation', 'F001', 'facture', '1 000,00 €', '15/01/2025', '01/02/2025', '1200'),
+    ('Client A', 'A001', 'Désignation', 'F002', 'devis', '100', '15/01/2025', '', ''),
+    ('Client A', 'A001', 'Désignation', 'F003', 'facture', 'abc', '15/01/2025', '', ''),
+    ('Client A', 'A001', 'Désignation', 'F004', 'facture', '100', '15/01/2025', '01/02/2025', 'abc'),
+    ('Client A', 'A001', 'Désignation', 'F005', 'facture', '100', '15/01/2025', '32/01/2025', '120'),
+    ('Client A', 'A001', 'Désignation', 'F006', 'avoir', '100', '15/01/2025', '01/02/2025', '-50'),
+    ('Client A', 'A001', 'Désignation', 'F007', 'facture', '-100', '15/01/2025', '', ''),
+    ('Client A', 'A001', 'Désignation', '', 'facture', '100', '15/01/2025', '', ''),
+    ('Client A', 'A001', 'Désignation', 'F001', 'facture', '100', '15/01/2025', '', ''),
+    ('Client A', 'A001', 'Désignation', 'F010', 'facture', '100', 'demain', '', ''),
+]
+
+
+class ImportValidationTests(SimpleTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, self.path)
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(IMPORT_COLUMNS)
+            writer.writerows(IMPORT_LINES)
+
+    def test_validate_only_rejects_the_lines_discarded_by_the_import(self):
+        report = validate_file(self.path, workers=1)
+        invalid_lines = {issue['line'] for issue in report['issues'] if issue['level'] == 'error'}
+
+        (_, df), = read_import_chunks(self.path, chunk_size=100)
+        _, errors = prepare_rows(df)
+
+        self.assertEqual(invalid_lines, {line for line, _ in errors})
+        self.assertEqual(invalid_lines, {2, 6, 8, 9, 10})
+        self.assertEqual(report['invalid_rows'], 5)
+
+    def test_values_replaced_at_import_are_warnings(self):
+        report = validate_file(self.path, workers=1)
+        warnings = {(issue['line'], issue['code']) for issue in report['issues'] if issue['level'] == 'warning'}
+        self.assertEqual(warnings, {(3, 'invalid_amount'), (4, 'invalid_payment_amount'), (5, 'invalid_payment_date'), (7, 'negative_amount')})
@@ -1,41 +1,33 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.http import HttpResponse, Http404
 from django.conf import settings
 from django.contrib import messages
-from django.db.models import ProtectedError
+from django.db.models import ProtectedError, F, Value, DateField, DurationField, ExpressionWrapper
 import os
 from .models import Invoice, Payment
 from affaires.models import Affaire
-from datetime import datetime
+from datetime import datetime, timedelta
 from .forms import InvoiceForm, PaymentForm
+from utils.pagination import paginate
 
 
 # Create your views here.
 
 @login_required
 def factures(request):
-    factures= Invoice.objects.all()
-    sorted_factures = sorted(factures, key=lambda facture: facture.invoice_number, reverse=True)
     date = datetime.today().date()
-    affaires= Affaire.objects.all()
+    # Tri, pagination et retard calculés par la base : seules les 10 factures affichées sont chargées
+    factures = Invoice.objects.select_related('client', 'affaire').annotate(
+        day_late=ExpressionWrapper(
+            Value(date, output_field=DateField()) - F('date') - Value(timedelta(days=30)),
+            output_field=DurationField()
+        )
+    )
 
-    paginator = Paginator(sorted_factures, 10)
+    page_obj = paginate(request, factures, ('-invoice_number', '-id'))
 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    for facture in sorted_factures:
-        facture.day_late = (date - facture.due_date).days
-
-        # S'assure que client_entity_name est toujours défini
-        if facture.client is None and not facture.client_entity_name:
-            facture.client_entity_name = "Client supprimé"
-            facture.save()
-
-    # return render(request, 'pages/factures/factures.html', context={"factures": sorted_factures, "date": date, "affaires": affaires})  
-    return render(request, 'pages/factures/factures.html', context={"factures": page_obj, "date": date, "affaires": affaires})  
+    return render(request, 'pages/factures/factures.html', context={"factures": page_obj, "date": date})  
 
 @login_required
 def facture_create(request):
@@ -101,20 +93,11 @@ def facture_delete(request, pk):
    
 @login_required
 def reglements(request):
-    paiements = Payment.objects.all().order_by('-date')
-    factures = Invoice.objects.all()
-
-    paginator = Paginator(paiements,10)
-
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paiements = Payment.objects.select_related('invoice__client', 'invoice__affaire')
 
-    for facture in factures:
-        if facture.client is None and not facture.client_entity_name:
-            facture.client_entity_name = "Client supprimé"
-            facture.save()
+    page_obj = paginate(request, paiements, ('-date', '-id'))
 
-    return render(request, 'pages/factures/paiements.html', {'paiements': page_obj, 'factures': factures})
+    return render(request, 'pages/factures/paiements.html', {'paiements': page_obj})
 
 @login_required
 def reglement_create(request, pk):
@@ -174,11 +157,9 @@ def reglement_update(request, pk):
 @login_required
 def reglement_delete(request, pk):
     paiement = get_object_or_404(Payment, pk=pk)
-    facture  = paiement.invoice  # Récupère la facture associée au paiement  
 
     if request.method == 'POST':
-        paiement.delete()
-        facture.update_statut() # Mise à jour du statut de la facture
+        paiement.delete()  # Recalcule le solde et le statut de la facture dans la même transaction
         return redirect('factures:reglements')    
 
     return redirect('factures:reglements') 
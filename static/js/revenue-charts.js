@@ -0,0 +1,159 @@
+/**
+ * Graphiques de chiffre d'affaires dessinés dans le navigateur (SVG)
+ * à partir de l'API JSON du dashboard. En cas d'erreur, l'image PNG
+ * générée côté serveur est affichée à la place.
+ */
+
+const CHART_COLORS = ['#7FAEDC', '#4ECDC4', '#338ce6', '#FF6B6B', '#45B7D1'];
+const SVG_NS = 'http://www.w3.org/2000/svg';
+
+// Une seule requête par URL d'API, même si plusieurs graphiques l'utilisent
+const revenueRequests = {};
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.revenue-chart-js').forEach(initializeRevenueChart);
+});
+
+function initializeRevenueChart(container) {
+    const url = container.dataset.apiUrl;
+    if (!revenueRequests[url]) {
+        revenueRequests[url] = fetch(url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Erreur ${response.status}`);
+                }
+                return response.json();
+            });
+    }
+
+    revenueRequests[url]
+        .then(data => renderRevenueChart(container, data))
+        .catch(error => {
+            console.error('Graphique indisponible, affichage de l\'image de secours :', error);
+            showFallbackImage(container);
+        });
+}
+
+function showFallbackImage(container) {
+    const img = document.createElement('img');
+    img.src = container.dataset.fallback;
+    img.alt = container.dataset.alt || '';
+    img.className = 'revenue-chart-fallback';
+    container.replaceChildren(img);
+}
+
+function svgElement(name, attributes, text) {
+    const element = document.createElementNS(SVG_NS, name);
+    Object.entries(attributes || {}).forEach(([key, value]) => element.setAttribute(key, value));
+    if (text !== undefined) {
+        element.textContent = text;
+    }
+    return element;
+}
+
+function formatEuros(value) {
+    return `${Math.round(value).toLocaleString('fr-FR')}€`;
+}
+
+/**
+ * Graduation "ronde" de l'axe Y (1, 2, 2.5 ou 5 × 10^n) pour environ 5 intervalles
+ */
+function niceStep(maxValue) {
+    const rough = maxValue / 5;
+    const magnitude = Math.pow(10, Math.floor(Math.log10(rough)));
+    const steps = [1, 2, 2.5, 5, 10];
+    return magnitude * steps.find(step => step * magnitude >= rough);
+}
+
+function renderRevenueChart(container, data) {
+    const series = data.series[container.dataset.series];
+    const years = data.years.map(String);
+    const isBar = container.dataset.type === 'bar';
+
+    const width = 800;
+    const height = 420;
+    const margin = { top: 50, right: 20, bottom: 40, left: 90 };
+    const plotWidth = width - margin.left - margin.right;
+    const plotHeight = height - margin.top - margin.bottom;
+
+    // Les avoirs peuvent rendre un mois négatif : l'axe inclut toujours 0
+    const allValues = years.flatMap(year => series[year]);
+    const maxValue = Math.max(0, ...allValues);
+    const minValue = Math.min(0, ...allValues);
+    const step = maxValue - minValue > 0 ? niceStep(maxValue - minValue) : 1;
+    const yMax = Math.max(step, Math.ceil(maxValue / step) * step);
+    const yMin = Math.floor(minValue / step) * step;
+
+    const columnWidth = plotWidth / data.months.length;
+    const xCenter = index => margin.left + columnWidth * (index + 0.5);
+    const y = value => margin.top + plotHeight - ((value - yMin) / (yMax - yMin)) * plotHeight;
+
+    const svg = svgElement('svg', {
+        viewBox: `0 0 ${width} ${height}`,
+        role: 'img',
+        'aria-label': container.dataset.alt || container.dataset.title,
+        width: '100%',
+    });
+
+    svg.appendChild(svgElement('text', {
+        x: width / 2, y: 24, 'text-anchor': 'middle', 'font-size': 18, 'font-weight': 'bold',
+    }, container.dataset.title));
+
+    // Grille et axe Y
+    for (let value = yMin; value <= yMax; value += step) {
+        svg.appendChild(svgElement('line', {
+            x1: margin.left, x2: width - margin.right, y1: y(value), y2: y(value),
+            stroke: '#000', 'stroke-opacity': 0.1,
+        }));
+        svg.appendChild(svgElement('text', {
+            x: margin.left - 8, y: y(value) + 4, 'text-anchor': 'end', 'font-size': 12,
+        }, formatEuros(value)));
+    }
+
+    // Axe X
+    data.months.forEach((label, index) => {
+        svg.appendChild(svgElement('text', {
+            x: xCenter(index), y: height - margin.bottom + 20, 'text-anchor': 'middle', 'font-size': 12,
+        }, label));
+    });
+
+    years.forEach((year, yearIndex) => {
+        const color = CHART_COLORS[yearIndex % CHART_COLORS.length];
+        const values = series[year];
+
+        if (isBar) {
+            // Barres côte à côte, une par année
+            const barWidth = (columnWidth * 0.8) / years.length;
+            values.forEach((value, index) => {
+                const x = xCenter(index) - (columnWidth * 0.4) + barWidth * yearIndex;
+                const bar = svgElement('rect', {
+                    x: x, y: Math.min(y(0), y(value)), width: barWidth, height: Math.abs(y(0) - y(value)),
+                    fill: color, 'fill-opacity': 0.8,
+                });
+                bar.appendChild(svgElement('title', {}, `${data.months[index]} ${year} : ${formatEuros(value)}`));
+                svg.appendChild(bar);
+            });
+        } else {
+            const points = values.map((value, index) => `${xCenter(index)},${y(value)}`).join(' ');
+            svg.appendChild(svgElement('polyline', {
+                points: points, fill: 'none', stroke: color, 'stroke-width': 2.5,
+            }));
+            values.forEach((value, index) => {
+                const point = svgElement('circle', { cx: xCenter(index), cy: y(value), r: 4, fill: color });
+                point.appendChild(svgElement('title', {}, `${data.months[index]} ${year} : ${formatEuros(value)}`));
+                svg.appendChild(point);
+            });
+        }
+
+        // Légende en haut à gauche
+        const legendY = margin.top + 10 + yearIndex * 18;
+        svg.appendChild(svgElement('rect', {
+            x: margin.left + 10, y: legendY - 9, width: 14, height: 10, fill: color,
+        }));
+        svg.appendChild(svgElement('text', {
+            x: margin.left + 30, y: legendY, 'font-size': 12,
+        }, year));
+    });
+
+    container.replaceChildren(svg);
+}
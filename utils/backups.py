@@ -0,0 +1,179 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import zlib
+from datetime import datetime
+from django.db import connections
+
+
+# Taille des blocs lus puis envoyés (réponse HTTP ou fichier de sauvegarde)
+BACKUP_CHUNK_SIZE = 256 * 1024
+
+
+class DatabaseBackup:
+    """
+    Sauvegarde native de la base configurée, produite par blocs :
+    le contenu n'est jamais gardé en entier en mémoire.
+    Chaque sous-classe correspond à un moteur (connection.vendor).
+    """
+    vendor = ''
+    extension = ''
+    content_type = 'application/octet-stream'
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self.settings_dict = connections[alias].settings_dict
+
+    def filename(self):
+        return f'backup_database_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{self.extension}'
+
+    def check(self):
+        """Vérifie avant tout envoi que la sauvegarde peut être produite (lève une exception sinon)"""
+
+    def iter_chunks(self):
+        raise NotImplementedError
+
+
+def gzip_chunks(chunks):
+    """Compresse au format gzip une suite de blocs d'octets, au fil de l'eau"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_file(file, chunk_size=BACKUP_CHUNK_SIZE):
+    while chunk := file.read(chunk_size):
+        yield chunk
+
+
+class SQLiteBackup(DatabaseBackup):
+    """
+    Copie cohérente de la base SQLite par l'API de sauvegarde de sqlite3
+    (sans bloquer les écritures), dans un fichier temporaire envoyé compressé en gzip.
+    Restauration : gunzip puis remplacer db.sqlite3.
+    """
+    vendor = 'sqlite'
+    extension = 'sqlite3.gz'
+    content_type = 'application/gzip'
+
+    def check(self):
+        if not os.path.exists(self.settings_dict['NAME']):
+            raise Exception(f"Base SQLite introuvable : {self.settings_dict['NAME']}")
+
+    def iter_chunks(self):
+        fd, temp_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        try:
+            source = sqlite3.connect(self.settings_dict['NAME'])
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+
+            with open(temp_path, 'rb') as backup_file:
+                yield from gzip_chunks(iter_file(backup_file))
+        finally:
+            os.remove(temp_path)
+
+
+class PostgreSQLBackup(DatabaseBackup):
+    """
+    Archive pg_dump au format custom (déjà compressée par pg_dump), lue sur la sortie
+    du processus et relayée par blocs.
+    Restauration : pg_restore --clean -d <base> backup.dump
+    """
+    vendor = 'postgresql'
+    extension = 'dump'
+
+    def check(self):
+        if shutil.which('pg_dump') is None:
+            raise Exception("pg_dump est introuvable (paquet postgresql-client)")
+
+    def get_command(self):
+        command = ['pg_dump', '--format=custom', '--no-owner', '--no-privileges']
+        if self.settings_dict.get('HOST'):
+            command += ['--host', self.settings_dict['HOST']]
+        if self.settings_dict.get('PORT'):
+            command += ['--port', str(self.settings_dict['PORT'])]
+        if self.settings_dict.get('USER'):
+            command += ['--username', self.settings_dict['USER']]
+        command.append(self.settings_dict['NAME'])
+        return command
+
+    def get_env(self):
+        env = os.environ.copy()
+        # Le mot de passe passe par l'environnement, jamais par la ligne de commande
+        if self.settings_dict.get('PASSWORD'):
+            env['PGPASSWORD'] = self.settings_dict['PASSWORD']
+        return env
+
+    def iter_chunks(self):
+        # stderr dans un fichier temporaire : un tube non lu pourrait bloquer pg_dump
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(self.get_command(), stdout=subprocess.PIPE, stderr=stderr, env=self.get_env())
+            try:
+                yield from iter_file(process.stdout)
+            finally:
+                process.stdout.close()
+                returncode = process.wait()
+
+            if returncode != 0:
+                stderr.seek(0)
+                raise Exception(f"Erreur lors de l'export: {stderr.read().decode(errors='replace').strip()}")
+
+
+# Sauvegarde native par moteur de base de données
+DATABASE_BACKUPS = {
+    backup_class.vendor: backup_class
+    for backup_class in [SQLiteBackup, PostgreSQLBackup]
+}
+
+
+def get_database_backup(alias='default'):
+    """Sauvegarde adaptée au moteur de la base configurée"""
+    vendor = connections[alias].vendor
+    if vendor not in DATABASE_BACKUPS:
+        raise Exception(f"Sauvegarde non prise en charge pour le moteur {vendor}")
+    backup = DATABASE_BACKUPS[vendor](alias)
+    backup.check()
+    return backup
+
+
+def write_backup(backup, directory):
+    """
+    Écrit la sauvegarde dans un répertoire (volume de sauvegardes) et retourne son chemin.
+    Fichier temporaire puis renommage : une sauvegarde interrompue ne laisse pas de fichier incomplet.
+    """
+    os.makedirs(directory, exist_ok=True)
+    output_path = os.path.join(directory, backup.filename())
+    temp_path = f'{output_path}.tmp'
+    try:
+        with open(temp_path, 'wb') as output:
+            for chunk in backup.iter_chunks():
+                output.write(chunk)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return output_path
+
+
+def rotate_backups(directory, keep):
+    """Ne conserve que les `keep` sauvegardes les plus récentes du répertoire"""
+    backups = sorted(
+        (entry for entry in os.scandir(directory) if entry.is_file() and entry.name.startswith('backup_database_') and not entry.name.endswith('.tmp')),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    removed = []
+    for entry in backups[keep:]:
+        os.remove(entry.path)
+        removed.append(entry.path)
+    return removed
@@ -1,11 +1,13 @@
-import matplotlib
-matplotlib.use('Agg')  # Backend non-interactif pour serveur
-import matplotlib.pyplot as plt
-import numpy as np
 from datetime import datetime
 from collections import defaultdict
+from django.db.models import Sum
 from django.conf import settings
+import hashlib
+import json
 import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
 
 # Ah je vois ! Pour fixer l'axe Y avec des intervalles de
 #   200k€ (200 000, 400 000, 600 000, etc.), il faudrait ajouter
@@ -51,18 +53,161 @@ import os
 
 
 
+MONTH_LABELS = ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Juin', 
+                'Juil', 'Août', 'Sep', 'Oct', 'Nov', 'Déc']
+
+
+def new_figure(figsize):
+    """
+    Crée une figure matplotlib indépendante de pyplot : contrairement à l'état global
+    de pyplot, plusieurs figures peuvent être dessinées en parallèle dans des threads.
+    Import différé, matplotlib ne sert plus qu'au rendu PNG de secours.
+    """
+    from matplotlib.figure import Figure
+    
+    figure = Figure(figsize=figsize)
+    return figure, figure.subplots()
+
+
+def format_euros_axis(ax):
+    """Formatage de l'axe Y avec des milliers séparés"""
+    from matplotlib.ticker import FuncFormatter
+    
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x:,.0f}€'.replace(',', ' ')))
+
+
+# Cache des graphiques : un fichier par combinaison (graphique, années, données)
+# À incrémenter si le rendu des graphiques change, pour ne pas resservir d'anciennes images
+CHART_CACHE_VERSION = 2
+
+
+def get_chart_fingerprint(kind, years, data):
+    """
+    Empreinte des données d'un graphique : elle change dès qu'une facture
+    des années sélectionnées modifie le chiffre d'affaires d'un mois
+    """
+    payload = {
+        'kind': kind,
+        'version': CHART_CACHE_VERSION,
+        'data': {
+            str(year): [round(data.get(year, {}).get(month, 0), 2) for month in range(1, 13)]
+            for year in sorted(years)
+        },
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def evict_chart_cache(charts_dir, keep=None):
+    """
+    Supprime les graphiques les moins récemment utilisés au-delà de CHART_CACHE_MAX_BYTES
+    """
+    entries = []
+    for entry in os.scandir(charts_dir):
+        # Ignorer les fichiers en cours d'écriture
+        if entry.is_file() and entry.name.endswith('.png') and not entry.name.endswith('.tmp.png'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= settings.CHART_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total_size -= size
+        except FileNotFoundError:
+            pass
+
+
+def get_chart_path(kind, years, data):
+    """Chemin du graphique relatif à MEDIA_ROOT, nommé d'après l'empreinte des données"""
+    return f"charts/{kind}_{'_'.join(map(str, sorted(years)))}_{get_chart_fingerprint(kind, years, data)}.png"
+
+
+def render_chart(kind, years, data, render, output_path):
+    """Génère un graphique avec matplotlib puis l'installe dans le cache"""
+    charts_dir = os.path.dirname(output_path)
+    
+    # Écriture dans un fichier temporaire puis renommage atomique :
+    # deux requêtes simultanées ne peuvent pas servir une image à moitié écrite
+    fd, temp_path = tempfile.mkstemp(dir=charts_dir, prefix=f'{kind}_', suffix='.tmp.png')
+    os.close(fd)
+    try:
+        render(data, years, temp_path)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    evict_chart_cache(charts_dir, keep=output_path)
+
+
+# Pool de rendu partagé par le processus, et rendus en cours par fichier
+# pour ne pas dessiner deux fois le même graphique
+_chart_executor = None
+_pending_charts = {}
+_chart_lock = threading.RLock()
+
+
+def get_chart_executor():
+    global _chart_executor
+    with _chart_lock:
+        if _chart_executor is None:
+            _chart_executor = ThreadPoolExecutor(
+                max_workers=settings.CHART_RENDER_WORKERS,
+                thread_name_prefix='charts',
+            )
+        return _chart_executor
+
+
+def submit_chart(kind, years, data, render):
+    """
+    Retourne (chemin relatif à MEDIA_ROOT, future) ; future vaut None
+    si le graphique est déjà en cache, sinon le rendu est lancé dans le pool
+    """
+    relative_path = get_chart_path(kind, years, data)
+    output_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    
+    if os.path.exists(output_path):
+        # Marquer le fichier comme récemment utilisé pour l'éviction LRU
+        os.utime(output_path)
+        return relative_path, None
+    
+    # Utiliser le répertoire MEDIA pour les fichiers générés dynamiquement
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    
+    with _chart_lock:
+        future = _pending_charts.get(output_path)
+        if future is None:
+            future = get_chart_executor().submit(render_chart, kind, years, data, render, output_path)
+            _pending_charts[output_path] = future
+            future.add_done_callback(lambda done: _forget_chart(output_path, done))
+    return relative_path, future
+
+
+def _forget_chart(output_path, future):
+    with _chart_lock:
+        _pending_charts.pop(output_path, None)
+    if future.exception() is not None:
+        print(f"Erreur lors de la génération du graphique: {future.exception()}")
+
+
 # Comparatif des chiffres d'affaires mensuels
-def get_monthly_revenue_by_year(invoices, years):
+def get_monthly_revenue_by_year(years):
     """
     Agrège les chiffres d'affaires mensuels par année
+    à partir de la table MonthlyRevenue (au plus 12 lignes par année et par type)
     """
+    # Import local pour éviter les problèmes de circularité
+    from dashboard.models import MonthlyRevenue
+    
     revenue_data = defaultdict(lambda: defaultdict(float))
     
-    for invoice in invoices:
-        year = invoice.date.year
-        if year in years:
-            month = invoice.date.month
-            revenue_data[year][month] += float(invoice.amount_ht)
+    rows = MonthlyRevenue.objects.filter(year__in=years).values('year', 'month').annotate(total=Sum('amount_ht')).order_by()
+    for row in rows:
+        revenue_data[row['year']][row['month']] += float(row['total'])
     
     return dict(revenue_data)
 
@@ -71,12 +216,10 @@ def create_revenue_chart(revenue_data, years, output_path):
     """
     Génère un graphique linéaire des chiffres d'affaires avec matplotlib
     """
-    plt.figure(figsize=(10, 5))
-    plt.style.use('default')
+    figure, ax = new_figure(figsize=(10, 5))
     
     months = list(range(1, 13))
-    month_labels = ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Juin', 
-                   'Juil', 'Août', 'Sep', 'Oct', 'Nov', 'Déc']
+    month_labels = MONTH_LABELS
     
     colors = ['#7FAEDC', '#4ECDC4', '#338ce6', '#FF6B6B', '#45B7D1']
     
@@ -85,45 +228,38 @@ def create_revenue_chart(revenue_data, years, output_path):
         for month in months:
             monthly_values.append(revenue_data.get(year, {}).get(month, 0))
         
-        plt.plot(months, monthly_values, 
+        ax.plot(months, monthly_values, 
                 marker='o', 
                 linewidth=2.5, 
                 markersize=6,
                 color=colors[i % len(colors)],
                 label=f'{year}')
     
-    plt.title('Évolution du chiffre d\'affaires mensuel', fontsize=16, fontweight='bold', pad=20)
-    # plt.xlabel('Mois', fontsize=12)
-    # plt.ylabel('Chiffre d\'affaires (€)', fontsize=12)
-    plt.xticks(months, month_labels)
-    plt.grid(True, alpha=0.3)
-    plt.legend(loc='upper left')
-    plt.tight_layout()
+    ax.set_title('Évolution du chiffre d\'affaires mensuel', fontsize=16, fontweight='bold', pad=20)
+    ax.set_xticks(months, month_labels)
+    ax.grid(True, alpha=0.3)
+    ax.legend(loc='upper left')
+    figure.tight_layout()
     
-    # Formatage de l'axe Y avec des milliers séparés
-    ax = plt.gca()
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f}€'.replace(',', ' ')))
+    format_euros_axis(ax)
     
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
+    figure.savefig(output_path, dpi=150, bbox_inches='tight')
 
 
 def create_revenue_histogram_chart(revenue_data, years, output_path):
     """
     Génère un histogramme des chiffres d'affaires avec matplotlib
     """
-    plt.figure(figsize=(12, 6))
-    plt.style.use('default')
+    figure, ax = new_figure(figsize=(12, 6))
     
     months = list(range(1, 13))
-    month_labels = ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Juin', 
-                   'Juil', 'Août', 'Sep', 'Oct', 'Nov', 'Déc']
+    month_labels = MONTH_LABELS
     
     colors = ['#7FAEDC', '#4ECDC4', '#338ce6', '#FF6B6B', '#45B7D1']
     
     # Calculer la largeur des barres et les positions
     bar_width = 0.35
-    x_positions = np.arange(len(months))
+    x_positions = list(range(len(months)))
     
     sorted_years = sorted(years)
     
@@ -135,24 +271,21 @@ def create_revenue_histogram_chart(revenue_data, years, output_path):
         # Décaler les barres pour les afficher côte à côte
         offset = (i - len(sorted_years)/2 + 0.5) * bar_width
         
-        plt.bar(x_positions + offset, monthly_values,
+        ax.bar([x + offset for x in x_positions], monthly_values,
                 bar_width,
                 color=colors[i % len(colors)],
                 label=f'{year}',
                 alpha=0.8)
     
-    plt.title('Comparaison mensuelle du chiffre d\'affaires par année', fontsize=16, fontweight='bold', pad=20)
-    plt.xticks(x_positions, month_labels)
-    plt.grid(True, alpha=0.3, axis='y')
-    plt.legend(loc='upper left')
-    plt.tight_layout()
+    ax.set_title('Comparaison mensuelle du chiffre d\'affaires par année', fontsize=16, fontweight='bold', pad=20)
+    ax.set_xticks(x_positions, month_labels)
+    ax.grid(True, alpha=0.3, axis='y')
+    ax.legend(loc='upper left')
+    figure.tight_layout()
     
-    # Formatage de l'axe Y avec des milliers séparés
-    ax = plt.gca()
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f}€'.replace(',', ' ')))
+    format_euros_axis(ax)
     
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
+    figure.savefig(output_path, dpi=150, bbox_inches='tight')
 
 
 def generate_revenue_chart(years=None):
@@ -162,23 +295,8 @@ def generate_revenue_chart(years=None):
     if years is None:
         years = [2024, 2025]
     
-    # Import local pour éviter les problèmes de circularité
-    from factures.models import Invoice
-    
-    invoices = Invoice.objects.filter(date__year__in=years)
-    revenue_data = get_monthly_revenue_by_year(invoices, years)
-    
-    # Utiliser le répertoire MEDIA pour les fichiers générés dynamiquement
-    charts_dir = os.path.join(settings.MEDIA_ROOT, 'charts')
-    os.makedirs(charts_dir, exist_ok=True)
-    
-    output_filename = f"revenue_chart_{'_'.join(map(str, sorted(years)))}.png"
-    output_path = os.path.join(charts_dir, output_filename)
-    
-    create_revenue_chart(revenue_data, years, output_path)
-    
     # Retourner le chemin relatif pour le template avec MEDIA_URL
-    return f'charts/{output_filename}'
+    return render_revenue_charts(years, ['monthly'])['monthly']
 
 
 def generate_revenue_histogram_chart(years=None):
@@ -188,60 +306,41 @@ def generate_revenue_histogram_chart(years=None):
     if years is None:
         years = [2024, 2025]
     
-    # Import local pour éviter les problèmes de circularité
-    from factures.models import Invoice
-    
-    invoices = Invoice.objects.filter(date__year__in=years)
-    revenue_data = get_monthly_revenue_by_year(invoices, years)
-    
-    # Utiliser le répertoire MEDIA pour les fichiers générés dynamiquement
-    charts_dir = os.path.join(settings.MEDIA_ROOT, 'charts')
-    os.makedirs(charts_dir, exist_ok=True)
-    
-    output_filename = f"revenue_histogram_chart_{'_'.join(map(str, sorted(years)))}.png"
-    output_path = os.path.join(charts_dir, output_filename)
-    
-    create_revenue_histogram_chart(revenue_data, years, output_path)
-    
     # Retourner le chemin relatif pour le template avec MEDIA_URL
-    return f'charts/{output_filename}'
+    return render_revenue_charts(years, ['histogram'])['histogram']
 
 
 
 # Comparatif des chiffres d'affaires cumulés
-def get_cumulative_monthly_revenue_by_year(invoices, years):
+def cumulate_revenue(revenue_data, years):
     """
-    Calcule les chiffres d'affaires cumulés mensuels par année
+    Calcule les valeurs cumulées mois par mois à partir des chiffres d'affaires mensuels
     """
-    revenue_data = defaultdict(lambda: defaultdict(float))
-    
-    for invoice in invoices:
-        year = invoice.date.year
-        if year in years:
-            month = invoice.date.month
-            revenue_data[year][month] += float(invoice.amount_ht)
-    
-    # Calculer les valeurs cumulées
     cumulative_data = defaultdict(lambda: defaultdict(float))
     for year in years:
         cumulative_total = 0
         for month in range(1, 13):
-            cumulative_total += revenue_data[year].get(month, 0)
+            cumulative_total += revenue_data.get(year, {}).get(month, 0)
             cumulative_data[year][month] = cumulative_total
     
     return dict(cumulative_data)
 
 
+def get_cumulative_monthly_revenue_by_year(years):
+    """
+    Calcule les chiffres d'affaires cumulés mensuels par année
+    """
+    return cumulate_revenue(get_monthly_revenue_by_year(years), years)
+
+
 def create_cumulative_revenue_chart(cumulative_data, years, output_path):
     """
     Génère un graphique linéaire des chiffres d'affaires cumulés avec matplotlib
     """
-    plt.figure(figsize=(10, 5))
-    plt.style.use('default')
+    figure, ax = new_figure(figsize=(10, 5))
     
     months = list(range(1, 13))
-    month_labels = ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Juin', 
-                   'Juil', 'Août', 'Sep', 'Oct', 'Nov', 'Déc']
+    month_labels = MONTH_LABELS
     
     colors = ['#7FAEDC', '#4ECDC4', '#338ce6', '#FF6B6B', '#45B7D1']
     
@@ -250,27 +349,22 @@ def create_cumulative_revenue_chart(cumulative_data, years, output_path):
         for month in months:
             cumulative_values.append(cumulative_data.get(year, {}).get(month, 0))
         
-        plt.plot(months, cumulative_values, 
+        ax.plot(months, cumulative_values, 
                 marker='o', 
                 linewidth=2.5, 
                 markersize=6,
                 color=colors[i % len(colors)],
                 label=f'{year}')
     
-    plt.title('Évolution du chiffre d\'affaires cumulé', fontsize=16, fontweight='bold', pad=20)
-    # plt.xlabel('Mois', fontsize=12)
-    # plt.ylabel('Chiffre d\'affaires cumulé (€)', fontsize=12)
-    plt.xticks(months, month_labels)
-    plt.grid(True, alpha=0.3)
-    plt.legend(loc='upper left')
-    plt.tight_layout()
+    ax.set_title('Évolution du chiffre d\'affaires cumulé', fontsize=16, fontweight='bold', pad=20)
+    ax.set_xticks(months, month_labels)
+    ax.grid(True, alpha=0.3)
+    ax.legend(loc='upper left')
+    figure.tight_layout()
     
-    # Formatage de l'axe Y avec des milliers séparés
-    ax = plt.gca()
-    ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f}€'.replace(',', ' ')))
+    format_euros_axis(ax)
     
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
+    figure.savefig(output_path, dpi=150, bbox_inches='tight')
 
 
 def generate_cumulative_revenue_chart(years=None):
@@ -280,23 +374,96 @@ def generate_cumulative_revenue_chart(years=None):
     if years is None:
         years = [2024, 2025]
     
-    # Import local pour éviter les problèmes de circularité
-    from factures.models import Invoice
-    
-    invoices = Invoice.objects.filter(date__year__in=years)
-    cumulative_data = get_cumulative_monthly_revenue_by_year(invoices, years)
-    
-    # Utiliser le répertoire MEDIA pour les fichiers générés dynamiquement
-    charts_dir = os.path.join(settings.MEDIA_ROOT, 'charts')
-    os.makedirs(charts_dir, exist_ok=True)
-    
-    output_filename = f"cumulative_revenue_chart_{'_'.join(map(str, sorted(years)))}.png"
-    output_path = os.path.join(charts_dir, output_filename)
-    
-    create_cumulative_revenue_chart(cumulative_data, years, output_path)
-    
     # Retourner le chemin relatif pour le template avec MEDIA_URL
-    return f'charts/{output_filename}'
+    return render_revenue_charts(years, ['cumulative'])['cumulative']
+
+
+# Graphiques disponibles en PNG de secours, par nom utilisé dans les URLs :
+# (préfixe du fichier en cache, données mensuelles ou cumulées, fonction de rendu)
+REVENUE_CHARTS = {
+    'monthly': ('revenue_chart', 'monthly', create_revenue_chart),
+    'histogram': ('revenue_histogram_chart', 'monthly', create_revenue_histogram_chart),
+    'cumulative': ('cumulative_revenue_chart', 'cumulative', create_cumulative_revenue_chart),
+}
+
+
+def render_revenue_charts(years, kinds=None, wait=True):
+    """
+    Génère les graphiques demandés (tous par défaut) en parallèle dans le pool de rendu,
+    après une seule lecture des données.
+    Retourne {nom: chemin relatif à MEDIA_ROOT} ; avec wait=False, un graphique
+    dont le rendu est encore en cours vaut None.
+    """
+    revenue_data = get_monthly_revenue_by_year(years)
+    data = {
+        'monthly': revenue_data,
+        'cumulative': cumulate_revenue(revenue_data, years),
+    }
+    
+    submitted = {}
+    for name in kinds or REVENUE_CHARTS:
+        kind, data_key, render = REVENUE_CHARTS[name]
+        submitted[name] = submit_chart(kind, years, data[data_key], render)
+    
+    if wait:
+        futures = [future for _, future in submitted.values() if future is not None]
+        wait_futures(futures)
+        for future in futures:
+            # Propager une éventuelle erreur de rendu
+            future.result()
+    
+    return {
+        name: path if future is None or (future.done() and future.exception() is None) else None
+        for name, (path, future) in submitted.items()
+    }
+
+
+def prerender_revenue_charts():
+    """
+    Lance sans attendre le rendu des graphiques de l'année en cours et de l'année précédente,
+    pour que les images de secours soient prêtes avant d'être demandées
+    """
+    current_year = datetime.now().year
+    render_revenue_charts([current_year, current_year - 1], wait=False)
+
+
+def get_revenue_series(years):
+    """
+    Données des graphiques de chiffre d'affaires au format JSON, dessinées par le navigateur :
+    une liste de 12 valeurs par année, mensuelle et cumulée
+    """
+    years = sorted(years)
+    revenue_data = get_monthly_revenue_by_year(years)
+
+    monthly = {}
+    cumulative = {}
+    for year in years:
+        cumulative_total = 0
+        monthly[str(year)] = []
+        cumulative[str(year)] = []
+        for month in range(1, 13):
+            value = revenue_data.get(year, {}).get(month, 0)
+            cumulative_total += value
+            monthly[str(year)].append(round(value, 2))
+            cumulative[str(year)].append(round(cumulative_total, 2))
+
+    averages = calculate_monthly_averages(revenue_data, years)
+    return {
+        'years': years,
+        'months': MONTH_LABELS,
+        'series': {
+            'monthly': monthly,
+            'cumulative': cumulative,
+        },
+        'averages': {
+            str(year): {
+                'total_annual': round(stats['total_annual'], 2),
+                'average_monthly': round(stats['average_monthly'], 2),
+                'months_with_data': stats['months_with_data'],
+            }
+            for year, stats in averages['by_year'].items()
+        },
+    }
 
 
 def calculate_monthly_averages(revenue_data, years):
@@ -358,7 +525,7 @@ def get_available_years():
     """
     Récupère toutes les années disponibles dans les factures
     """
-    from factures.models import Invoice
+    from dashboard.models import MonthlyRevenue
     
-    years = Invoice.objects.dates('date', 'year').values_list('date__year', flat=True)
+    years = MonthlyRevenue.objects.values_list('year', flat=True).distinct()
     return sorted(set(years), reverse=True)
\ No newline at end of file
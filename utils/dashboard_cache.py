@@ -0,0 +1,71 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+# Widgets des pages du tableau de bord mis en cache, et modèles ('app.Modèle') dont une écriture les invalide
+DASHBOARD_WIDGETS = {
+    'kpis': {'factures.Invoice', 'factures.Payment', 'clients.Client'},
+    'revenue_totals': {'factures.Invoice'},
+    'available_years': {'factures.Invoice'},
+    'monthly_averages': {'factures.Invoice'},
+    'open_affaires': {'factures.Invoice', 'affaires.Affaire', 'clients.Client'},
+    'clients_open_affaires': {'factures.Invoice', 'affaires.Affaire', 'clients.Client'},
+    'top_clients_revenue': {'factures.Invoice', 'affaires.Affaire', 'clients.Client'},
+    'top_clients_budget': {'affaires.Affaire', 'clients.Client'},
+    'top_affaires_budget': {'affaires.Affaire', 'clients.Client'},
+}
+
+# Modèles dont les sauvegardes et suppressions invalident le cache (signaux de dashboard/signals.py)
+DASHBOARD_MODELS = set().union(*DASHBOARD_WIDGETS.values())
+
+# Valeur absente du cache (un widget peut valoir None)
+MISSING = object()
+
+
+def version_key(widget):
+    return f'dashboard:{widget}:version'
+
+
+def get_version(widget):
+    """Version courante d'un widget : fait partie de la clé de ses valeurs en cache"""
+    version = cache.get(version_key(widget))
+    if version is None:
+        # Version perdue (redémarrage, éviction) : repartir d'une valeur jamais utilisée
+        cache.add(version_key(widget), time.time_ns(), timeout=None)
+        version = cache.get(version_key(widget))
+    return version
+
+
+def cached_widget(widget, compute, *params):
+    """
+    Valeur d'un widget pour des paramètres donnés (année, années sélectionnées...),
+    calculée par compute() si elle n'est pas en cache pour la version courante du widget
+    """
+    key = ':'.join(['dashboard', widget, str(get_version(widget)), *(str(param) for param in params)])
+    value = cache.get(key, MISSING)
+    if value is MISSING:
+        value = compute()
+        cache.set(key, value, settings.DASHBOARD_CACHE_TIMEOUT)
+    return value
+
+
+def bump_versions(widgets):
+    for widget in widgets:
+        try:
+            cache.incr(version_key(widget))
+        except ValueError:
+            cache.set(version_key(widget), time.time_ns(), timeout=None)
+
+
+def invalidate_dashboard_cache(*models):
+    """
+    Invalide les widgets qui dépendent des modèles donnés ('factures.Invoice'...), tous par défaut.
+    Les anciennes valeurs ne sont plus lues (changement de version) et expirent d'elles-mêmes.
+    Fait après validation de la transaction : une page calculée entre-temps l'est avec l'ancienne version.
+    """
+    models = set(models) or DASHBOARD_MODELS
+    widgets = [widget for widget, dependencies in DASHBOARD_WIDGETS.items() if dependencies & models]
+    if widgets:
+        transaction.on_commit(lambda: bump_versions(widgets))
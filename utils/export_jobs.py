@@ -0,0 +1,157 @@
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from utils.export_rows import EXPORT_ROWS_BY_TYPE, DATABASE_EXPORT_ROWS
+from utils.exports import (
+    COLUMNAR_FORMATS, write_csv, write_xlsx, write_database_csv, write_columnar, write_database_columnar,
+)
+
+
+# Exports trop longs pour la durée d'une requête : générés en arrière-plan
+# (type d'export -> formats concernés)
+ASYNC_EXPORTS = {
+    'database': {'csv', 'xlsx', 'parquet', 'arrow'},
+}
+
+
+def is_async_export(export_type, export_format):
+    return export_format in ASYNC_EXPORTS.get(export_type, ())
+
+
+def get_export_rows_list(job):
+    """Exports (ExportRows) écrits par un job, dans l'ordre des fichiers / feuilles"""
+    if job.export_type == 'database':
+        return [rows_class() for _, rows_class in DATABASE_EXPORT_ROWS]
+    return [EXPORT_ROWS_BY_TYPE[job.export_type](job.date_debut, job.date_fin)]
+
+
+def get_job_writer(job, export_rows_list):
+    """Retourne (préfixe du nom de fichier, extension, fonction d'écriture(output, progress))"""
+    if job.export_type == 'database':
+        if job.export_format == 'csv':
+            return 'export_base_donnees', 'zip', write_database_csv
+        if job.export_format in COLUMNAR_FORMATS:
+            return f'export_base_donnees_{job.export_format}', 'zip', lambda output, progress: write_database_columnar(output, job.export_format, progress)
+        return 'export_base_donnees', 'xlsx', lambda output, progress: write_xlsx(output, export_rows_list, progress)
+    if job.export_format in COLUMNAR_FORMATS:
+        extension, _ = COLUMNAR_FORMATS[job.export_format]
+        return job.export_type, extension, lambda output, progress: write_columnar(output, export_rows_list[0], job.export_format, progress)
+    if job.export_format == 'csv':
+        return job.export_type, 'csv', lambda output, progress: write_csv(output, export_rows_list[0], progress)
+    return job.export_type, 'xlsx', lambda output, progress: write_xlsx(output, export_rows_list, progress)
+
+
+def run_export_job(job_id):
+    """
+    Génère le fichier d'un job en attente. Le job est d'abord réservé par une mise à jour
+    conditionnelle, un même job ne peut donc pas être traité deux fois (pool et commande).
+    Retourne False si le job n'était plus en attente.
+    """
+    from dashboard.models import ExportJob
+
+    claimed = ExportJob.objects.filter(pk=job_id, statut='en_attente').update(
+        statut='en_cours', started_at=timezone.now(),
+    )
+    if not claimed:
+        return False
+
+    job = ExportJob.objects.get(pk=job_id)
+    output_path = None
+    try:
+        export_rows_list = get_export_rows_list(job)
+        job.rows_total = sum(export_rows.count() for export_rows in export_rows_list)
+        job.save(update_fields=['rows_total'])
+
+        def progress(count):
+            ExportJob.objects.filter(pk=job_id).update(rows_done=F('rows_done') + count)
+
+        prefix, extension, write = get_job_writer(job, export_rows_list)
+        filename = f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+        # Préfixe aléatoire : le fichier ne peut pas être deviné depuis /media/
+        relative_path = f'exports/{uuid.uuid4().hex}_{filename}'
+        output_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        # Écriture dans un fichier temporaire puis renommage : pas de téléchargement d'un fichier incomplet
+        temp_path = f'{output_path}.tmp'
+        try:
+            with open(temp_path, 'wb') as output:
+                write(output, progress)
+            os.replace(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        finished_at = timezone.now()
+        ExportJob.objects.filter(pk=job_id).update(
+            statut='termine',
+            file=relative_path,
+            filename=filename,
+            rows_done=F('rows_total'),
+            finished_at=finished_at,
+            expires_at=finished_at + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS),
+        )
+    except Exception as e:
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+        finished_at = timezone.now()
+        ExportJob.objects.filter(pk=job_id).update(
+            statut='echec',
+            error=str(e),
+            finished_at=finished_at,
+            expires_at=finished_at + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS),
+        )
+    return True
+
+
+# Pool d'export partagé par le processus
+_export_executor = None
+_export_lock = threading.Lock()
+
+
+def get_export_executor():
+    global _export_executor
+    with _export_lock:
+        if _export_executor is None:
+            _export_executor = ThreadPoolExecutor(
+                max_workers=settings.EXPORT_JOB_WORKERS,
+                thread_name_prefix='exports',
+            )
+        return _export_executor
+
+
+def _run_in_thread(job_id):
+    try:
+        run_export_job(job_id)
+    except Exception as e:
+        print(f"Erreur lors de l'export en arrière-plan: {e}")
+    finally:
+        # Chaque thread du pool a sa propre connexion : la fermer après le job
+        connection.close()
+
+
+def create_export_job(export_type, export_format, date_debut=None, date_fin=None, author=None):
+    """
+    Enregistre un job d'export et, si EXPORT_JOBS_IN_PROCESS, le lance dans le pool
+    après validation de la transaction ; sinon il attend la commande run_export_jobs
+    """
+    from dashboard.models import ExportJob
+
+    ExportJob.purge_expired()
+    job = ExportJob.objects.create(
+        export_type=export_type,
+        export_format=export_format,
+        date_debut=date_debut or None,
+        date_fin=date_fin or None,
+        author=author,
+    )
+    if settings.EXPORT_JOBS_IN_PROCESS:
+        transaction.on_commit(lambda: get_export_executor().submit(_run_in_thread, job.pk))
+    return job
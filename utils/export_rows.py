@@ -0,0 +1,366 @@
+from decimal import Decimal
+from django.db.models import Sum, Value, DecimalField, Prefetch, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from clients.models import Client, Contact
+from affaires.models import Affaire
+from factures.models import Invoice, Payment
+
+
+# Nombre de lignes lues par requête lors des exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Types de colonnes : déterminent le format en CSV (texte à la française) et en Excel (valeur typée)
+TEXT = 'text'
+AMOUNT = 'amount'  # 2 décimales
+RATE = 'rate'      # 1 décimale (taux de TVA, pourcentages)
+DATE = 'date'
+DATETIME = 'datetime'
+INTEGER = 'integer'
+
+
+def format_csv_value(value, kind):
+    """Valeur d'une cellule CSV : décimales avec virgule, dates au format jj/mm/aaaa"""
+    if kind == AMOUNT:
+        return f"{value:.2f}".replace('.', ',')
+    if kind == RATE:
+        return f"{value:.1f}".replace('.', ',')
+    if kind == DATE:
+        return value.strftime('%d/%m/%Y')
+    if kind == DATETIME:
+        return timezone.localtime(value).strftime('%d/%m/%Y %H:%M:%S')
+    return value
+
+
+def format_xlsx_value(value, kind):
+    """Valeur d'une cellule Excel : nombres en float, dates conservées comme dates"""
+    if kind in (AMOUNT, RATE):
+        return float(value)
+    if kind == DATETIME:
+        # Excel ne gère pas les fuseaux horaires : heure locale sans fuseau
+        return timezone.make_naive(value)
+    return value
+
+
+def format_arrow_value(value, kind):
+    """Valeur d'une colonne Arrow / Parquet : décimales arrondies à l'échelle de la colonne, texte en chaîne"""
+    if value is None:
+        return None
+    if kind in (AMOUNT, RATE):
+        return Decimal(value).quantize(Decimal('0.01'))
+    if kind == TEXT:
+        return str(value)
+    return value
+
+
+def get_author_name(author):
+    """Nom affiché de l'auteur : prénom et nom, ou à défaut l'email"""
+    if not author:
+        return ''
+    return f"{author.first_name} {author.last_name}".strip() or author.email
+
+
+class ExportRows:
+    """
+    Lignes d'un export, partagées par les exports CSV et Excel.
+    Chaque sous-classe décrit ses colonnes (en-tête, type), construit une requête
+    qui charge en amont tout ce dont les lignes ont besoin (select_related,
+    prefetch_related, annotations) et extrait les valeurs d'un objet sans requête supplémentaire.
+
+    Avec `since` (export incrémental), seules les lignes modifiées après cette date sont exportées,
+    précédées de leur ID et suivies de leur date de modification.
+    """
+    sheet_title = ''
+    columns = []
+    model = None
+    # Relations dont la modification change aussi les valeurs exportées (export incrémental)
+    changed_with = []
+
+    def __init__(self, date_debut=None, date_fin=None, since=None):
+        self.date_debut = date_debut
+        self.date_fin = date_fin
+        self.since = since
+        if since is not None:
+            self.columns = [('ID', INTEGER)] + self.columns + [('Modifié le', DATETIME)]
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_values(self, obj):
+        raise NotImplementedError
+
+    def get_changed_queryset(self):
+        """Lignes modifiées depuis `since`, directement ou par une relation de `changed_with`"""
+        condition = Q(updated_at__gt=self.since)
+        for relation in self.changed_with:
+            condition |= Q(**{f'{relation}__updated_at__gt': self.since})
+        # Sous-requête : les jointures des relations ne dupliquent pas les lignes exportées
+        return self.get_queryset().filter(id__in=self.model.objects.filter(condition).values('id'))
+
+    def get_export_queryset(self):
+        if self.since is None:
+            return self.get_queryset()
+        return self.get_changed_queryset()
+
+    def count(self):
+        """Nombre de lignes de l'export (sert au suivi d'avancement des exports en arrière-plan)"""
+        return self.get_export_queryset().order_by().count()
+
+    def __iter__(self):
+        for obj in self.get_export_queryset().iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            if self.since is None:
+                yield self.get_values(obj)
+            else:
+                yield [obj.pk, *self.get_values(obj), obj.updated_at]
+
+    def csv_rows(self):
+        kinds = [kind for _, kind in self.columns]
+        for values in self:
+            yield [format_csv_value(value, kind) for value, kind in zip(values, kinds)]
+
+    def xlsx_rows(self):
+        kinds = [kind for _, kind in self.columns]
+        for values in self:
+            yield [format_xlsx_value(value, kind) for value, kind in zip(values, kinds)]
+
+    def arrow_rows(self):
+        kinds = [kind for _, kind in self.columns]
+        for values in self:
+            yield [format_arrow_value(value, kind) for value, kind in zip(values, kinds)]
+
+
+class ClientRows(ExportRows):
+    sheet_title = "Clients"
+    model = Client
+    # Total des budgets des affaires
+    changed_with = ['affaires']
+    columns = [
+        ('Nom de l\'entité', TEXT), ('Adresse', TEXT), ('Code postal', TEXT), ('Ville', TEXT),
+        ('Contact', TEXT), ('Téléphone', TEXT), ('Email', TEXT), ('Total affaires (€)', AMOUNT),
+    ]
+
+    def get_queryset(self):
+        # Total des budgets calculé par la base au lieu de la propriété total_affaire_client
+        return Client.objects.annotate(
+            annotated_total_affaires=Coalesce(
+                Sum('affaires__budget'), Value(Decimal('0')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        ).order_by('entity_name')
+
+    def get_values(self, client):
+        return [
+            client.entity_name or '',
+            client.address or '',
+            client.zip_code or '',
+            client.city or '',
+            client.contact or '',
+            client.phone_number or '',
+            client.email or '',
+            client.annotated_total_affaires,
+        ]
+
+
+class ContactRows(ExportRows):
+    sheet_title = "Contacts"
+    model = Contact
+    changed_with = ['affaire']
+    columns = [
+        ('Nom', TEXT), ('Prénom', TEXT), ('Fonction', TEXT), ('Téléphone', TEXT), ('Email', TEXT),
+        ('Principal', TEXT), ('Numéro affaire', TEXT), ('Client', TEXT),
+    ]
+
+    def get_queryset(self):
+        return Contact.objects.select_related('affaire').order_by('nom')
+
+    def get_values(self, contact):
+        return [
+            contact.nom or '',
+            contact.prenom or '',
+            contact.fonction or '',
+            contact.phone_number or '',
+            contact.email or '',
+            'Oui' if contact.is_principal else 'Non',
+            contact.affaire.affaire_number if contact.affaire else '',
+            contact.affaire.client_entity_name if contact.affaire else '',
+        ]
+
+
+class AffaireRows(ExportRows):
+    sheet_title = "Affaires"
+    model = Affaire
+    # Totaux facturés et contact principal
+    changed_with = ['invoices', 'contacts']
+    columns = [
+        ('Numéro affaire', TEXT), ('Client', TEXT), ('Description', TEXT), ('Budget (€)', AMOUNT),
+        ('Total facturé HT (€)', AMOUNT), ('Reste à facturer (€)', AMOUNT), ('Taux d\'avancement (%)', RATE),
+        ('Contact principal', TEXT), ('Auteur', TEXT),
+    ]
+
+    def get_queryset(self):
+        affaires = Affaire.objects.with_financials().select_related('author').prefetch_related(
+            # Un seul contact principal par affaire (contrainte unique_principal_contact_per_affaire)
+            Prefetch('contacts', queryset=Contact.objects.filter(is_principal=True), to_attr='principal_contacts')
+        ).order_by('affaire_number')
+
+        # Filtrage par date si spécifié (basé sur la date des factures associées)
+        if self.date_debut or self.date_fin:
+            invoices = Invoice.objects.all()
+            if self.date_debut:
+                invoices = invoices.filter(date__gte=self.date_debut)
+            if self.date_fin:
+                invoices = invoices.filter(date__lte=self.date_fin)
+            affaires = affaires.filter(id__in=invoices.values('affaire_id'))
+        return affaires
+
+    def get_values(self, affaire):
+        contact_principal = affaire.principal_contacts[0] if affaire.principal_contacts else None
+        return [
+            affaire.affaire_number,
+            affaire.client_entity_name or '',
+            affaire.affaire_description or '',
+            affaire.budget,
+            affaire.total_facture_ht,
+            affaire.reste_a_facturer,
+            affaire.taux_avancement,
+            str(contact_principal) if contact_principal else '',
+            get_author_name(affaire.author),
+        ]
+
+
+class InvoiceRows(ExportRows):
+    sheet_title = "Factures"
+    model = Invoice
+    changed_with = ['affaire', 'contact']
+    columns = [
+        ('Numéro facture', TEXT), ('Date', DATE), ('Type', TEXT), ('Client', TEXT), ('Affaire', TEXT), ('Objet', TEXT),
+        ('Montant HT (€)', AMOUNT), ('Taux TVA (%)', RATE), ('Montant TTC (€)', AMOUNT), ('Statut', TEXT),
+        ('Date échéance', DATE), ('Solde (€)', AMOUNT), ('Contact', TEXT), ('Auteur', TEXT),
+    ]
+
+    def get_queryset(self):
+        factures = Invoice.objects.select_related('affaire', 'contact', 'author').order_by('-date')
+
+        # Filtrage par date
+        if self.date_debut:
+            factures = factures.filter(date__gte=self.date_debut)
+        if self.date_fin:
+            factures = factures.filter(date__lte=self.date_fin)
+        return factures
+
+    def get_values(self, facture):
+        return [
+            facture.invoice_number,
+            facture.date,
+            facture.get_type_display(),
+            facture.client_entity_name or '',
+            facture.affaire.affaire_number if facture.affaire else '',
+            facture.invoice_object or '',
+            facture.amount_ht,
+            facture.vat_rate,
+            facture.amount_ttc,
+            facture.get_statut_display(),
+            facture.due_date,
+            facture.balance,
+            str(facture.contact) if facture.contact else '',
+            get_author_name(facture.author),
+        ]
+
+
+class ReglementRows(ExportRows):
+    sheet_title = "Règlements"
+    model = Payment
+    changed_with = ['invoice', 'invoice__affaire']
+    columns = [
+        ('Date', DATE), ('Montant (€)', AMOUNT), ('Numéro facture', TEXT), ('Client', TEXT),
+        ('Affaire', TEXT), ('Moyen de paiement', TEXT),
+    ]
+
+    def get_queryset(self):
+        paiements = Payment.objects.select_related('invoice__affaire').order_by('-date')
+
+        # Filtrage par date
+        if self.date_debut:
+            paiements = paiements.filter(date__gte=self.date_debut)
+        if self.date_fin:
+            paiements = paiements.filter(date__lte=self.date_fin)
+        return paiements
+
+    def get_values(self, paiement):
+        return [
+            paiement.date,
+            paiement.amount,
+            paiement.invoice.invoice_number,
+            paiement.invoice.client_entity_name or '',
+            paiement.invoice.affaire.affaire_number if paiement.invoice.affaire else '',
+            paiement.payment_method or '',
+        ]
+
+
+class PaymentRows(ExportRows):
+    """Paiements de l'export complet de la base (sans client ni affaire)"""
+    sheet_title = "Paiements"
+    model = Payment
+    changed_with = ['invoice']
+    columns = [
+        ('Date', DATE), ('Montant (€)', AMOUNT), ('Numéro facture', TEXT), ('Moyen de paiement', TEXT),
+    ]
+
+    def get_queryset(self):
+        return Payment.objects.select_related('invoice').order_by('-date')
+
+    def get_values(self, paiement):
+        return [
+            paiement.date,
+            paiement.amount,
+            paiement.invoice.invoice_number,
+            paiement.payment_method or '',
+        ]
+
+
+class DeletionRows(ExportRows):
+    """Suppressions depuis `since` (export incrémental), pour les types d'export demandés"""
+    sheet_title = "Suppressions"
+    columns = [
+        ('Type', TEXT), ('ID', INTEGER), ('Libellé', TEXT), ('Supprimé le', DATETIME),
+    ]
+
+    def __init__(self, since, export_types):
+        super().__init__()
+        self.deleted_since = since
+        self.export_types = export_types
+
+    def get_queryset(self):
+        from dashboard.models import DeletedRecord
+
+        return DeletedRecord.objects.filter(
+            deleted_at__gt=self.deleted_since, export_type__in=self.export_types,
+        ).order_by('deleted_at', 'id')
+
+    def get_values(self, record):
+        return [record.export_type, record.object_id, record.label, record.deleted_at]
+
+
+# Exports par type de données de la modale d'export
+EXPORT_ROWS_BY_TYPE = {
+    'clients': ClientRows,
+    'contacts': ContactRows,
+    'affaires': AffaireRows,
+    'factures': InvoiceRows,
+    'reglements': ReglementRows,
+}
+
+
+# Tables de l'export complet de la base, dans l'ordre des fichiers / feuilles
+DATABASE_EXPORT_ROWS = [
+    ('clients', ClientRows),
+    ('contacts', ContactRows),
+    ('affaires', AffaireRows),
+    ('factures', InvoiceRows),
+    ('paiements', PaymentRows),
+]
@@ -1,936 +1,435 @@
 import csv
-import io
+import os
+import shutil
 import tempfile
-import subprocess
+import threading
 import zipfile
 from datetime import datetime
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse, FileResponse
 from django.conf import settings
 from django.db import connection
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import chain, islice
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Alignment, PatternFill
 
-from clients.models import Client, Contact
-from affaires.models import Affaire
-from factures.models import Invoice, Payment
+from utils.backups import get_database_backup
+from utils.export_rows import (
+    EXPORT_CHUNK_SIZE, TEXT, INTEGER, AMOUNT, RATE, DATE, DATETIME, ClientRows, ContactRows, AffaireRows, InvoiceRows, ReglementRows, DeletionRows,
+    DATABASE_EXPORT_ROWS, EXPORT_ROWS_BY_TYPE,
+)
+
+
+# Taille approximative des blocs envoyés au client (en caractères)
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class Echo:
+    """Pseudo-fichier pour csv.writer : write() renvoie la ligne au lieu de la stocker"""
+
+    def write(self, value):
+        return value
+
+
+def track_progress(rows, progress=None, step=EXPORT_CHUNK_SIZE):
+    """
+    Relaie les lignes d'un export en signalant leur nombre à `progress(n)` tous les `step` lignes
+    (utilisé par les exports en arrière-plan pour suivre l'avancement)
+    """
+    if progress is None:
+        yield from rows
+        return
+    
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count >= step:
+            progress(count)
+            count = 0
+    if count:
+        progress(count)
+
+
+def iter_csv(headers, rows):
+    """
+    Contenu CSV par morceaux de texte : BOM + en-têtes, puis les lignes par blocs
+    d'environ STREAM_BUFFER_SIZE caractères
+    """
+    writer = csv.writer(Echo(), delimiter=';')
+    # BOM pour Excel
+    yield '\ufeff' + writer.writerow(headers)
+    
+    buffer = []
+    buffer_size = 0
+    for row in rows:
+        line = writer.writerow(row)
+        buffer.append(line)
+        buffer_size += len(line)
+        if buffer_size >= STREAM_BUFFER_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            buffer_size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_csv_response(filename_prefix, headers, rows):
+    """
+    Réponse CSV envoyée au fil de l'eau : BOM + en-têtes immédiatement,
+    puis les lignes par blocs, sans jamais garder tout le fichier en mémoire.
+    `rows` est un itérable paresseux (la requête n'est exécutée qu'au premier bloc).
+    """
+    response = StreamingHttpResponse(iter_csv(headers, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename_prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+    # Ne pas laisser nginx mettre la réponse en tampon avant de l'envoyer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def write_csv(output, export_rows, progress=None):
+    """Écrit un export CSV (encodé en UTF-8) dans un fichier binaire ouvert"""
+    for chunk in iter_csv(export_rows.headers, track_progress(export_rows.csv_rows(), progress)):
+        output.write(chunk.encode('utf-8'))
 
 
 def export_database():
-    """Export complet de la base de données SQLite"""
+    """
+    Sauvegarde native de la base configurée (API de sauvegarde SQLite, pg_dump pour PostgreSQL),
+    écrite entièrement dans un fichier temporaire avant l'envoi : un pg_dump en échec lève une
+    exception au lieu d'envoyer un fichier tronqué avec un statut 200
+    """
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.sql', delete=False) as temp_file:
-            # Utiliser sqlite3 pour faire un dump de la base
-            result = subprocess.run(
-                ['sqlite3', settings.DATABASES['default']['NAME'], '.dump'],
-                stdout=temp_file,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            if result.returncode != 0:
-                raise Exception(f"Erreur lors de l'export: {result.stderr}")
-            
-            temp_file.flush()
-            
-            # Lire le fichier et le retourner comme réponse
-            with open(temp_file.name, 'r') as f:
-                sql_content = f.read()
-            
-            response = HttpResponse(sql_content, content_type='application/sql')
-            response['Content-Disposition'] = f'attachment; filename="backup_database_{datetime.now().strftime("%Y%m%d_%H%M%S")}.sql"'
-            return response
-            
+        backup = get_database_backup()
     except Exception as e:
         raise Exception(f"Erreur lors de l'export de la base de données: {str(e)}")
+    
+    return file_response(lambda output: output.writelines(backup.iter_chunks()), backup.filename(), backup.content_type)
 
 
-def export_clients_csv():
-    """Export des clients au format CSV"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="clients_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    # BOM pour Excel
-    response.write('\ufeff')
-    
-    writer = csv.writer(response, delimiter=';')
-    writer.writerow([
-        'Nom de l\'entité', 'Adresse', 'Code postal', 'Ville', 
-        'Contact', 'Téléphone', 'Email', 'Total affaires (€)'
-    ])
-    
-    clients = Client.objects.all().order_by('entity_name')
-    for client in clients:
-        writer.writerow([
-            client.entity_name or '',
-            client.address or '',
-            client.zip_code or '',
-            client.city or '',
-            client.contact or '',
-            client.phone_number or '',
-            client.email or '',
-            f"{client.total_affaire_client:.2f}".replace('.', ',')
-        ])
-    
-    return response
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
 
-def export_clients_xlsx():
-    """Export des clients au format Excel"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Clients"
+# Nombre de lignes lues avant écriture pour estimer la largeur des colonnes
+XLSX_WIDTH_SAMPLE_ROWS = 500
+
+
+def run_per_table(func, items):
+    """
+    Lance func(item) pour chaque table dans un pool de threads, une connexion
+    à la base par thread (fermée à la fin de la table).
+    Retourne les futures dans l'ordre des tables : l'assemblage peut commencer
+    par la première table pendant que les suivantes sont encore en cours.
+    """
+    def run(item):
+        try:
+            return func(item)
+        finally:
+            connection.close()
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(len(items), settings.EXPORT_TABLE_WORKERS)),
+        thread_name_prefix='export_tables',
+    )
+    futures = [executor.submit(run, item) for item in items]
+    executor.shutdown(wait=False)
+    return futures
+
+
+def write_xlsx_sheet(ws, export_rows, progress=None, lock=None):
+    """
+    Remplit une feuille en écriture seule (write_only) : les lignes sont écrites au fil de l'eau
+    dans un fichier temporaire d'openpyxl, sans garder les cellules en mémoire.
+    La largeur des colonnes, qui doit être fixée avant la première ligne,
+    est estimée sur un échantillon des premières lignes.
+    `lock` sérialise les écritures quand plusieurs feuilles du classeur sont remplies en parallèle
+    (les styles des cellules sont partagés par le classeur).
+    """
+    lock = lock or nullcontext()
+    rows = track_progress(export_rows.xlsx_rows(), progress)
+    sample = list(islice(rows, XLSX_WIDTH_SAMPLE_ROWS))
+    
+    # Ajuster la largeur des colonnes
+    for col, header in enumerate(export_rows.headers, 1):
+        max_length = max([len(str(header))] + [len(str(values[col - 1])) for values in sample])
+        ws.column_dimensions[get_column_letter(col)].width = min(max_length + 2, 50)
     
     # Style des en-têtes
     header_font = Font(bold=True, color="FFFFFF")
     header_fill = PatternFill(start_color="7FAEDC", end_color="7FAEDC", fill_type="solid")
     header_alignment = Alignment(horizontal="center")
     
-    # En-têtes
-    headers = [
-        'Nom de l\'entité', 'Adresse', 'Code postal', 'Ville', 
-        'Contact', 'Téléphone', 'Email', 'Total affaires (€)'
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Données
-    clients = Client.objects.all().order_by('entity_name')
-    for row, client in enumerate(clients, 2):
-        ws.cell(row=row, column=1, value=client.entity_name or '')
-        ws.cell(row=row, column=2, value=client.address or '')
-        ws.cell(row=row, column=3, value=client.zip_code or '')
-        ws.cell(row=row, column=4, value=client.city or '')
-        ws.cell(row=row, column=5, value=client.contact or '')
-        ws.cell(row=row, column=6, value=client.phone_number or '')
-        ws.cell(row=row, column=7, value=client.email or '')
-        ws.cell(row=row, column=8, value=float(client.total_affaire_client))
-    
-    # Ajuster la largeur des colonnes
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Créer la réponse HTTP
-    output = io.BytesIO()
+    with lock:
+        header_cells = []
+        for header in export_rows.headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            header_cells.append(cell)
+        ws.append(header_cells)
+    
+    # Données : lecture et mise en forme hors du verrou, écriture par paquets
+    rows = chain(sample, rows)
+    while batch := list(islice(rows, EXPORT_CHUNK_SIZE)):
+        with lock:
+            for values in batch:
+                ws.append(values)
+
+
+def write_xlsx(output, export_rows_list, progress=None):
+    """
+    Écrit un classeur Excel (une feuille par export) dans un fichier binaire ouvert.
+    Avec plusieurs feuilles, chacune est lue et écrite dans son propre thread.
+    """
+    wb = Workbook(write_only=True)
+    # Feuilles créées ici pour garder leur ordre dans le classeur
+    sheets = [(wb.create_sheet(export_rows.sheet_title), export_rows) for export_rows in export_rows_list]
+    
+    if len(sheets) == 1:
+        write_xlsx_sheet(sheets[0][0], sheets[0][1], progress)
+    else:
+        lock = threading.Lock()
+        futures = run_per_table(lambda sheet: write_xlsx_sheet(*sheet, progress, lock), sheets)
+        for future in futures:
+            future.result()
     wb.save(output)
-    output.seek(0)
+
+
+def open_zip_member(zipf, filename, compress_type=zipfile.ZIP_DEFLATED):
+    """Ouvre en écriture un fichier du ZIP, daté de l'heure actuelle"""
+    info = zipfile.ZipInfo(filename, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = compress_type
+    return zipf.open(info, 'w')
+
+
+def write_database_zip(output, write_table, extension, compress_type=zipfile.ZIP_DEFLATED):
+    """
+    Écrit le ZIP de l'export complet (un fichier par table) dans un fichier binaire ouvert.
+    Chaque table est écrite en parallèle par write_table(fichier, export_rows) dans un fichier temporaire,
+    puis recopiée dans le ZIP dans l'ordre des tables, dès qu'elle est prête.
+    """
+    def write_table_file(table):
+        _, rows_class = table
+        temp_file = tempfile.TemporaryFile(suffix=f'.{extension}')
+        try:
+            write_table(temp_file, rows_class())
+            temp_file.seek(0)
+        except Exception:
+            temp_file.close()
+            raise
+        return temp_file
+    
+    futures = run_per_table(write_table_file, DATABASE_EXPORT_ROWS)
+    try:
+        with zipfile.ZipFile(output, 'w', compress_type) as zipf:
+            for (name, _), future in zip(DATABASE_EXPORT_ROWS, futures):
+                with future.result() as temp_file, open_zip_member(zipf, f'{name}.{extension}', compress_type) as member:
+                    shutil.copyfileobj(temp_file, member, STREAM_BUFFER_SIZE)
+    finally:
+        # En cas d'erreur, fermer (et supprimer) les fichiers des tables non recopiées
+        for future in futures:
+            if not future.cancel() and future.exception() is None:
+                future.result().close()
+
+
+def write_database_csv(output, progress=None):
+    """ZIP de l'export complet au format CSV (un fichier par table)"""
+    write_database_zip(output, lambda table_file, export_rows: write_csv(table_file, export_rows, progress), 'csv')
+
+
+# Formats colonnes pour les outils d'analyse (pandas, BI) : extension, type MIME
+COLUMNAR_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Lignes par lot Arrow (un groupe de lignes Parquet par lot) : borne la mémoire utilisée
+ARROW_BATCH_ROWS = 10000
+
+
+def get_arrow_schema(export_rows):
+    """Schéma typé d'un export : montants et taux en décimales, dates en dates"""
+    # Import différé : pyarrow ne sert qu'aux exports Parquet / Arrow
+    import pyarrow as pa
+    
+    types = {
+        TEXT: pa.string(),
+        INTEGER: pa.int64(),
+        AMOUNT: pa.decimal128(14, 2),
+        RATE: pa.decimal128(9, 2),
+        DATE: pa.date32(),
+        DATETIME: pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([(header, types[kind]) for header, kind in export_rows.columns])
+
+
+def iter_arrow_batches(export_rows, schema, progress=None):
+    """Lots Arrow de ARROW_BATCH_ROWS lignes, construits colonne par colonne"""
+    import pyarrow as pa
+    
+    rows = track_progress(export_rows.arrow_rows(), progress)
+    while batch := list(islice(rows, ARROW_BATCH_ROWS)):
+        columns = list(zip(*batch))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema,
+        )
+
+
+def write_columnar(output, export_rows, export_format, progress=None):
+    """Écrit un export au format Parquet (compression zstd) ou Arrow IPC dans un fichier binaire ouvert"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = get_arrow_schema(export_rows)
+    if export_format == 'parquet':
+        writer = pq.ParquetWriter(output, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(output, schema)
+    with writer:
+        for batch in iter_arrow_batches(export_rows, schema, progress):
+            writer.write_batch(batch)
+
+
+def write_database_columnar(output, export_format, progress=None):
+    """ZIP de l'export complet au format Parquet ou Arrow (un fichier par table)"""
+    extension, _ = COLUMNAR_FORMATS[export_format]
+    write_database_zip(
+        output,
+        lambda table_file, export_rows: write_columnar(table_file, export_rows, export_format, progress),
+        extension,
+        # Parquet est déjà compressé
+        zipfile.ZIP_STORED if export_format == 'parquet' else zipfile.ZIP_DEFLATED,
+    )
+
+
+def file_response(write, filename, content_type):
+    """
+    Écrit l'export dans un fichier temporaire puis l'envoie par blocs avec FileResponse
+    (le fichier est supprimé à la fermeture de la réponse)
+    """
+    output = tempfile.TemporaryFile(suffix=os.path.splitext(filename)[1])
+    try:
+        write(output)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
     
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=content_type)
+
+
+def xlsx_response(filename_prefix, *export_rows_list):
+    """Classeur Excel avec une feuille par export, envoyé depuis un fichier temporaire"""
+    return file_response(
+        lambda output: write_xlsx(output, export_rows_list),
+        f'{filename_prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
+        XLSX_CONTENT_TYPE,
     )
-    response['Content-Disposition'] = f'attachment; filename="clients_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    return response
+
+
+def export_clients_csv():
+    """Export des clients au format CSV"""
+    rows = ClientRows()
+    return stream_csv_response('clients', rows.headers, rows.csv_rows())
+
+
+def export_clients_xlsx():
+    """Export des clients au format Excel"""
+    return xlsx_response('clients', ClientRows())
 
 
 def export_affaires_csv(date_debut=None, date_fin=None):
     """Export des affaires au format CSV avec filtrage par date"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="affaires_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    # BOM pour Excel
-    response.write('\ufeff')
-    
-    writer = csv.writer(response, delimiter=';')
-    writer.writerow([
-        'Numéro affaire', 'Client', 'Description', 'Budget (€)', 
-        'Total facturé HT (€)', 'Reste à facturer (€)', 'Taux d\'avancement (%)',
-        'Contact principal', 'Auteur'
-    ])
-    
-    affaires = Affaire.objects.all().order_by('affaire_number')
-    
-    # Filtrage par date si spécifié (basé sur la date de création des factures associées)
-    if date_debut or date_fin:
-        affaire_ids = set()
-        invoices = Invoice.objects.all()
-        if date_debut:
-            invoices = invoices.filter(date__gte=date_debut)
-        if date_fin:
-            invoices = invoices.filter(date__lte=date_fin)
-        affaire_ids.update(invoices.values_list('affaire_id', flat=True))
-        affaires = affaires.filter(id__in=affaire_ids)
-    
-    for affaire in affaires:
-        contact_principal = affaire.contact_principal
-        contact_nom = str(contact_principal) if contact_principal else ''
-        
-        author_name = ''
-        if affaire.author:
-            author_name = f"{affaire.author.first_name} {affaire.author.last_name}".strip()
-            if not author_name:
-                author_name = affaire.author.email
-        
-        writer.writerow([
-            affaire.affaire_number,
-            affaire.client_entity_name or '',
-            affaire.affaire_description or '',
-            f"{affaire.budget:.2f}".replace('.', ','),
-            f"{affaire.total_facture_ht:.2f}".replace('.', ','),
-            f"{affaire.reste_a_facturer:.2f}".replace('.', ','),
-            f"{affaire.taux_avancement:.1f}".replace('.', ','),
-            contact_nom,
-            author_name
-        ])
-    
-    return response
+    rows = AffaireRows(date_debut, date_fin)
+    return stream_csv_response('affaires', rows.headers, rows.csv_rows())
 
 
 def export_affaires_xlsx(date_debut=None, date_fin=None):
     """Export des affaires au format Excel avec filtrage par date"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Affaires"
-    
-    # Style des en-têtes
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="7FAEDC", end_color="7FAEDC", fill_type="solid")
-    header_alignment = Alignment(horizontal="center")
-    
-    # En-têtes
-    headers = [
-        'Numéro affaire', 'Client', 'Description', 'Budget (€)', 
-        'Total facturé HT (€)', 'Reste à facturer (€)', 'Taux d\'avancement (%)',
-        'Contact principal', 'Auteur'
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Données
-    affaires = Affaire.objects.all().order_by('affaire_number')
-    
-    # Filtrage par date si spécifié
-    if date_debut or date_fin:
-        affaire_ids = set()
-        invoices = Invoice.objects.all()
-        if date_debut:
-            invoices = invoices.filter(date__gte=date_debut)
-        if date_fin:
-            invoices = invoices.filter(date__lte=date_fin)
-        affaire_ids.update(invoices.values_list('affaire_id', flat=True))
-        affaires = affaires.filter(id__in=affaire_ids)
-    
-    for row, affaire in enumerate(affaires, 2):
-        contact_principal = affaire.contact_principal
-        contact_nom = str(contact_principal) if contact_principal else ''
-        
-        author_name = ''
-        if affaire.author:
-            author_name = f"{affaire.author.first_name} {affaire.author.last_name}".strip()
-            if not author_name:
-                author_name = affaire.author.email
-        
-        ws.cell(row=row, column=1, value=affaire.affaire_number)
-        ws.cell(row=row, column=2, value=affaire.client_entity_name or '')
-        ws.cell(row=row, column=3, value=affaire.affaire_description or '')
-        ws.cell(row=row, column=4, value=float(affaire.budget))
-        ws.cell(row=row, column=5, value=float(affaire.total_facture_ht))
-        ws.cell(row=row, column=6, value=float(affaire.reste_a_facturer))
-        ws.cell(row=row, column=7, value=float(affaire.taux_avancement))
-        ws.cell(row=row, column=8, value=contact_nom)
-        ws.cell(row=row, column=9, value=author_name)
-    
-    # Ajuster la largeur des colonnes
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Créer la réponse HTTP
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="affaires_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    return response
+    return xlsx_response('affaires', AffaireRows(date_debut, date_fin))
 
 
 def export_factures_csv(date_debut=None, date_fin=None):
     """Export des factures au format CSV avec filtrage par date"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="factures_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    # BOM pour Excel
-    response.write('\ufeff')
-    
-    writer = csv.writer(response, delimiter=';')
-    writer.writerow([
-        'Numéro facture', 'Date', 'Type', 'Client', 'Affaire', 'Objet', 
-        'Montant HT (€)', 'Taux TVA (%)', 'Montant TTC (€)', 'Statut',
-        'Date échéance', 'Solde (€)', 'Contact', 'Auteur'
-    ])
-    
-    factures = Invoice.objects.all().order_by('-date')
-    
-    # Filtrage par date
-    if date_debut:
-        factures = factures.filter(date__gte=date_debut)
-    if date_fin:
-        factures = factures.filter(date__lte=date_fin)
-    
-    for facture in factures:
-        contact_nom = str(facture.contact) if facture.contact else ''
-        
-        author_name = ''
-        if facture.author:
-            author_name = f"{facture.author.first_name} {facture.author.last_name}".strip()
-            if not author_name:
-                author_name = facture.author.email
-        
-        writer.writerow([
-            facture.invoice_number,
-            facture.date.strftime('%d/%m/%Y'),
-            facture.get_type_display(),
-            facture.client_entity_name or '',
-            facture.affaire.affaire_number if facture.affaire else '',
-            facture.invoice_object or '',
-            f"{facture.amount_ht:.2f}".replace('.', ','),
-            f"{facture.vat_rate:.1f}".replace('.', ','),
-            f"{facture.amount_ttc:.2f}".replace('.', ','),
-            facture.get_statut_display(),
-            facture.due_date.strftime('%d/%m/%Y'),
-            f"{facture.balance:.2f}".replace('.', ','),
-            contact_nom,
-            author_name
-        ])
-    
-    return response
+    rows = InvoiceRows(date_debut, date_fin)
+    return stream_csv_response('factures', rows.headers, rows.csv_rows())
 
 
 def export_factures_xlsx(date_debut=None, date_fin=None):
     """Export des factures au format Excel avec filtrage par date"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Factures"
-    
-    # Style des en-têtes
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="7FAEDC", end_color="7FAEDC", fill_type="solid")
-    header_alignment = Alignment(horizontal="center")
-    
-    # En-têtes
-    headers = [
-        'Numéro facture', 'Date', 'Type', 'Client', 'Affaire', 'Objet', 
-        'Montant HT (€)', 'Taux TVA (%)', 'Montant TTC (€)', 'Statut',
-        'Date échéance', 'Solde (€)', 'Contact', 'Auteur'
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Données
-    factures = Invoice.objects.all().order_by('-date')
-    
-    # Filtrage par date
-    if date_debut:
-        factures = factures.filter(date__gte=date_debut)
-    if date_fin:
-        factures = factures.filter(date__lte=date_fin)
-    
-    for row, facture in enumerate(factures, 2):
-        contact_nom = str(facture.contact) if facture.contact else ''
-        
-        author_name = ''
-        if facture.author:
-            author_name = f"{facture.author.first_name} {facture.author.last_name}".strip()
-            if not author_name:
-                author_name = facture.author.email
-        
-        ws.cell(row=row, column=1, value=facture.invoice_number)
-        ws.cell(row=row, column=2, value=facture.date)
-        ws.cell(row=row, column=3, value=facture.get_type_display())
-        ws.cell(row=row, column=4, value=facture.client_entity_name or '')
-        ws.cell(row=row, column=5, value=facture.affaire.affaire_number if facture.affaire else '')
-        ws.cell(row=row, column=6, value=facture.invoice_object or '')
-        ws.cell(row=row, column=7, value=float(facture.amount_ht))
-        ws.cell(row=row, column=8, value=float(facture.vat_rate))
-        ws.cell(row=row, column=9, value=float(facture.amount_ttc))
-        ws.cell(row=row, column=10, value=facture.get_statut_display())
-        ws.cell(row=row, column=11, value=facture.due_date)
-        ws.cell(row=row, column=12, value=float(facture.balance))
-        ws.cell(row=row, column=13, value=contact_nom)
-        ws.cell(row=row, column=14, value=author_name)
-    
-    # Ajuster la largeur des colonnes
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Créer la réponse HTTP
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="factures_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    return response
+    return xlsx_response('factures', InvoiceRows(date_debut, date_fin))
 
 
 def export_database_csv():
     """Export complet de la base de données au format CSV (toutes les tables)"""
-    output = io.BytesIO()
-    
-    # Créer un fichier ZIP contenant tous les CSV
-    
-    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        
-        # Export des clients
-        clients_csv = io.StringIO()
-        clients_csv.write('\ufeff')  # BOM pour Excel
-        writer = csv.writer(clients_csv, delimiter=';')
-        writer.writerow([
-            'Nom de l\'entité', 'Adresse', 'Code postal', 'Ville', 
-            'Contact', 'Téléphone', 'Email', 'Total affaires (€)'
-        ])
-        
-        clients = Client.objects.all().order_by('entity_name')
-        for client in clients:
-            writer.writerow([
-                client.entity_name or '',
-                client.address or '',
-                client.zip_code or '',
-                client.city or '',
-                client.contact or '',
-                client.phone_number or '',
-                client.email or '',
-                f"{client.total_affaire_client:.2f}".replace('.', ',')
-            ])
-        
-        zipf.writestr('clients.csv', clients_csv.getvalue().encode('utf-8'))
-        
-        # Export des contacts
-        contacts_csv = io.StringIO()
-        contacts_csv.write('\ufeff')
-        writer = csv.writer(contacts_csv, delimiter=';')
-        writer.writerow([
-            'Nom', 'Prénom', 'Fonction', 'Téléphone', 'Email', 
-            'Principal', 'Affaire', 'Client'
-        ])
-        
-        contacts = Contact.objects.all().order_by('nom')
-        for contact in contacts:
-            writer.writerow([
-                contact.nom or '',
-                contact.prenom or '',
-                contact.fonction or '',
-                contact.phone_number or '',
-                contact.email or '',
-                'Oui' if contact.is_principal else 'Non',
-                contact.affaire.affaire_number if contact.affaire else '',
-                contact.affaire.client_entity_name if contact.affaire else ''
-            ])
-        
-        zipf.writestr('contacts.csv', contacts_csv.getvalue().encode('utf-8'))
-        
-        # Export des affaires
-        affaires_csv = io.StringIO()
-        affaires_csv.write('\ufeff')
-        writer = csv.writer(affaires_csv, delimiter=';')
-        writer.writerow([
-            'Numéro affaire', 'Client', 'Description', 'Budget (€)', 
-            'Total facturé HT (€)', 'Reste à facturer (€)', 'Taux d\'avancement (%)',
-            'Contact principal', 'Auteur'
-        ])
-        
-        affaires = Affaire.objects.all().order_by('affaire_number')
-        for affaire in affaires:
-            contact_principal = affaire.contact_principal
-            contact_nom = str(contact_principal) if contact_principal else ''
-            
-            author_name = ''
-            if affaire.author:
-                author_name = f"{affaire.author.first_name} {affaire.author.last_name}".strip()
-                if not author_name:
-                    author_name = affaire.author.email
-            
-            writer.writerow([
-                affaire.affaire_number,
-                affaire.client_entity_name or '',
-                affaire.affaire_description or '',
-                f"{affaire.budget:.2f}".replace('.', ','),
-                f"{affaire.total_facture_ht:.2f}".replace('.', ','),
-                f"{affaire.reste_a_facturer:.2f}".replace('.', ','),
-                f"{affaire.taux_avancement:.1f}".replace('.', ','),
-                contact_nom,
-                author_name
-            ])
-        
-        zipf.writestr('affaires.csv', affaires_csv.getvalue().encode('utf-8'))
-        
-        # Export des factures
-        factures_csv = io.StringIO()
-        factures_csv.write('\ufeff')
-        writer = csv.writer(factures_csv, delimiter=';')
-        writer.writerow([
-            'Numéro facture', 'Date', 'Type', 'Client', 'Affaire', 'Objet', 
-            'Montant HT (€)', 'Taux TVA (%)', 'Montant TTC (€)', 'Statut',
-            'Date échéance', 'Solde (€)', 'Contact', 'Auteur'
-        ])
-        
-        factures = Invoice.objects.all().order_by('-date')
-        for facture in factures:
-            contact_nom = str(facture.contact) if facture.contact else ''
-            
-            author_name = ''
-            if facture.author:
-                author_name = f"{facture.author.first_name} {facture.author.last_name}".strip()
-                if not author_name:
-                    author_name = facture.author.email
-            
-            writer.writerow([
-                facture.invoice_number,
-                facture.date.strftime('%d/%m/%Y'),
-                facture.get_type_display(),
-                facture.client_entity_name or '',
-                facture.affaire.affaire_number if facture.affaire else '',
-                facture.invoice_object or '',
-                f"{facture.amount_ht:.2f}".replace('.', ','),
-                f"{facture.vat_rate:.1f}".replace('.', ','),
-                f"{facture.amount_ttc:.2f}".replace('.', ','),
-                facture.get_statut_display(),
-                facture.due_date.strftime('%d/%m/%Y'),
-                f"{facture.balance:.2f}".replace('.', ','),
-                contact_nom,
-                author_name
-            ])
-        
-        zipf.writestr('factures.csv', factures_csv.getvalue().encode('utf-8'))
-        
-        # Export des paiements
-        paiements_csv = io.StringIO()
-        paiements_csv.write('\ufeff')
-        writer = csv.writer(paiements_csv, delimiter=';')
-        writer.writerow([
-            'Date', 'Montant (€)', 'Numéro facture', 'Moyen de paiement'
-        ])
-        
-        paiements = Payment.objects.all().order_by('-date')
-        for paiement in paiements:
-            writer.writerow([
-                paiement.date.strftime('%d/%m/%Y'),
-                f"{paiement.amount:.2f}".replace('.', ','),
-                paiement.invoice.invoice_number,
-                paiement.payment_method or ''
-            ])
-        
-        zipf.writestr('paiements.csv', paiements_csv.getvalue().encode('utf-8'))
-    
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/zip'
+    return file_response(
+        write_database_csv,
+        f'export_base_donnees_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip',
+        'application/zip',
+    )
+
+
+def export_columnar(export_type, export_format, date_debut=None, date_fin=None):
+    """Export d'un type de données au format Parquet ou Arrow IPC, avec filtrage par date"""
+    extension, content_type = COLUMNAR_FORMATS[export_format]
+    export_rows = EXPORT_ROWS_BY_TYPE[export_type](date_debut, date_fin)
+    return file_response(
+        lambda output: write_columnar(output, export_rows, export_format),
+        f'{export_type}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}',
+        content_type,
     )
-    response['Content-Disposition'] = f'attachment; filename="export_base_donnees_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip"'
-    return response
 
 
 def export_database_xlsx():
     """Export complet de la base de données au format Excel (toutes les tables)"""
-    wb = Workbook()
-    
-    # Style des en-têtes
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="7FAEDC", end_color="7FAEDC", fill_type="solid")
-    header_alignment = Alignment(horizontal="center")
-    
-    # Supprimer la feuille par défaut
-    wb.remove(wb.active)
-    
-    # Feuille Clients
-    ws_clients = wb.create_sheet("Clients")
-    headers_clients = [
-        'Nom de l\'entité', 'Adresse', 'Code postal', 'Ville', 
-        'Contact', 'Téléphone', 'Email', 'Total affaires (€)'
-    ]
-    
-    for col, header in enumerate(headers_clients, 1):
-        cell = ws_clients.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    clients = Client.objects.all().order_by('entity_name')
-    for row, client in enumerate(clients, 2):
-        ws_clients.cell(row=row, column=1, value=client.entity_name or '')
-        ws_clients.cell(row=row, column=2, value=client.address or '')
-        ws_clients.cell(row=row, column=3, value=client.zip_code or '')
-        ws_clients.cell(row=row, column=4, value=client.city or '')
-        ws_clients.cell(row=row, column=5, value=client.contact or '')
-        ws_clients.cell(row=row, column=6, value=client.phone_number or '')
-        ws_clients.cell(row=row, column=7, value=client.email or '')
-        ws_clients.cell(row=row, column=8, value=float(client.total_affaire_client))
-    
-    # Feuille Contacts
-    ws_contacts = wb.create_sheet("Contacts")
-    headers_contacts = [
-        'Nom', 'Prénom', 'Fonction', 'Téléphone', 'Email', 
-        'Principal', 'Affaire', 'Client'
-    ]
-    
-    for col, header in enumerate(headers_contacts, 1):
-        cell = ws_contacts.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    contacts = Contact.objects.all().order_by('nom')
-    for row, contact in enumerate(contacts, 2):
-        ws_contacts.cell(row=row, column=1, value=contact.nom or '')
-        ws_contacts.cell(row=row, column=2, value=contact.prenom or '')
-        ws_contacts.cell(row=row, column=3, value=contact.fonction or '')
-        ws_contacts.cell(row=row, column=4, value=contact.phone_number or '')
-        ws_contacts.cell(row=row, column=5, value=contact.email or '')
-        ws_contacts.cell(row=row, column=6, value='Oui' if contact.is_principal else 'Non')
-        ws_contacts.cell(row=row, column=7, value=contact.affaire.affaire_number if contact.affaire else '')
-        ws_contacts.cell(row=row, column=8, value=contact.affaire.client_entity_name if contact.affaire else '')
-    
-    # Feuille Affaires
-    ws_affaires = wb.create_sheet("Affaires")
-    headers_affaires = [
-        'Numéro affaire', 'Client', 'Description', 'Budget (€)', 
-        'Total facturé HT (€)', 'Reste à facturer (€)', 'Taux d\'avancement (%)',
-        'Contact principal', 'Auteur'
-    ]
-    
-    for col, header in enumerate(headers_affaires, 1):
-        cell = ws_affaires.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    affaires = Affaire.objects.all().order_by('affaire_number')
-    for row, affaire in enumerate(affaires, 2):
-        contact_principal = affaire.contact_principal
-        contact_nom = str(contact_principal) if contact_principal else ''
-        
-        author_name = ''
-        if affaire.author:
-            author_name = f"{affaire.author.first_name} {affaire.author.last_name}".strip()
-            if not author_name:
-                author_name = affaire.author.email
-        
-        ws_affaires.cell(row=row, column=1, value=affaire.affaire_number)
-        ws_affaires.cell(row=row, column=2, value=affaire.client_entity_name or '')
-        ws_affaires.cell(row=row, column=3, value=affaire.affaire_description or '')
-        ws_affaires.cell(row=row, column=4, value=float(affaire.budget))
-        ws_affaires.cell(row=row, column=5, value=float(affaire.total_facture_ht))
-        ws_affaires.cell(row=row, column=6, value=float(affaire.reste_a_facturer))
-        ws_affaires.cell(row=row, column=7, value=float(affaire.taux_avancement))
-        ws_affaires.cell(row=row, column=8, value=contact_nom)
-        ws_affaires.cell(row=row, column=9, value=author_name)
-    
-    # Feuille Factures
-    ws_factures = wb.create_sheet("Factures")
-    headers_factures = [
-        'Numéro facture', 'Date', 'Type', 'Client', 'Affaire', 'Objet', 
-        'Montant HT (€)', 'Taux TVA (%)', 'Montant TTC (€)', 'Statut',
-        'Date échéance', 'Solde (€)', 'Contact', 'Auteur'
-    ]
-    
-    for col, header in enumerate(headers_factures, 1):
-        cell = ws_factures.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    factures = Invoice.objects.all().order_by('-date')
-    for row, facture in enumerate(factures, 2):
-        contact_nom = str(facture.contact) if facture.contact else ''
-        
-        author_name = ''
-        if facture.author:
-            author_name = f"{facture.author.first_name} {facture.author.last_name}".strip()
-            if not author_name:
-                author_name = facture.author.email
-        
-        ws_factures.cell(row=row, column=1, value=facture.invoice_number)
-        ws_factures.cell(row=row, column=2, value=facture.date)
-        ws_factures.cell(row=row, column=3, value=facture.get_type_display())
-        ws_factures.cell(row=row, column=4, value=facture.client_entity_name or '')
-        ws_factures.cell(row=row, column=5, value=facture.affaire.affaire_number if facture.affaire else '')
-        ws_factures.cell(row=row, column=6, value=facture.invoice_object or '')
-        ws_factures.cell(row=row, column=7, value=float(facture.amount_ht))
-        ws_factures.cell(row=row, column=8, value=float(facture.vat_rate))
-        ws_factures.cell(row=row, column=9, value=float(facture.amount_ttc))
-        ws_factures.cell(row=row, column=10, value=facture.get_statut_display())
-        ws_factures.cell(row=row, column=11, value=facture.due_date)
-        ws_factures.cell(row=row, column=12, value=float(facture.balance))
-        ws_factures.cell(row=row, column=13, value=contact_nom)
-        ws_factures.cell(row=row, column=14, value=author_name)
-    
-    # Feuille Paiements
-    ws_paiements = wb.create_sheet("Paiements")
-    headers_paiements = [
-        'Date', 'Montant (€)', 'Numéro facture', 'Moyen de paiement'
-    ]
-    
-    for col, header in enumerate(headers_paiements, 1):
-        cell = ws_paiements.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    paiements = Payment.objects.all().order_by('-date')
-    for row, paiement in enumerate(paiements, 2):
-        ws_paiements.cell(row=row, column=1, value=paiement.date)
-        ws_paiements.cell(row=row, column=2, value=float(paiement.amount))
-        ws_paiements.cell(row=row, column=3, value=paiement.invoice.invoice_number)
-        ws_paiements.cell(row=row, column=4, value=paiement.payment_method or '')
-    
-    # Ajuster la largeur des colonnes pour toutes les feuilles
-    for sheet in wb.worksheets:
-        for column in sheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            sheet.column_dimensions[column_letter].width = adjusted_width
-    
-    # Créer la réponse HTTP
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="export_base_donnees_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    return response
+    return xlsx_response('export_base_donnees', *(rows_class() for _, rows_class in DATABASE_EXPORT_ROWS))
 
 
 def export_contacts_csv():
     """Export des contacts au format CSV"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="contacts_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    # BOM pour Excel
-    response.write('\ufeff')
-    
-    writer = csv.writer(response, delimiter=';')
-    writer.writerow([
-        'Nom', 'Prénom', 'Fonction', 'Téléphone', 'Email', 
-        'Principal', 'Numéro affaire', 'Client'
-    ])
-    
-    contacts = Contact.objects.all().order_by('nom')
-    for contact in contacts:
-        writer.writerow([
-            contact.nom or '',
-            contact.prenom or '',
-            contact.fonction or '',
-            contact.phone_number or '',
-            contact.email or '',
-            'Oui' if contact.is_principal else 'Non',
-            contact.affaire.affaire_number if contact.affaire else '',
-            contact.affaire.client_entity_name if contact.affaire else ''
-        ])
-    
-    return response
+    rows = ContactRows()
+    return stream_csv_response('contacts', rows.headers, rows.csv_rows())
 
 
 def export_contacts_xlsx():
     """Export des contacts au format Excel"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Contacts"
-    
-    # Style des en-têtes
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="7FAEDC", end_color="7FAEDC", fill_type="solid")
-    header_alignment = Alignment(horizontal="center")
-    
-    # En-têtes
-    headers = [
-        'Nom', 'Prénom', 'Fonction', 'Téléphone', 'Email', 
-        'Principal', 'Numéro affaire', 'Client'
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Données
-    contacts = Contact.objects.all().order_by('nom')
-    for row, contact in enumerate(contacts, 2):
-        ws.cell(row=row, column=1, value=contact.nom or '')
-        ws.cell(row=row, column=2, value=contact.prenom or '')
-        ws.cell(row=row, column=3, value=contact.fonction or '')
-        ws.cell(row=row, column=4, value=contact.phone_number or '')
-        ws.cell(row=row, column=5, value=contact.email or '')
-        ws.cell(row=row, column=6, value='Oui' if contact.is_principal else 'Non')
-        ws.cell(row=row, column=7, value=contact.affaire.affaire_number if contact.affaire else '')
-        ws.cell(row=row, column=8, value=contact.affaire.client_entity_name if contact.affaire else '')
-    
-    # Ajuster la largeur des colonnes
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Créer la réponse HTTP
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="contacts_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    return response
+    return xlsx_response('contacts', ContactRows())
 
 
 def export_reglements_csv(date_debut=None, date_fin=None):
     """Export des règlements au format CSV avec filtrage par date"""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="reglements_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    # BOM pour Excel
-    response.write('\ufeff')
-    
-    writer = csv.writer(response, delimiter=';')
-    writer.writerow([
-        'Date', 'Montant (€)', 'Numéro facture', 'Client', 'Affaire', 'Moyen de paiement'
-    ])
-    
-    paiements = Payment.objects.all().order_by('-date')
-    
-    # Filtrage par date
-    if date_debut:
-        paiements = paiements.filter(date__gte=date_debut)
-    if date_fin:
-        paiements = paiements.filter(date__lte=date_fin)
-    
-    for paiement in paiements:
-        writer.writerow([
-            paiement.date.strftime('%d/%m/%Y'),
-            f"{paiement.amount:.2f}".replace('.', ','),
-            paiement.invoice.invoice_number,
-            paiement.invoice.client_entity_name or '',
-            paiement.invoice.affaire.affaire_number if paiement.invoice.affaire else '',
-            paiement.payment_method or ''
-        ])
-    
-    return response
+    rows = ReglementRows(date_debut, date_fin)
+    return stream_csv_response('reglements', rows.headers, rows.csv_rows())
 
 
 def export_reglements_xlsx(date_debut=None, date_fin=None):
     """Export des règlements au format Excel avec filtrage par date"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Règlements"
-    
-    # Style des en-têtes
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="7FAEDC", end_color="7FAEDC", fill_type="solid")
-    header_alignment = Alignment(horizontal="center")
-    
-    # En-têtes
-    headers = [
-        'Date', 'Montant (€)', 'Numéro facture', 'Client', 'Affaire', 'Moyen de paiement'
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # Données
-    paiements = Payment.objects.all().order_by('-date')
-    
-    # Filtrage par date
-    if date_debut:
-        paiements = paiements.filter(date__gte=date_debut)
-    if date_fin:
-        paiements = paiements.filter(date__lte=date_fin)
-    
-    for row, paiement in enumerate(paiements, 2):
-        ws.cell(row=row, column=1, value=paiement.date)
-        ws.cell(row=row, column=2, value=float(paiement.amount))
-        ws.cell(row=row, column=3, value=paiement.invoice.invoice_number)
-        ws.cell(row=row, column=4, value=paiement.invoice.client_entity_name or '')
-        ws.cell(row=row, column=5, value=paiement.invoice.affaire.affaire_number if paiement.invoice.affaire else '')
-        ws.cell(row=row, column=6, value=paiement.payment_method or '')
-    
-    # Ajuster la largeur des colonnes
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Créer la réponse HTTP
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="reglements_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    return response
\ No newline at end of file
+    return xlsx_response('reglements', ReglementRows(date_debut, date_fin))
+
+
+def get_changes_rows(since, export_types):
+    """
+    Export incrémental : lignes modifiées depuis `since` pour chaque type demandé,
+    puis les suppressions de ces types (fichier / feuille "suppressions")
+    """
+    return [
+        (export_type, EXPORT_ROWS_BY_TYPE[export_type](since=since)) for export_type in export_types
+    ] + [('suppressions', DeletionRows(since, export_types))]
+
+
+def write_changes_csv(output, since, export_types, progress=None):
+    """Écrit le ZIP de l'export incrémental (un CSV par type + suppressions.csv) dans un fichier binaire ouvert"""
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for name, export_rows in get_changes_rows(since, export_types):
+            with open_zip_member(zipf, f'{name}.csv') as member:
+                write_csv(member, export_rows, progress)
+
+
+def write_changes_xlsx(output, since, export_types, progress=None):
+    """Écrit le classeur de l'export incrémental (une feuille par type + Suppressions) dans un fichier binaire ouvert"""
+    write_xlsx(output, [export_rows for _, export_rows in get_changes_rows(since, export_types)], progress)
@@ -0,0 +1,167 @@
+import base64
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def approximate_count(queryset):
+    """
+    Estimation du nombre de lignes sans COUNT(*) lorsque la base le permet
+    (statistiques de PostgreSQL pour une table non filtrée), sinon comptage exact
+    """
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # reltuples vaut -1 (ou 0) tant que la table n'a jamais été analysée
+        if row and row[0] > 0:
+            return row[0]
+    return queryset.count()
+
+
+class CursorPaginator:
+    """
+    Pagination par curseur (keyset) : chaque page est filtrée à partir de la clé de tri
+    de la dernière ligne affichée, sans OFFSET ni COUNT(*).
+    `ordering` doit se terminer par une colonne unique, par exemple ('-invoice_number', '-id'),
+    et ne contenir que des champs ou annotations non nuls du modèle.
+    """
+
+    def __init__(self, queryset, per_page, ordering, approximate=False):
+        self.ordering = list(ordering)
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = per_page
+        self.approximate = approximate
+
+    @cached_property
+    def count(self):
+        if self.approximate:
+            return approximate_count(self.queryset)
+        return self.queryset.count()
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+    def decode_cursor(self, token):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode()))
+        except (ValueError, TypeError):
+            return None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None
+        # Valeurs converties au type de chaque colonne de tri : un curseur forgé ou périmé
+        # (texte à la place d'un identifiant...) renvoie à la première page au lieu d'une erreur
+        try:
+            return [self.get_ordering_field(field).to_python(value) for field, value in zip(self.ordering, values)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def get_ordering_field(self, field):
+        name = field.lstrip('-')
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def keyset_filter(self, values, backwards=False):
+        # (a > x) OU (a = x ET b > y) OU ... selon le sens de tri de chaque colonne
+        keyset = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith('-')
+            if backwards:
+                descending = not descending
+            condition = Q(**{f"{field.lstrip('-')}__{'lt' if descending else 'gt'}": values[index]})
+            for previous_field, previous_value in zip(self.ordering[:index], values[:index]):
+                condition &= Q(**{previous_field.lstrip('-'): previous_value})
+            keyset |= condition
+        return keyset
+
+    def get_page(self, after=None, before=None):
+        after_values = self.decode_cursor(after) if after else None
+        before_values = self.decode_cursor(before) if before else None
+
+        if before_values is not None:
+            # On lit la page précédente dans l'ordre inverse puis on la remet à l'endroit
+            reversed_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+            rows = list(
+                self.queryset.filter(self.keyset_filter(before_values, backwards=True))
+                .order_by(*reversed_ordering)[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.queryset
+            if after_values is not None:
+                queryset = queryset.filter(self.keyset_filter(after_values))
+            rows = list(queryset[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = after_values is not None
+
+        return CursorPage(rows, self, has_next, has_previous)
+
+
+class CursorPage:
+    """Page renvoyée par CursorPaginator, utilisable dans les templates comme une Page Django"""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        return self.paginator.encode_cursor(self.object_list[-1]) if self.object_list else ''
+
+    @property
+    def previous_cursor(self):
+        return self.paginator.encode_cursor(self.object_list[0]) if self.object_list else ''
+
+
+def is_cursor_mode(request):
+    """Mode curseur si LIST_PAGINATION = 'cursor' ou si l'URL contient ?after= / ?before="""
+    return (
+        settings.LIST_PAGINATION == 'cursor'
+        or 'after' in request.GET
+        or 'before' in request.GET
+    )
+
+
+def paginate(request, queryset, ordering, per_page=10):
+    """
+    Pagine une liste triée par la base, par curseur (voir is_cursor_mode)
+    ou classiquement par numéro de page.
+    """
+    if is_cursor_mode(request):
+        paginator = CursorPaginator(queryset, per_page, ordering, approximate=settings.LIST_APPROXIMATE_COUNT)
+        return paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+    paginator = Paginator(queryset.order_by(*ordering), per_page)
+    return paginator.get_page(request.GET.get('page'))
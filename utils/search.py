@@ -0,0 +1,348 @@
+import re
+import unicodedata
+from itertools import islice
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
+
+from affaires.models import Affaire
+from clients.models import Client, Contact
+from factures.models import Invoice
+
+
+# Nombre d'objets indexés par requête (IN (...) et insertions groupées)
+INDEX_CHUNK_SIZE = 500
+# Documents classés par pertinence au plus, par section : les correspondances les plus récentes.
+# Une recherche très large (qui correspond à toute la table) garde ainsi un temps de réponse borné :
+# c'est aussi le plafond du nombre de résultats compté et paginé par section.
+RANKED_CANDIDATES = 1000
+
+
+def normalize(text):
+    """Minuscules sans accents : même forme pour le contenu indexé et pour les recherches"""
+    text = unicodedata.normalize('NFKD', str(text)).lower()
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def author_fields(author):
+    return [author.email, author.first_name, author.last_name] if author else []
+
+
+class SearchType:
+    """
+    Section de la recherche globale : objets indexés et champs recherchables.
+    Le document d'un objet est la concaténation normalisée de ses champs.
+    """
+    model = None
+    label = ''
+    # Champs du modèle qui alimentent le document : une sauvegarde limitée à d'autres champs ne réindexe pas
+    fields = set()
+    select_related = ()
+
+    def get_queryset(self):
+        return self.model.objects.select_related(*self.select_related)
+
+    def get_values(self, obj):
+        raise NotImplementedError
+
+    def get_content(self, obj):
+        return normalize(' '.join(str(value) for value in self.get_values(obj) if value))
+
+
+class ClientSearch(SearchType):
+    label = 'Clients'
+    model = Client
+    fields = {'entity_name', 'address', 'email'}
+
+    def get_queryset(self):
+        # Les numéros des affaires du client sont recherchables
+        return super().get_queryset().prefetch_related(
+            Prefetch('affaires', queryset=Affaire.objects.only('id', 'client_id', 'affaire_number'))
+        )
+
+    def get_values(self, client):
+        return [client.entity_name, client.address, client.email, *(affaire.affaire_number for affaire in client.affaires.all())]
+
+
+class ContactSearch(SearchType):
+    label = 'Contacts'
+    model = Contact
+    fields = {'prenom', 'nom', 'email', 'phone_number'}
+    select_related = ('affaire',)
+
+    def get_values(self, contact):
+        return [contact.prenom, contact.nom, contact.email, contact.phone_number]
+
+
+class AffaireSearch(SearchType):
+    label = 'Affaires'
+    model = Affaire
+    fields = {'affaire_number', 'affaire_description', 'client_entity_name', 'author'}
+    select_related = ('author',)
+
+    def get_values(self, affaire):
+        return [affaire.affaire_number, affaire.affaire_description, affaire.client_entity_name, *author_fields(affaire.author)]
+
+
+class InvoiceSearch(SearchType):
+    label = 'Factures'
+    model = Invoice
+    fields = {'invoice_number', 'client_entity_name', 'invoice_object', 'affaire', 'author'}
+    select_related = ('affaire', 'author')
+
+    def get_values(self, invoice):
+        return [invoice.invoice_number, invoice.client_entity_name, invoice.invoice_object, invoice.affaire.affaire_number, *author_fields(invoice.author)]
+
+
+# Sections de la recherche, dans l'ordre d'affichage des résultats
+SEARCH_TYPES = {
+    'clients': ClientSearch(),
+    'contacts': ContactSearch(),
+    'affaires': AffaireSearch(),
+    'factures': InvoiceSearch(),
+}
+
+
+def build_documents(entity_type, queryset):
+    from dashboard.models import SearchDocument
+
+    search_type = SEARCH_TYPES[entity_type]
+    return [
+        SearchDocument(entity_type=entity_type, object_id=obj.pk, content=search_type.get_content(obj))
+        for obj in queryset
+    ]
+
+
+def save_documents(documents):
+    """Insère les documents, ou met à jour ceux qui existent déjà"""
+    from dashboard.models import SearchDocument
+
+    SearchDocument.objects.bulk_create(
+        documents,
+        batch_size=INDEX_CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['entity_type', 'object_id'],
+        update_fields=['content', 'updated_at'],
+    )
+
+
+def index_objects(entity_type, pks):
+    """(Ré)indexe des objets d'une section, relus en base par paquets"""
+    pks = list(pks)
+    search_type = SEARCH_TYPES[entity_type]
+    for start in range(0, len(pks), INDEX_CHUNK_SIZE):
+        save_documents(build_documents(entity_type, search_type.get_queryset().filter(pk__in=pks[start:start + INDEX_CHUNK_SIZE])))
+
+
+def index_loaded_objects(entity_type, objects):
+    """(Ré)indexe des objets déjà en mémoire avec leurs relations (import groupé), sans les relire"""
+    save_documents(build_documents(entity_type, objects))
+
+
+def remove_objects(entity_type, pks):
+    from dashboard.models import SearchDocument
+
+    SearchDocument.objects.filter(entity_type=entity_type, object_id__in=list(pks)).delete()
+
+
+def rebuild_search_index(entity_types=None):
+    """Reconstruit l'index des sections demandées (toutes par défaut). Retourne le nombre de documents par section."""
+    from dashboard.models import SearchDocument
+
+    counts = {}
+    for entity_type in entity_types or SEARCH_TYPES:
+        queryset = SEARCH_TYPES[entity_type].get_queryset().order_by('pk')
+        with transaction.atomic():
+            SearchDocument.objects.filter(entity_type=entity_type).delete()
+            counts[entity_type] = 0
+            # chunk_size obligatoire avec prefetch_related : les affaires sont chargées par paquet de clients
+            objects = queryset.iterator(chunk_size=INDEX_CHUNK_SIZE)
+            while documents := build_documents(entity_type, islice(objects, INDEX_CHUNK_SIZE)):
+                SearchDocument.objects.bulk_create(documents)
+                counts[entity_type] += len(documents)
+    return counts
+
+
+class SearchBackend:
+    """
+    Interrogation de l'index selon le moteur de base de données, section par section.
+    Sans index plein texte pour le moteur, seule la recherche par sous-chaîne est faite.
+    """
+    vendor = ''
+
+    def search_fulltext(self, entity_type, terms, limit, offset=0):
+        """Identifiants classés par pertinence des documents contenant tous les termes (en préfixe)"""
+        return []
+
+    def substring_queryset(self, entity_type, phrase):
+        from dashboard.models import SearchDocument
+
+        return SearchDocument.objects.filter(entity_type=entity_type, content__contains=phrase)
+
+    def search_substring(self, entity_type, phrase, limit, offset=0):
+        """Identifiants des documents contenant la phrase telle quelle (comme icontains), les plus récents d'abord"""
+        return list(
+            self.substring_queryset(entity_type, phrase)
+            .order_by('-id').values_list('object_id', flat=True)[offset:offset + limit]
+        )
+
+    def fetch_ids(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [object_id for object_id, in cursor.fetchall()]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """Tables FTS5 : mots (unicode61, index de préfixes) classés par bm25, et trigrammes pour les sous-chaînes"""
+    vendor = 'sqlite'
+
+    def fulltext_match(self, entity_type, terms):
+        # Section filtrée dans l'index
+        return f'entity_type:"{entity_type}" AND content:(' + ' '.join(f'"{term}"*' for term in terms) + ')'
+
+    def substring_match(self, entity_type, phrase):
+        return f'entity_type:"{entity_type}" AND content:"' + phrase.replace('"', '""') + '"'
+
+    def search_fulltext(self, entity_type, terms, limit, offset=0):
+        # bm25 ne pondère que la colonne content
+        return self.fetch_ids(
+            """
+            SELECT d.object_id FROM (
+                SELECT rowid, bm25(dashboard_searchdocument_fts, 1.0, 0.0) AS score
+                FROM dashboard_searchdocument_fts WHERE dashboard_searchdocument_fts MATCH %s
+                ORDER BY rowid DESC LIMIT %s
+            ) candidates
+            JOIN dashboard_searchdocument d ON d.id = candidates.rowid
+            ORDER BY candidates.score, d.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [self.fulltext_match(entity_type, terms), RANKED_CANDIDATES, limit, offset],
+        )
+
+    def search_substring(self, entity_type, phrase, limit, offset=0):
+        # Le tokenizer trigram ne sait chercher que des chaînes de 3 caractères ou plus
+        if len(phrase) < 3:
+            return super().search_substring(entity_type, phrase, limit, offset)
+        return self.fetch_ids(
+            """
+            SELECT d.object_id FROM (
+                SELECT rowid FROM dashboard_searchdocument_trigram WHERE dashboard_searchdocument_trigram MATCH %s
+                ORDER BY rowid DESC LIMIT %s OFFSET %s
+            ) matches
+            JOIN dashboard_searchdocument d ON d.id = matches.rowid
+            ORDER BY d.id DESC
+            """,
+            [self.substring_match(entity_type, phrase), limit, offset],
+        )
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """tsvector stocké (configuration simple) sur index GIN, classé par ts_rank ; sous-chaînes par index trigrammes"""
+    vendor = 'postgresql'
+
+    def to_tsquery(self, terms):
+        return ' & '.join(f"'{term}':*" for term in terms)
+
+    def like_pattern(self, phrase):
+        return '%' + phrase.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+    def search_fulltext(self, entity_type, terms, limit, offset=0):
+        tsquery = self.to_tsquery(terms)
+        return self.fetch_ids(
+            """
+            SELECT candidates.object_id FROM (
+                SELECT id, object_id, search_vector FROM dashboard_searchdocument
+                WHERE entity_type = %s AND search_vector @@ to_tsquery('simple', %s)
+                ORDER BY id DESC LIMIT %s
+            ) candidates
+            ORDER BY ts_rank(candidates.search_vector, to_tsquery('simple', %s)) DESC, candidates.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [entity_type, tsquery, RANKED_CANDIDATES, tsquery, limit, offset],
+        )
+
+    def search_substring(self, entity_type, phrase, limit, offset=0):
+        pattern = self.like_pattern(phrase)
+        return self.fetch_ids(
+            """
+            SELECT candidates.object_id FROM (
+                SELECT id, object_id, content FROM dashboard_searchdocument
+                WHERE entity_type = %s AND content LIKE %s
+                ORDER BY id DESC LIMIT %s
+            ) candidates
+            ORDER BY similarity(candidates.content, %s) DESC, candidates.id DESC
+            LIMIT %s OFFSET %s
+            """,
+            [entity_type, pattern, RANKED_CANDIDATES, phrase, limit, offset],
+        )
+
+
+# Interrogation de l'index par moteur de base de données
+SEARCH_BACKENDS = {
+    backend_class.vendor: backend_class
+    for backend_class in [SQLiteSearchBackend, PostgreSQLSearchBackend]
+}
+
+
+def get_search_backend():
+    return SEARCH_BACKENDS.get(connection.vendor, SearchBackend)()
+
+
+def parse_query(query):
+    """(phrase normalisée, mots) d'une saisie de recherche"""
+    phrase = ' '.join(normalize(query).split())
+    return phrase, re.findall(r'\w+', phrase)
+
+
+class SearchResults:
+    """
+    Résultats d'une section de la recherche globale, paginables par django.core.paginator.Paginator :
+    résultats de la recherche plein texte (chaque mot en préfixe) classés par pertinence, puis ceux
+    de la recherche de sous-chaîne (morceau de numéro de facture, d'email...) qui n'y sont pas déjà.
+    Au plus RANKED_CANDIDATES identifiants sont lus, seuls les objets de la tranche demandée sont chargés.
+    """
+
+    def __init__(self, entity_type, query, backend=None):
+        self.entity_type = entity_type
+        self.search_type = SEARCH_TYPES[entity_type]
+        self.phrase, self.terms = parse_query(query)
+        self.backend = backend or get_search_backend()
+
+    @cached_property
+    def ids(self):
+        if not self.phrase:
+            return []
+        ids = self.backend.search_fulltext(self.entity_type, self.terms, RANKED_CANDIDATES) if self.terms else []
+        if len(ids) < RANKED_CANDIDATES:
+            found = set(ids)
+            substring_ids = self.backend.search_substring(self.entity_type, self.phrase, RANKED_CANDIDATES)
+            ids += [pk for pk in substring_ids if pk not in found][:RANKED_CANDIDATES - len(ids)]
+        return ids
+
+    def count(self):
+        return len(self.ids)
+
+    @property
+    def capped(self):
+        """Vrai si le nombre affiché est un minimum (plus de RANKED_CANDIDATES correspondances)"""
+        return self.count() >= RANKED_CANDIDATES
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, page):
+        # Paginator ne demande que des tranches
+        ids = self.ids[page]
+        objects = self.search_type.get_queryset().in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+
+def count_results(query):
+    """{section: SearchResults} des sections ayant au moins un résultat : identifiants plafonnés uniquement, sans charger les objets"""
+    backend = get_search_backend()
+    results = {}
+    for entity_type in SEARCH_TYPES:
+        section = SearchResults(entity_type, query, backend)
+        if section.count():
+            results[entity_type] = section
+    return results
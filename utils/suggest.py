@@ -0,0 +1,293 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+
+from affaires.models import Affaire
+from clients.models import Client, Contact
+from factures.models import Invoice
+from utils.search import normalize
+
+
+def index_keys(*texts):
+    """Clés d'un objet : chaque texte normalisé et chacune de ses fins à partir d'un mot ('14 dupont', 'dupont')"""
+    keys = set()
+    for text in texts:
+        words = normalize(text or '').split()
+        keys.update(' '.join(words[start:]) for start in range(len(words)))
+    # Tuple plutôt qu'ensemble : nettement plus compact pour des centaines de milliers d'objets
+    return tuple(keys)
+
+
+class PrefixIndex:
+    """
+    Index de préfixes d'une section, en mémoire : liste triée de (clé, identifiant)
+    interrogée par bisect, et libellé affiché de chaque objet.
+    """
+
+    def __init__(self, entries=()):
+        # entries : (identifiant, libellé, détail, textes indexés)
+        self.entries = {}
+        keys = []
+        for pk, label, detail, texts in entries:
+            object_keys = index_keys(*texts)
+            self.entries[pk] = (label, detail, object_keys)
+            keys.extend((key, pk) for key in object_keys)
+        keys.sort()
+        self.keys = keys
+
+    def add(self, pk, label, detail, texts):
+        self.remove(pk)
+        object_keys = index_keys(*texts)
+        self.entries[pk] = (label, detail, object_keys)
+        for key in object_keys:
+            self.keys.insert(bisect_left(self.keys, (key, pk)), (key, pk))
+
+    def remove(self, pk):
+        entry = self.entries.pop(pk, None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            position = bisect_left(self.keys, (key, pk))
+            if position < len(self.keys) and self.keys[position] == (key, pk):
+                del self.keys[position]
+
+    def search(self, prefix, limit):
+        """Identifiants des objets dont une clé commence par le préfixe, dans l'ordre des clés"""
+        found = []
+        position = bisect_left(self.keys, (prefix,))
+        while position < len(self.keys) and len(found) < limit:
+            key, pk = self.keys[position]
+            if not key.startswith(prefix):
+                break
+            if pk not in found:
+                found.append(pk)
+            position += 1
+        return found
+
+
+class SuggestType:
+    """Section des suggestions : champs lus en base et libellé affiché de chaque objet"""
+    model = None
+    url_name = ''
+    # Champs du modèle utilisés : une sauvegarde limitée à d'autres champs ne met pas l'index à jour
+    fields = ()
+
+    def get_entry(self, values):
+        """(identifiant, libellé, détail, textes indexés) à partir d'un dictionnaire de champs"""
+        raise NotImplementedError
+
+    def iter_entries(self):
+        for values in self.model.objects.order_by().values('id', *self.fields).iterator(chunk_size=5000):
+            yield self.get_entry(values)
+
+    def get_instance_entry(self, instance):
+        return self.get_entry({'id': instance.pk, **{field: getattr(instance, field) for field in self.fields}})
+
+
+class InvoiceSuggest(SuggestType):
+    model = Invoice
+    url_name = 'factures:detail'
+    fields = ('invoice_number', 'client_entity_name')
+
+    def get_entry(self, values):
+        return values['id'], values['invoice_number'], values['client_entity_name'] or '', [values['invoice_number']]
+
+
+class AffaireSuggest(SuggestType):
+    model = Affaire
+    url_name = 'affaires:detail'
+    fields = ('affaire_number', 'client_entity_name')
+
+    def get_entry(self, values):
+        return values['id'], values['affaire_number'], values['client_entity_name'] or '', [values['affaire_number']]
+
+
+class ClientSuggest(SuggestType):
+    model = Client
+    url_name = 'clients:detail'
+    fields = ('entity_name', 'city')
+
+    def get_entry(self, values):
+        return values['id'], values['entity_name'], values['city'] or '', [values['entity_name']]
+
+
+class ContactSuggest(SuggestType):
+    model = Contact
+    url_name = 'clients:detail_contact'
+    fields = ('nom', 'prenom', 'email')
+
+    def get_entry(self, values):
+        label = f"{values['nom'] or ''} {values['prenom'] or ''}".strip() or values['email'] or ''
+        return values['id'], label, values['email'] or '', [label, values['prenom'], values['email']]
+
+
+# Sections des suggestions, dans l'ordre d'affichage
+SUGGEST_TYPES = {
+    'factures': InvoiceSuggest(),
+    'affaires': AffaireSuggest(),
+    'clients': ClientSuggest(),
+    'contacts': ContactSuggest(),
+}
+
+
+class TTLCache:
+    """Petit cache LRU en mémoire dont les entrées expirent après `ttl` secondes"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+class SuggestIndex:
+    """
+    Index de préfixes de toutes les sections, propre au processus : construit au démarrage
+    du serveur (ou à la première suggestion), mis à jour par signaux après chaque écriture
+    de ce processus, et reconstruit en arrière-plan toutes les SEARCH_SUGGEST_REFRESH_SECONDS
+    pour reprendre les écritures faites par les autres processus.
+    """
+
+    def __init__(self):
+        self.sections = None
+        self.built_at = 0
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.refreshing = False
+        # Modifications reçues pendant une construction : (section, méthode de PrefixIndex, arguments)
+        self.pending = None
+        self.cache = TTLCache(settings.SEARCH_SUGGEST_CACHE_SIZE, settings.SEARCH_SUGGEST_CACHE_SECONDS)
+
+    def is_stale(self):
+        return time.monotonic() - self.built_at > settings.SEARCH_SUGGEST_REFRESH_SECONDS
+
+    def build(self, only_if_stale=False):
+        with self.build_lock:
+            # Index construit entre-temps par un autre thread (démarrage, première suggestion)
+            if only_if_stale and self.sections is not None and not self.is_stale():
+                return
+            # Écritures validées pendant la lecture de la base : rejouées sur le nouvel index avant qu'il remplace l'ancien
+            with self.lock:
+                self.pending = []
+            try:
+                sections = {
+                    entity_type: PrefixIndex(suggest_type.iter_entries())
+                    for entity_type, suggest_type in SUGGEST_TYPES.items()
+                }
+                with self.lock:
+                    for entity_type, method, args in self.pending:
+                        getattr(sections[entity_type], method)(*args)
+                    self.sections = sections
+                    self.built_at = time.monotonic()
+            finally:
+                with self.lock:
+                    self.pending = None
+            self.cache.clear()
+
+    def _refresh_in_thread(self):
+        try:
+            self.build(only_if_stale=True)
+        except Exception as e:
+            print(f"Erreur lors de la construction de l'index des suggestions: {e}")
+        finally:
+            self.refreshing = False
+            # Thread dédié : fermer sa connexion à la base
+            connection.close()
+
+    def refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=self._refresh_in_thread, name='suggest-index', daemon=True).start()
+
+    def get_sections(self):
+        if self.sections is None:
+            # Première utilisation : construit ici, ou attend la fin de la construction du démarrage
+            self.build(only_if_stale=True)
+        elif self.is_stale():
+            # Index trop ancien : servi tel quel pendant sa reconstruction
+            self.refresh_in_background()
+        return self.sections
+
+    def apply(self, entity_type, method, *args):
+        """Modification d'une section (méthode de PrefixIndex), notée aussi pour l'index en cours de construction"""
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((entity_type, method, args))
+            if self.sections is not None:
+                getattr(self.sections[entity_type], method)(*args)
+        self.cache.clear()
+
+    def update(self, entity_type, instance):
+        self.apply(entity_type, 'add', *SUGGEST_TYPES[entity_type].get_instance_entry(instance))
+
+    def update_many(self, entity_type, instances):
+        for instance in instances:
+            self.update(entity_type, instance)
+
+    def remove(self, entity_type, pk):
+        self.apply(entity_type, 'remove', pk)
+
+    def suggest(self, query, limit):
+        """{section: [{'id', 'label', 'detail', 'url'}]} : au plus `limit` objets par section dont un mot commence par la saisie"""
+        prefix = ' '.join(normalize(query).split())
+        if not prefix:
+            return {}
+        cached = self.cache.get((prefix, limit))
+        if cached is not None:
+            return cached
+
+        sections = self.get_sections()
+        results = {}
+        with self.lock:
+            for entity_type, suggest_type in SUGGEST_TYPES.items():
+                index = sections[entity_type]
+                results[entity_type] = [
+                    {
+                        'id': pk,
+                        'label': index.entries[pk][0],
+                        'detail': index.entries[pk][1],
+                        'url': reverse(suggest_type.url_name, args=[pk]),
+                    }
+                    for pk in index.search(prefix, limit)
+                ]
+        self.cache.set((prefix, limit), results)
+        return results
+
+
+# Index partagé par les threads du processus
+suggest_index = SuggestIndex()
+
+
+def warm_suggest_index():
+    """Construit l'index en arrière-plan au démarrage du serveur web (config/wsgi.py)"""
+    if settings.SEARCH_SUGGEST_WARMUP:
+        suggest_index.refresh_in_background()